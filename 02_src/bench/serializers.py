@@ -0,0 +1,93 @@
+"""Microbenchmarks for JSON column serializers.
+
+Usage (from 02_src):
+    python -m bench.serializers
+    python -m bench.serializers --number 20000
+
+Payload shapes mirror what Storage actually writes: TraceEvent.data from
+DialogueAgent/Tracker, INPUT/OUTPUT BusMessage payloads and an AgentState
+with SGR reasoning traces.
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timezone
+
+from core.storage import available_serializers, get_serializer
+
+
+def _ts(minute: int) -> str:
+    return datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc).isoformat()
+
+
+PAYLOADS: dict[str, object] = {
+    # Tracker.track("message_received", ...)
+    "trace_message_received": {
+        "user_id": "user_001",
+        "dialogue_id": "6f1c2d2e-8a6b-4a51-9f3e-2b9d8c7a1e44",
+        "message_text": "Привет! Помоги, пожалуйста, разобрать задачи на неделю.",
+    },
+    # Tracker._handle_bus_message
+    "trace_bus_published": {
+        "topic": "input",
+        "source": "dialogue_agent",
+        "payload_summary": "{'user_id': 'user_001', 'dialogue_id': '6f1c2d2e-8a6b-4a51-9f3e-2b9d8c7a1e44', 'mes",
+    },
+    # DialogueAgent buffer publication (Topic.INPUT)
+    "bus_input_10_messages": {
+        "user_id": "user_001",
+        "dialogue_id": "6f1c2d2e-8a6b-4a51-9f3e-2b9d8c7a1e44",
+        "messages": [
+            {
+                "id": f"00000000-0000-0000-0000-{i:012d}",
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": ("Сообщение пользователя " if i % 2 == 0 else "Ответ ассистента ")
+                * 6,
+                "timestamp": _ts(i),
+            }
+            for i in range(10)
+        ],
+    },
+    # EchoAgent output (Topic.OUTPUT)
+    "bus_output": {"user_id": "user_001", "content": "Echo: 10 messages from dialogue"},
+    # AgentState with reasoning traces
+    "agent_state_sgr_traces": [
+        {
+            "step": step,
+            "reasoning": "Определяю задачи и сроки из сообщений команды. " * 4,
+            "tool": "extract_tasks",
+            "result": {"tasks": [{"title": f"Задача {n}", "due": _ts(n)} for n in range(3)]},
+        }
+        for step in range(8)
+    ],
+}
+
+
+def bench(number: int) -> list[tuple[str, str, float, float]]:
+    """Return (serializer, payload, dumps us/op, loads us/op) rows."""
+    rows = []
+    for name in available_serializers():
+        serializer = get_serializer(name)
+        for payload_name, payload in PAYLOADS.items():
+            encoded = serializer.dumps(payload)
+            dumps_s = timeit.timeit(lambda: serializer.dumps(payload), number=number)
+            loads_s = timeit.timeit(lambda: serializer.loads(encoded), number=number)
+            rows.append(
+                (name, payload_name, dumps_s / number * 1e6, loads_s / number * 1e6)
+            )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=5000, help="iterations per case")
+    args = parser.parse_args()
+
+    print(f"Auto-selected serializer: {get_serializer('auto').name}")
+    print(f"{'serializer':<12}{'payload':<26}{'dumps us':>10}{'loads us':>10}")
+    for name, payload_name, dumps_us, loads_us in bench(args.number):
+        print(f"{name:<12}{payload_name:<26}{dumps_us:>10.2f}{loads_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Compare Storage tuning profiles by replaying a recorded workload.
+
+Usage (from 02_src):
+    python -m bench.storage_profiles --source ../03_data/team_assistant.db
+    python -m bench.storage_profiles --users 50 --turns 20 --engine thread
+
+The workload is read from an existing database (messages, trace events and
+bus messages replayed in timestamp order, with the reads DialogueAgent and
+VS UI do in between) or synthesized when no source is given. Each profile
+replays it against a fresh database file.
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from core.models import BusMessage, Message, Topic, TraceEvent
+from core.storage import TUNING_PROFILES, Storage
+
+# VS UI polls trace events roughly once per this many writes
+POLL_EVERY = 20
+
+
+@dataclass
+class Workload:
+    """Ordered list of (operation, argument) pairs to replay."""
+
+    ops: list[tuple[str, object]] = field(default_factory=list)
+
+
+@dataclass
+class ProfileResult:
+    """Timing of one profile over a workload."""
+
+    profile: str
+    total_seconds: float
+    latencies: dict[str, list[float]]  # op -> seconds per call
+
+    @property
+    def op_count(self) -> int:
+        return sum(len(v) for v in self.latencies.values())
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def record_workload(source: Path) -> Workload:
+    """Build a workload from the rows of an existing database."""
+    conn = sqlite3.connect(source)
+    try:
+        rows: list[tuple[str, str, object]] = []
+        for row in conn.execute(
+            "SELECT id, dialogue_id, role, content, timestamp FROM messages"
+        ):
+            rows.append(
+                (
+                    row[4],
+                    "save_message",
+                    Message(
+                        id=row[0],
+                        dialogue_id=row[1],
+                        role=row[2],
+                        content=row[3],
+                        timestamp=_parse_ts(row[4]),
+                    ),
+                )
+            )
+        for row in conn.execute(
+            "SELECT id, event_type, actor, data, timestamp FROM trace_events"
+        ):
+            rows.append(
+                (
+                    row[4],
+                    "save_trace_event",
+                    TraceEvent(
+                        id=row[0],
+                        event_type=row[1],
+                        actor=row[2],
+                        data=json.loads(row[3]),
+                        timestamp=_parse_ts(row[4]),
+                    ),
+                )
+            )
+        for row in conn.execute(
+            "SELECT id, topic, payload, source, timestamp FROM bus_messages"
+        ):
+            rows.append(
+                (
+                    row[4],
+                    "save_bus_message",
+                    BusMessage(
+                        id=row[0],
+                        topic=Topic(row[1]),
+                        payload=json.loads(row[2]),
+                        source=row[3],
+                        timestamp=_parse_ts(row[4]),
+                    ),
+                )
+            )
+    finally:
+        conn.close()
+
+    rows.sort(key=lambda r: r[0])
+    return _with_reads([(op, arg) for _, op, arg in rows])
+
+
+def synthesize_workload(users: int, turns: int) -> Workload:
+    """Build a workload shaped like DialogueAgent traffic."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    ops: list[tuple[str, object]] = []
+    step = 0
+    for turn in range(turns):
+        for user in range(users):
+            dialogue_id = f"dialogue_{user}"
+            for role, text in (
+                ("user", f"Сообщение {turn} от пользователя {user}"),
+                ("assistant", "Ответ ассистента " * 8),
+            ):
+                step += 1
+                ts = start + timedelta(milliseconds=step)
+                ops.append(
+                    (
+                        "save_message",
+                        Message(
+                            id=str(uuid.uuid4()),
+                            dialogue_id=dialogue_id,
+                            role=role,
+                            content=text,
+                            timestamp=ts,
+                        ),
+                    )
+                )
+                ops.append(
+                    (
+                        "save_trace_event",
+                        TraceEvent(
+                            id=str(uuid.uuid4()),
+                            event_type=f"message_{role}",
+                            actor="dialogue_agent",
+                            data={"user_id": f"user_{user}", "dialogue_id": dialogue_id},
+                            timestamp=ts,
+                        ),
+                    )
+                )
+            ops.append(
+                (
+                    "save_bus_message",
+                    BusMessage(
+                        id=str(uuid.uuid4()),
+                        topic=Topic.INPUT,
+                        payload={"user_id": f"user_{user}", "dialogue_id": dialogue_id},
+                        source="dialogue_agent",
+                        timestamp=start + timedelta(milliseconds=step),
+                    ),
+                )
+            )
+    return _with_reads(ops)
+
+
+def _with_reads(writes: list[tuple[str, object]]) -> Workload:
+    """Interleave the reads that accompany writes in the running system."""
+    ops: list[tuple[str, object]] = []
+    for i, (op, arg) in enumerate(writes, start=1):
+        ops.append((op, arg))
+        # DialogueAgent reloads the dialogue after each user message
+        if op == "save_message" and arg.role == "user":
+            ops.append(("get_messages", arg.dialogue_id))
+        if i % POLL_EVERY == 0:
+            ops.append(("get_trace_events", None))
+    return Workload(ops=ops)
+
+
+async def replay(storage: Storage, workload: Workload) -> dict[str, list[float]]:
+    """Run the workload against storage, returning per-op latencies."""
+    latencies: dict[str, list[float]] = {}
+    for op, arg in workload.ops:
+        started = time.perf_counter()
+        if op == "get_trace_events":
+            await storage.get_trace_events(limit=100)
+        else:
+            await getattr(storage, op)(arg)
+        latencies.setdefault(op, []).append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_profile(
+    profile: str, workload: Workload, workdir: Path, engine: str = "aiosqlite"
+) -> ProfileResult:
+    """Replay the workload against a fresh database using one profile."""
+    storage = Storage(workdir / f"{profile}.db", tuning=profile, engine=engine)
+    await storage.init()
+    try:
+        started = time.perf_counter()
+        latencies = await replay(storage, workload)
+        total = time.perf_counter() - started
+    finally:
+        await storage.close()
+    return ProfileResult(profile=profile, total_seconds=total, latencies=latencies)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+def format_results(results: list[ProfileResult]) -> str:
+    """Render results as a side-by-side text table."""
+    lines = [
+        f"{'profile':<12}{'op':<18}{'calls':>8}{'ops/s':>11}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.profile:<12}{'(all)':<18}{result.op_count:>8}"
+            f"{result.op_count / result.total_seconds:>11.0f}"
+        )
+        for op in sorted(result.latencies):
+            values = result.latencies[op]
+            lines.append(
+                f"{'':<12}{op:<18}{len(values):>8}{len(values) / sum(values):>11.0f}"
+                f"{_percentile(values, 50) * 1000:>9.3f}"
+                f"{_percentile(values, 95) * 1000:>9.3f}"
+                f"{_percentile(values, 99) * 1000:>9.3f}"
+            )
+    return "\n".join(lines)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    if args.source:
+        workload = record_workload(Path(args.source))
+    else:
+        workload = synthesize_workload(args.users, args.turns)
+    profiles = args.profiles.split(",") if args.profiles else list(TUNING_PROFILES)
+
+    print(f"Replaying {len(workload.ops)} operations per profile ({args.engine} engine)")
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for profile in profiles:
+            results.append(
+                await run_profile(profile, workload, Path(workdir), args.engine)
+            )
+    print(format_results(results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", help="database file to record the workload from")
+    parser.add_argument("--profiles", help="comma-separated profile names (default: all)")
+    parser.add_argument("--engine", default="aiosqlite", help="aiosqlite or thread")
+    parser.add_argument("--users", type=int, default=20, help="synthetic users")
+    parser.add_argument("--turns", type=int, default=10, help="synthetic turns per user")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
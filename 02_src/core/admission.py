@@ -0,0 +1,149 @@
+"""Admission control: bounded concurrency with a bounded, deadline-limited wait queue."""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from .metrics import summarize
+
+# Recent admissions kept for wait time percentiles
+METRICS_WINDOW = 1000
+# Smoothing factor for the service time estimate behind Retry-After
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Request shed by the admission controller."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"Server overloaded: {reason}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Lets at most max_concurrent requests run; up to max_queue wait in FIFO order.
+
+    A request arriving to a full queue is rejected at once with 429; one
+    that waits longer than queue_timeout seconds is rejected with 503.
+    Both carry a Retry-After estimated from the queue length and the
+    recent service time.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        window: int = METRICS_WINDOW,
+    ):
+        self._max_concurrent = max_concurrent
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service_time = 1.0  # seconds, smoothed
+
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "timeout": 0}
+        self._peak_queue = 0
+        self._wait_times: deque[float] = deque(maxlen=window)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    async def acquire(self) -> Callable[[], None]:
+        """Wait for a slot and return release(); raises AdmissionRejected."""
+        started = time.monotonic()
+        if self._active < self._max_concurrent and not self._waiters:
+            self._active += 1
+        else:
+            await self._wait(started)
+
+        self._admitted += 1
+        admitted_at = time.monotonic()
+        self._wait_times.append(admitted_at - started)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self._record_service_time(time.monotonic() - admitted_at)
+            self._hand_off()
+
+        return release
+
+    def get_metrics(self) -> dict:
+        """Concurrency, queue depth, wait times and rejection counters."""
+        return {
+            "active": self._active,
+            "max_concurrent": self._max_concurrent,
+            "queue_depth": len(self._waiters),
+            "max_queue": self._max_queue,
+            "peak_queue_depth": self._peak_queue,
+            "queue_timeout": self._queue_timeout,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "service_time_seconds": self._service_time,
+            "wait_seconds": summarize(self._wait_times),
+        }
+
+    async def _wait(self, started: float) -> None:
+        """Queue for a slot handed over by release()."""
+        if len(self._waiters) >= self._max_queue:
+            self._rejected["queue_full"] += 1
+            raise AdmissionRejected(429, self._retry_after(), "queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._peak_queue = max(self._peak_queue, len(self._waiters))
+        try:
+            await asyncio.wait({waiter}, timeout=self._queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self._rejected["timeout"] += 1
+            raise AdmissionRejected(
+                503,
+                self._retry_after(),
+                f"waited {time.monotonic() - started:.1f}s for a slot",
+            )
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Leave the queue; pass the slot on if it was handed over meanwhile."""
+        if waiter.done():
+            self._hand_off()
+            return
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def _hand_off(self) -> None:
+        """Give a freed slot to the oldest waiter, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _record_service_time(self, seconds: float) -> None:
+        self._service_time += SERVICE_TIME_ALPHA * (seconds - self._service_time)
+
+    def _retry_after(self) -> int:
+        """Seconds until the queue ahead is expected to drain."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(backlog * self._service_time / self._max_concurrent))
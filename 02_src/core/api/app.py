@@ -36,8 +36,12 @@ async def lifespan(app: FastAPI):
     await application.stop()
 
 
-def create_fastapi_app() -> FastAPI:
-    """Create and configure FastAPI application."""
+def create_fastapi_app(application: Application | None = None) -> FastAPI:
+    """Create and configure FastAPI application (around application if given)."""
+    global _app
+    if application is not None:
+        _app = application
+
     fastapi_app = FastAPI(
         title="Team Assistant API",
         description="Core API for Team Assistant system",
@@ -1,11 +1,14 @@
 """Control API routes."""
 
+from datetime import datetime
 from typing import Any
 
 from pydantic import BaseModel
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
 from ...app import IApplication
+from ...storage.ndjson import export_ndjson, import_ndjson, iter_lines
 
 
 router = APIRouter(prefix="/api/control", tags=["control"])
@@ -17,6 +20,23 @@ class StatusResponse(BaseModel):
     status: str
 
 
+class ImportResponse(BaseModel):
+    """Response model for NDJSON import."""
+
+    status: str
+    counts: dict[str, int]
+
+
+def _parse_timestamp(value: str | None, name: str) -> datetime | None:
+    """Parse an ISO timestamp query parameter."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp format")
+
+
 # Global SIM instance (will be set by main app)
 _sim_instance: Any = None
 
@@ -72,4 +92,29 @@ def create_control_router(app: IApplication) -> APIRouter:
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    @router.get("/export")
+    async def export_data(
+        after: str | None = Query(None, description="ISO timestamp lower bound"),
+        before: str | None = Query(None, description="ISO timestamp upper bound"),
+        team_id: str | None = Query(None, description="Filter by team"),
+    ) -> StreamingResponse:
+        """Stream dialogues, bus messages and trace events as NDJSON."""
+        after_dt = _parse_timestamp(after, "after")
+        before_dt = _parse_timestamp(before, "before")
+        return StreamingResponse(
+            export_ndjson(app.storage, after=after_dt, before=before_dt, team_id=team_id),
+            media_type="application/x-ndjson",
+        )
+
+    @router.post("/import", response_model=ImportResponse)
+    async def import_data(request: Request) -> dict:
+        """Bulk-insert an NDJSON request body (as produced by /export)."""
+        try:
+            counts = await import_ndjson(app.storage, iter_lines(request.stream()))
+            return {"status": "ok", "counts": counts}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
     return router
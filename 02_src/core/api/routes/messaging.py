@@ -1,9 +1,16 @@
 """Messaging API routes."""
 
+import json
+from typing import AsyncGenerator, AsyncIterator, Callable
+
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from ...admission import AdmissionRejected
 from ...app import IApplication
+from ...dialogue import MailboxFullError
 
 
 router = APIRouter(prefix="/api", tags=["messaging"])
@@ -29,11 +36,84 @@ def create_messaging_router(app: IApplication) -> APIRouter:
     async def send_message(request: MessageRequest) -> dict:
         """Send a message to the dialogue agent."""
         try:
-            response = await app.dialogue_agent.handle_message(
+            async with app.admission.admit():
+                response = await app.dialogue_agent.handle_message(
+                    user_id=request.user_id, text=request.text
+                )
+            return {"response": response}
+        except AdmissionRejected as e:
+            raise _overloaded(e)
+        except MailboxFullError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.post("/messages/stream")
+    async def send_message_stream(request: MessageRequest) -> StreamingResponse:
+        """Send a message and stream the response as Server-Sent Events.
+
+        Emits `data: {"delta": "..."}` per text chunk and a final
+        `event: done` with the full response.
+        """
+        try:
+            # The slot is held until the stream ends
+            release = await app.admission.acquire()
+        except AdmissionRejected as e:
+            raise _overloaded(e)
+        try:
+            chunks = await app.dialogue_agent.handle_message_stream(
                 user_id=request.user_id, text=request.text
             )
-            return {"response": response}
+        except MailboxFullError as e:
+            release()
+            raise HTTPException(status_code=429, detail=str(e))
         except Exception as e:
+            release()
             raise HTTPException(status_code=500, detail=str(e))
 
+        # A client that disconnects before the body starts never runs the
+        # generator's cleanup; the background task runs on teardown anyway
+        # and closing the stream releases the user's mailbox
+        return StreamingResponse(
+            _sse_events(chunks, release),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(_close_stream, chunks, release),
+        )
+
     return router
+
+
+def _overloaded(e: AdmissionRejected) -> HTTPException:
+    """HTTP error for a request shed by admission control."""
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def _sse_events(
+    chunks: AsyncGenerator[str, None], release: Callable[[], None]
+) -> AsyncIterator[str]:
+    """Format response chunks as Server-Sent Events."""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield f"data: {json.dumps({'delta': chunk}, ensure_ascii=False)}\n\n"
+    finally:
+        await _close_stream(chunks, release)
+    response = json.dumps({"response": "".join(parts)}, ensure_ascii=False)
+    yield f"event: done\ndata: {response}\n\n"
+
+
+async def _close_stream(
+    chunks: AsyncGenerator[str, None], release: Callable[[], None]
+) -> None:
+    """Close the response stream and free its admission slot; idempotent."""
+    # Let the agent save the (possibly partial) response on disconnect
+    try:
+        await chunks.aclose()
+    finally:
+        release()
@@ -7,6 +7,7 @@ from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException, Query
 
 from ...app import IApplication
+from ...models import Topic
 
 
 router = APIRouter(prefix="/api", tags=["observability"])
@@ -22,6 +23,33 @@ class TraceEventResponse(BaseModel):
     timestamp: datetime
 
 
+class BusMessageResponse(BaseModel):
+    """Response model for bus message."""
+
+    id: str
+    topic: str
+    payload: dict[str, Any]
+    source: str
+    timestamp: datetime
+
+
+class BusMessagePageResponse(BaseModel):
+    """Response model for a page of bus messages."""
+
+    items: list[BusMessageResponse]
+    next_cursor: str | None = None
+
+
+def _parse_timestamp(value: str | None, name: str) -> datetime | None:
+    """Parse an ISO timestamp query parameter."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp format")
+
+
 def create_observability_router(app: IApplication) -> APIRouter:
     """Create observability router."""
 
@@ -72,4 +100,62 @@ def create_observability_router(app: IApplication) -> APIRouter:
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    @router.get("/bus-messages", response_model=BusMessagePageResponse)
+    async def get_bus_messages(
+        topic: Topic | None = Query(None, description="Filter by topic"),
+        source: str | None = Query(None, description="Filter by source"),
+        after: str | None = Query(None, description="ISO timestamp lower bound"),
+        before: str | None = Query(None, description="ISO timestamp upper bound"),
+        dialogue_id: str | None = Query(None, description="Filter by payload dialogue_id"),
+        cursor: str | None = Query(None, description="Cursor from previous page"),
+        limit: int = Query(100, ge=1, le=1000),
+    ) -> dict:
+        """Get bus messages (newest first) with filters and cursor paging."""
+        try:
+            after_dt = _parse_timestamp(after, "after")
+            before_dt = _parse_timestamp(before, "before")
+
+            try:
+                page = await app.storage.query_bus_messages(
+                    topic=topic,
+                    source=source,
+                    after=after_dt,
+                    before=before_dt,
+                    dialogue_id=dialogue_id,
+                    cursor=cursor,
+                    limit=limit,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            return {
+                "items": [
+                    {
+                        "id": m.id,
+                        "topic": m.topic.value,
+                        "payload": m.payload,
+                        "source": m.source,
+                        "timestamp": m.timestamp.isoformat(),
+                    }
+                    for m in page.messages
+                ],
+                "next_cursor": page.next_cursor,
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.get("/metrics")
+    async def get_metrics() -> dict:
+        """Get in-process runtime metrics."""
+        metrics = {
+            "dialogue_agent": app.dialogue_agent.get_metrics(),
+            "admission": app.admission.get_metrics(),
+        }
+        if app.llm_cache:
+            metrics["llm_cache"] = app.llm_cache.get_metrics()
+        return metrics
+
     return router
@@ -0,0 +1,336 @@
+"""Sharded deployment: a front process routing each user to a fixed worker.
+
+Every worker is a full Application serving the API on a local socket and
+owns the in-memory dialogue state of the users hashed to it; on startup it
+restores only those users' dialogues. The front process only forwards
+requests, so no in-memory state is shared. Workers share the SQLite
+database file, so sharding requires a file DATABASE_URL; the parent
+process creates its schema and runs migrations once before starting them.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Callable
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from ..config import resolve_db_path
+from ..logging_config import get_logger
+from ..storage import Storage
+from .routes import control
+
+logger = get_logger(__name__)
+
+# Virtual nodes per worker on the hash ring
+DEFAULT_REPLICAS = 100
+# Requests routed by the user_id in their JSON body
+USER_ROUTES = {"/api/messages", "/api/messages/stream"}
+# Requests sent to every worker
+BROADCAST_ROUTES = {"/api/control/reset"}
+# Headers not forwarded between the client and a worker
+HOP_HEADERS = {"host", "connection", "content-length", "transfer-encoding", "keep-alive"}
+WORKER_START_TIMEOUT = 60.0
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes.
+
+    Each node owns `replicas` points on the ring, so adding or removing a
+    node moves only about 1/N of the keys.
+    """
+
+    def __init__(self, nodes: list[str], replicas: int = DEFAULT_REPLICAS):
+        if not nodes:
+            raise ValueError("HashRing needs at least one node")
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        """Node owning key."""
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+def _hash(value: str) -> int:
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def worker_addresses(workers: int, socket_dir: str, base_port: int) -> list[str]:
+    """Unix socket paths for the workers, or loopback ports where unsupported."""
+    if os.name == "nt":
+        return [f"127.0.0.1:{base_port + i}" for i in range(workers)]
+    return [os.path.join(socket_dir, f"team-assistant-{i}.sock") for i in range(workers)]
+
+
+def connect_workers(addresses: list[str]) -> dict[str, httpx.AsyncClient]:
+    """HTTP clients for worker addresses (socket paths or host:port)."""
+    clients = {}
+    for address in addresses:
+        if address.startswith("/"):
+            transport = httpx.AsyncHTTPTransport(uds=address)
+            clients[address] = httpx.AsyncClient(
+                transport=transport, base_url="http://worker", timeout=None
+            )
+        else:
+            clients[address] = httpx.AsyncClient(base_url=f"http://{address}", timeout=None)
+    return clients
+
+
+def create_front_app(clients: dict[str, httpx.AsyncClient]) -> FastAPI:
+    """FastAPI app forwarding the API to workers.
+
+    Messaging requests go to the worker owning their user_id; control
+    resets go to every worker; everything else (reads of the shared
+    database) goes to the first worker. /api/metrics collects all workers.
+    """
+    ring = HashRing(list(clients))
+    default = next(iter(clients))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+    front = FastAPI(
+        title="Team Assistant API",
+        description="Front process of a sharded deployment",
+        version="0.1.0",
+        lifespan=lifespan,
+    )
+    front.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173", "http://localhost:5174"],  # Vite default
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @front.get("/api/metrics")
+    async def get_metrics() -> dict:
+        """Metrics of every worker."""
+        responses = await asyncio.gather(
+            *(client.get("/api/metrics") for client in clients.values()),
+            return_exceptions=True,
+        )
+        workers = {}
+        for address, response in zip(clients, responses):
+            if isinstance(response, Exception):
+                workers[address] = {"error": str(response)}
+            else:
+                workers[address] = response.json()
+        return {"workers": workers}
+
+    # The SIM runs in the front process and calls the front API
+    @front.post("/api/control/sim/start")
+    async def start_sim() -> dict:
+        """Start SIM simulation."""
+        return await _run_sim("start")
+
+    @front.post("/api/control/sim/stop")
+    async def stop_sim() -> dict:
+        """Stop SIM simulation."""
+        return await _run_sim("stop")
+
+    @front.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+    )
+    async def proxy(path: str, request: Request) -> Response:
+        """Forward a request to its worker(s)."""
+        route = request.url.path
+        if route in BROADCAST_ROUTES:
+            body = await request.body()
+            results = await asyncio.gather(
+                *(_send(client, request, body) for client in clients.values()),
+                return_exceptions=True,
+            )
+            responses = [r for r in results if isinstance(r, httpx.Response)]
+            errors = [r for r in results if not isinstance(r, httpx.Response)]
+            # Relay the first failure, else any response; close all the others
+            failed = [r for r in responses if r.status_code >= 400]
+            relayed = None if errors else (failed or responses)[0]
+            for response in responses:
+                if response is not relayed:
+                    await response.aclose()
+            if errors:
+                raise errors[0]
+            return _stream(relayed)
+
+        if route in USER_ROUTES:
+            body = await request.body()
+            try:
+                user_id = json.loads(body)["user_id"]
+            except (ValueError, KeyError, TypeError):
+                raise HTTPException(status_code=422, detail="user_id is required")
+            client = clients[ring.node_for(str(user_id))]
+            return _stream(await _send(client, request, body))
+
+        return _stream(await _send(clients[default], request, request.stream()))
+
+    return front
+
+
+async def _run_sim(action: str) -> dict:
+    sim = control.get_sim_instance()
+    if not sim:
+        raise HTTPException(status_code=404, detail="SIM not configured")
+    await getattr(sim, action)()
+    return {"status": "ok"}
+
+
+async def _send(client: httpx.AsyncClient, request: Request, content) -> httpx.Response:
+    """Send request to a worker, streaming the response."""
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    upstream = client.build_request(
+        request.method,
+        request.url.path,
+        params=request.url.query,
+        headers=headers,
+        content=content,
+    )
+    try:
+        return await client.send(upstream, stream=True)
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=502, detail=f"Worker unavailable: {e}")
+
+
+def _stream(response: httpx.Response) -> StreamingResponse:
+    """Relay a worker response as it arrives (keeps SSE streaming)."""
+    headers = {
+        k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS
+    }
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=headers,
+        background=BackgroundTask(response.aclose),
+    )
+
+
+def shard_filter(addresses: list[str], index: int) -> Callable[[str], bool]:
+    """Whether a user_id is routed to worker index (the front app's ring)."""
+    ring = HashRing(addresses)
+    address = addresses[index]
+    return lambda user_id: ring.node_for(user_id) == address
+
+
+def run_worker(addresses: list[str], index: int, log_level: str = "info") -> None:
+    """Worker process entry point: serve the full API on addresses[index]."""
+    import uvicorn
+
+    from ..app import Application
+    from .app import create_fastapi_app
+
+    application = Application(
+        owns_user=shard_filter(addresses, index), migrate_storage=False, shard=index
+    )
+    app = create_fastapi_app(application)
+
+    address = addresses[index]
+    if address.startswith("/"):
+        if os.path.exists(address):
+            os.unlink(address)
+        uvicorn.run(app, uds=address, log_level=log_level)
+    else:
+        host, port = address.rsplit(":", 1)
+        uvicorn.run(app, host=host, port=int(port), log_level=log_level)
+
+
+async def prepare_database() -> None:
+    """Create the schema and run migrations before workers open the database."""
+    # Switches the file to WAL before the workers open it
+    storage = Storage(
+        resolve_db_path(os.getenv("DATABASE_URL")),
+        tuning=os.getenv("STORAGE_TUNING_PROFILE") or None,
+        shared=True,
+    )
+    await storage.init()
+    await storage.close()
+
+
+def run_sharded(
+    workers: int,
+    host: str,
+    port: int,
+    socket_dir: str,
+    base_port: int,
+    log_level: str = "info",
+) -> None:
+    """Start worker processes and serve the front app until interrupted."""
+    import uvicorn
+
+    if os.getenv("DATABASE_URL") == ":memory:":
+        raise ValueError("Sharded mode needs a database file shared by the workers")
+
+    # Concurrent DDL and migrations from every worker would contend for locks
+    asyncio.run(prepare_database())
+
+    addresses = worker_addresses(workers, socket_dir, base_port)
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(addresses, i, log_level),
+            name=f"shard-{i}",
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {workers} dialogue shards: {', '.join(addresses)}")
+
+    try:
+        _wait_for_workers(addresses, processes)
+        uvicorn.run(
+            create_front_app(connect_workers(addresses)),
+            host=host,
+            port=port,
+            log_level=log_level,
+        )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+
+def _wait_for_workers(
+    addresses: list[str], processes: list, timeout: float = WORKER_START_TIMEOUT
+) -> None:
+    """Block until every worker answers on its address."""
+    deadline = time.monotonic() + timeout
+    pending = list(addresses)
+    while pending:
+        for process in processes:
+            if not process.is_alive():
+                raise RuntimeError(f"Worker {process.name} exited during startup")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Workers not ready: {', '.join(pending)}")
+
+        address = pending[0]
+        if address.startswith("/"):
+            transport = httpx.HTTPTransport(uds=address)
+            base_url = "http://worker"
+        else:
+            transport = httpx.HTTPTransport()
+            base_url = f"http://{address}"
+        try:
+            with httpx.Client(transport=transport, base_url=base_url, timeout=1) as client:
+                client.get("/api/metrics")
+            pending.pop(0)
+        except httpx.TransportError:
+            time.sleep(0.2)
@@ -1,13 +1,17 @@
 """Application bootstrap and lifecycle management."""
 
 import os
-from typing import Protocol
+from typing import Callable, Protocol
 
+from .admission import AdmissionController
 from .config import resolve_db_path
 from .dialogue.agent import DialogueAgent, IDialogueAgent
+from .dialogue.context import ContextAssembler
+from .dialogue.flush import FlushPolicy, parse_team_policies
+from .dialogue.session import SessionPolicy
 from .event_bus import EventBus
 from .logging_config import get_logger
-from .llm import ILLMProvider, LLMProvider
+from .llm import CachingLLMProvider, ILLMProvider, LLMProvider
 from .processing import IProcessingLayer, ProcessingLayer
 from .processing.agents.echo_agent import EchoAgent
 from .output_router import OutputRouter
@@ -36,15 +40,120 @@ class IApplication(Protocol):
 class Application:
     """Main application bootstrap."""
 
-    def __init__(self, db_path: str | None = None):
+    def __init__(
+        self,
+        db_path: str | None = None,
+        owns_user: Callable[[str], bool] | None = None,
+        migrate_storage: bool = True,
+        shard: int | None = None,
+    ):
+        # Sharded workers: users routed to this process; the database is
+        # prepared once by the parent process (migrate_storage=False) and
+        # shared by every worker (shard is this worker's index)
+        self._owns_user = owns_user
+        self._migrate_storage = migrate_storage
+        self._shard = shard
+
         env_db_path = os.getenv("DATABASE_URL") if db_path is None else db_path
         self._db_path = resolve_db_path(env_db_path)
 
+        # In-memory storage mode: snapshot ":memory:" databases to disk
+        self._snapshot_path = os.getenv("DATABASE_SNAPSHOT_PATH") or None
+        self._snapshot_interval = float(os.getenv("DATABASE_SNAPSHOT_INTERVAL", "30"))
+        self._storage_tuning = os.getenv("STORAGE_TUNING_PROFILE") or None
+        self._storage_engine = os.getenv("STORAGE_ENGINE", "aiosqlite")
+        self._storage_serializer = os.getenv("STORAGE_SERIALIZER", "auto")
+        self._storage_token_estimator = os.getenv("STORAGE_TOKEN_ESTIMATOR", "chars")
+
+        # LLM context window: unset budget sends the full dialogue history
+        context_budget = os.getenv("CONTEXT_TOKEN_BUDGET")
+        self._context_token_budget = int(context_budget) if context_budget else None
+        self._context_recent_turns = int(os.getenv("CONTEXT_RECENT_TURNS", "20"))
+        self._context_summary_max_tokens = int(
+            os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "512")
+        )
+        # Retrieve relevant older messages instead of summarizing (needs numpy)
+        self._context_retrieval = os.getenv("CONTEXT_RETRIEVAL", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self._context_retrieval_turns = int(os.getenv("CONTEXT_RETRIEVAL_TURNS", "4"))
+        self._context_retrieval_team_turns = int(
+            os.getenv("CONTEXT_RETRIEVAL_TEAM_TURNS", "0")
+        )
+
+        # In-memory dialogue limits (0 disables the limit)
+        self._dialogue_max_active = int(os.getenv("DIALOGUE_MAX_ACTIVE", "10000"))
+        self._dialogue_idle_timeout = float(os.getenv("DIALOGUE_IDLE_TIMEOUT", "1800"))
+        self._dialogue_mailbox_depth = int(os.getenv("DIALOGUE_MAILBOX_DEPTH", "100"))
+        self._dialogue_coalesce = os.getenv("DIALOGUE_COALESCE", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self._dialogue_write_behind = os.getenv("DIALOGUE_WRITE_BEHIND", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        # Journal of queued writes, replayed on start after a crash; defaults
+        # to a file next to the database (none for ":memory:"), one per shard
+        self._dialogue_write_journal = os.getenv("DIALOGUE_WRITE_JOURNAL") or (
+            f"{self._db_path}.writes" if self._db_path != ":memory:" else None
+        )
+        if self._dialogue_write_journal and shard is not None:
+            self._dialogue_write_journal += f".{shard}"
+        self._dialogue_checkpoint_interval = float(
+            os.getenv("DIALOGUE_CHECKPOINT_INTERVAL", "5")
+        )
+
+        # Session rollover: a new dialogue after idle time or size (0 disables)
+        self._session_policy = SessionPolicy(
+            idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "0")) or None,
+            max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "0")) or None,
+            summary_max_tokens=self._context_summary_max_tokens,
+        )
+
+        # Buffer publication to Topic.INPUT: idle debounce, max age and size caps
+        self._flush_policy = FlushPolicy(
+            idle_delay=float(os.getenv("FLUSH_IDLE_DELAY", "2")),
+            max_age=float(os.getenv("FLUSH_MAX_AGE", "5")),
+            max_messages=int(os.getenv("FLUSH_MAX_MESSAGES", "50")),
+            max_bytes=int(os.getenv("FLUSH_MAX_BYTES", "65536")),
+        )
+        self._team_flush_policies = parse_team_policies(
+            os.getenv("FLUSH_TEAM_POLICIES"), self._flush_policy
+        )
+
+        # LLM response cache: LRU of LLM_CACHE_MAX_ENTRIES for LLM_CACHE_TTL
+        # seconds (0 never expires), optionally persisted to the database
+        self._llm_cache_enabled = os.getenv("LLM_CACHE", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        self._llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+        self._llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "3600")) or None
+        self._llm_cache_persistent = os.getenv("LLM_CACHE_PERSISTENT", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+
+        # Admission control for the messaging API
+        self._admission = AdmissionController(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "32")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+        )
+
         # Components (will be initialized in start())
         self._storage: IStorage | None = None
         self._event_bus: EventBus | None = None
         self._tracker: ITracker | None = None
         self._llm: ILLMProvider | None = None
+        self._llm_cache: CachingLLMProvider | None = None
         self._output_router: OutputRouter | None = None
         self._processing_layer: IProcessingLayer | None = None
         self._dialogue_agent: IDialogueAgent | None = None
@@ -54,8 +163,17 @@ class Application:
         logger.info("Starting application")
 
         # 1. Storage (no dependencies)
-        self._storage = Storage(self._db_path)
-        await self._storage.init()
+        self._storage = Storage(
+            self._db_path,
+            snapshot_path=self._snapshot_path if self._db_path == ":memory:" else None,
+            snapshot_interval=self._snapshot_interval,
+            tuning=self._storage_tuning,
+            engine=self._storage_engine,
+            serializer=self._storage_serializer,
+            token_estimator=self._storage_token_estimator,
+            shared=self._shard is not None,
+        )
+        await self._storage.init(migrate=self._migrate_storage)
         logger.info("Storage initialized")
 
         # 2. EventBus (depends on Storage for persistence)
@@ -68,6 +186,14 @@ class Application:
 
         # 4. LLMProvider (no internal dependencies)
         self._llm = LLMProvider()
+        if self._llm_cache_enabled:
+            self._llm_cache = CachingLLMProvider(
+                self._llm,
+                max_entries=self._llm_cache_max_entries,
+                ttl=self._llm_cache_ttl,
+                storage=self._storage if self._llm_cache_persistent else None,
+            )
+            self._llm = self._llm_cache
         logger.info("LLM provider initialized")
 
         # 5. OutputRouter (depends on EventBus)
@@ -95,11 +221,42 @@ class Application:
         logger.info("ProcessingLayer started with echo_agent")
 
         # 7. DialogueAgent (depends on LLM, EventBus, Storage, Tracker)
+        context_assembler = None
+        if self._context_retrieval:
+            from .dialogue.retrieval import RetrievalContextAssembler
+
+            context_assembler = RetrievalContextAssembler(
+                self._storage,
+                token_budget=self._context_token_budget or 4000,
+                recent_turns=self._context_recent_turns,
+                retrieved_turns=self._context_retrieval_turns,
+                team_turns=self._context_retrieval_team_turns,
+            )
+        elif self._context_token_budget:
+            context_assembler = ContextAssembler(
+                self._llm,
+                self._storage,
+                token_budget=self._context_token_budget,
+                recent_turns=self._context_recent_turns,
+                summary_max_tokens=self._context_summary_max_tokens,
+            )
         self._dialogue_agent = DialogueAgent(
             llm_provider=self._llm,
             event_bus=self._event_bus,
             storage=self._storage,
             tracker=self._tracker,
+            context_assembler=context_assembler,
+            max_dialogues=self._dialogue_max_active or None,
+            idle_timeout=self._dialogue_idle_timeout or None,
+            mailbox_depth=self._dialogue_mailbox_depth,
+            coalesce=self._dialogue_coalesce,
+            flush_policy=self._flush_policy,
+            team_flush_policies=self._team_flush_policies,
+            write_behind=self._dialogue_write_behind,
+            write_journal=self._dialogue_write_journal,
+            checkpoint_interval=self._dialogue_checkpoint_interval or None,
+            session_policy=self._session_policy,
+            owns_user=self._owns_user,
         )
         await self._dialogue_agent.start()
         logger.info("DialogueAgent started")
@@ -144,6 +301,8 @@ class Application:
         if self._storage:
             await self._storage.clear()
             logger.info("Storage cleared")
+        if self._llm_cache:
+            self._llm_cache.clear()
 
         # 3. Reset dialogue agent buffers and restart
         if self._dialogue_agent:
@@ -168,6 +327,16 @@ class Application:
             raise RuntimeError("Application not started")
         return self._dialogue_agent
 
+    @property
+    def admission(self) -> AdmissionController:
+        """Get messaging admission controller."""
+        return self._admission
+
+    @property
+    def llm_cache(self) -> CachingLLMProvider | None:
+        """Get LLM response cache (None when LLM_CACHE is off)."""
+        return self._llm_cache
+
     @property
     def processing_layer(self) -> IProcessingLayer:
         """Get processing layer instance."""
@@ -2,5 +2,25 @@
 
 from .agent import DialogueAgent, IDialogueAgent
 from .buffer import DialogueBuffer
+from .context import AssembledContext, ContextAssembler, IContextAssembler
+from .flush import FlushMetrics, FlushPolicy, IFlushPolicy
+from .mailbox import MailboxFullError, Mailboxes
+from .pipeline import Pipeline, StepTimings
+from .session import SessionPolicy
 
-__all__ = ["DialogueAgent", "IDialogueAgent", "DialogueBuffer"]
+__all__ = [
+    "DialogueAgent",
+    "IDialogueAgent",
+    "DialogueBuffer",
+    "AssembledContext",
+    "ContextAssembler",
+    "IContextAssembler",
+    "FlushMetrics",
+    "FlushPolicy",
+    "IFlushPolicy",
+    "MailboxFullError",
+    "Mailboxes",
+    "Pipeline",
+    "StepTimings",
+    "SessionPolicy",
+]
@@ -1,20 +1,40 @@
 """DialogueAgent implementation."""
 
 import asyncio
+import time
 import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Protocol
+from itertools import islice
+from typing import AsyncGenerator, AsyncIterator, Callable, Protocol
 
 from ..event_bus import IEventBus
 from ..llm import ILLMProvider
 from ..logging_config import get_logger
-from ..models import BusMessage, DialogueState, Message, Topic
-from ..storage import IStorage
+from ..models import BusMessage, DialogueSession, DialogueState, Message, Topic, TraceEvent
+from ..storage import IStorage, WriteBehind, WriteJournal
+from ..storage.ndjson import message_to_record, record_to_model, trace_event_to_record
 from ..tracker import ITracker
 from .buffer import DialogueBuffer
+from .context import AssembledContext, IContextAssembler
+from .flush import FlushMetrics, FlushPolicy, IFlushPolicy
+from .mailbox import DEFAULT_MAILBOX_DEPTH, MailboxFullError, Mailboxes
+from .pipeline import Pipeline, StepTimings
+from .scheduler import IScheduler, TimerWheel
+from .session import SessionPolicy, SessionStats, summarize_session
 
 logger = get_logger(__name__)
 
+# In-memory dialogue limits; cold dialogues are persisted and rehydrated lazily
+DEFAULT_MAX_DIALOGUES = 10_000
+DEFAULT_IDLE_TIMEOUT = 1800.0
+
+# Seconds between checkpoints of changed DialogueStates
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+
+ERROR_RESPONSE = "Извините, произошла ошибка при генерации ответа."
+
 
 class IDialogueAgent(Protocol):
     """Managing all Dialogues."""
@@ -23,6 +43,10 @@ class IDialogueAgent(Protocol):
         """Accept Message from User, generate response via LLM, save both to Storage, add to DialogueBuffer. Return response text."""
         ...
 
+    async def handle_message_stream(self, user_id: str, text: str) -> AsyncIterator[str]:
+        """Like handle_message, but return the response as text chunks."""
+        ...
+
     async def deliver_output(self, user_id: str, content: str) -> None:
         """Deliver output from OutputRouter to user. Save as system Message."""
         ...
@@ -45,41 +69,137 @@ class DialogueAgent:
         event_bus: IEventBus,
         storage: IStorage,
         tracker: ITracker,
+        context_assembler: IContextAssembler | None = None,
+        scheduler: IScheduler | None = None,
+        max_dialogues: int | None = DEFAULT_MAX_DIALOGUES,
+        idle_timeout: float | None = DEFAULT_IDLE_TIMEOUT,
+        mailbox_depth: int = DEFAULT_MAILBOX_DEPTH,
+        coalesce: bool = False,
+        flush_policy: IFlushPolicy | None = None,
+        team_flush_policies: dict[str, IFlushPolicy] | None = None,
+        write_behind: bool = False,
+        write_journal: str | None = None,
+        checkpoint_interval: float | None = DEFAULT_CHECKPOINT_INTERVAL,
+        session_policy: SessionPolicy | None = None,
+        owns_user: Callable[[str], bool] | None = None,
     ):
         self._llm = llm_provider
         self._event_bus = event_bus
         self._storage = storage
         self._tracker = tracker
+        # Without an assembler the whole dialogue history is sent to the LLM
+        self._context_assembler = context_assembler
 
         # In-memory storage
         self._buffers: dict[str, DialogueBuffer] = {}
         self._dialogue_ids: dict[str, str] = {}  # user_id -> dialogue_id
-        self._buffer_tasks: dict[str, asyncio.Task] = {}
+        # Flush deadlines are armed only while a buffer has unpublished messages
+        self._scheduler = scheduler or TimerWheel()
+        # Flush policy per team (looked up on activation), falling back to default
+        self._flush_policy = flush_policy or FlushPolicy()
+        self._team_flush_policies = team_flush_policies or {}
+        self._user_flush_policies: dict[str, IFlushPolicy] = {}
+        self._flush_reasons: dict[str, str] = {}  # user_id -> reason of armed flush
+        self._flush_metrics = FlushMetrics()
+        # dialogue_id -> LLM context, appended as messages are saved
+        self._contexts: dict[str, list[dict]] = {}
+        # dialogue_id -> running token totals of the context (see token_prefix)
+        self._context_tokens: dict[str, list[int]] = {}
+        # One actor per user: turns for a user run in order, users in parallel
+        self._mailboxes = Mailboxes(max_depth=mailbox_depth)
+        self._mailbox_depth = mailbox_depth
+        # Coalescing: messages arriving during a turn share the next LLM call
+        self._coalesce = coalesce
+        self._queued_turns: dict[str, _QueuedTurn] = {}
+        self._coalesced_messages = 0
+        # Duration of each step of a turn, to see where its latency goes
+        self._step_timings = StepTimings()
+        # Write-behind: traces and assistant messages are saved after the reply;
+        # with write_journal (a file path) queued writes survive a crash
+        self._writes = (
+            WriteBehind(journal=WriteJournal(write_journal) if write_journal else None)
+            if write_behind
+            else None
+        )
         self._running = False
 
+        # Eviction: user_id -> last activity (monotonic), least recent first
+        self._max_dialogues = max_dialogues
+        self._idle_timeout = idle_timeout
+        self._last_active: OrderedDict[str, float] = OrderedDict()
+        self._evictions = 0
+        self._rehydrations = 0
+        self._restored = 0
+        self._restore_seconds = 0.0
+        # Sharded mode: only users routed to this process are restored
+        self._owns_user = owns_user
+
+        # Sessions: a user's dialogue rolls over to a new dialogue_id per policy
+        self._session_policy = session_policy or SessionPolicy()
+        self._session_stats: dict[str, SessionStats] = {}  # dialogue_id -> stats
+        self._carryovers: dict[str, str | None] = {}  # dialogue_id -> carryover
+        self._rollovers: Counter[str] = Counter()
+
+        # Checkpointing: users whose DialogueState changed since it was saved
+        self._checkpoint_interval = checkpoint_interval
+        self._checkpoint_task: asyncio.Task | None = None
+        self._dirty: set[str] = set()
+        self._checkpoints = 0
+        self._checkpointed_states = 0
+        self._checkpoint_seconds = 0.0
+
     async def start(self) -> None:
         """Restore DialogueState from Storage."""
         logger.info("Starting DialogueAgent")
+        await self._scheduler.start()
+        if self._writes:
+            await self._writes.start()
+            replayed = await self._writes.recover(self._replay_writes)
+            if replayed:
+                logger.info(f"Replayed {replayed} journaled writes")
+        await self._restore()
         self._running = True
+        if self._checkpoint_interval:
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
 
     async def stop(self) -> None:
         """Save DialogueState, stop accepting messages."""
         logger.info("Stopping DialogueAgent")
         self._running = False
 
-        # Cancel all buffer tasks
-        for task in self._buffer_tasks.values():
-            task.cancel()
+        # Drop queued turns and pending flush deadlines
+        await self._mailboxes.close()
+        await self._scheduler.stop()
+        if self._writes:
+            await self._writes.stop()
 
-        # Save all dialogue states
-        for user_id, buffer in self._buffers.items():
-            dialogue_id = self._dialogue_ids.get(user_id, str(uuid.uuid4()))
-            state = DialogueState(
-                user_id=user_id,
-                dialogue_id=dialogue_id,
-                last_published_timestamp=buffer._dialogue_state.last_published_timestamp,
-            )
-            await self._storage.save_dialogue_state(state)
+        if self._checkpoint_task:
+            self._checkpoint_task.cancel()
+            try:
+                await self._checkpoint_task
+            except asyncio.CancelledError:
+                pass
+            self._checkpoint_task = None
+
+        # Save dialogue states changed since the last checkpoint
+        await self._checkpoint()
+        self._forget_all()
+
+    def _forget_all(self) -> None:
+        """Drop every in-memory dialogue; start() rebuilds them from Storage.
+
+        Storage may change while stopped (Application.reset() clears it), so
+        nothing cached before stop() is reused.
+        """
+        for dialogue_id in set(self._contexts) | set(self._dialogue_ids.values()):
+            self._forget_dialogue(dialogue_id)
+        self._buffers.clear()
+        self._dialogue_ids.clear()
+        self._last_active.clear()
+        self._user_flush_policies.clear()
+        self._flush_reasons.clear()
+        self._queued_turns.clear()
+        self._dirty.clear()
 
     async def handle_message(self, user_id: str, text: str) -> str:
         """Accept Message from User, generate response via LLM, save both to Storage."""
@@ -88,31 +208,143 @@ class DialogueAgent:
 
         logger.info(f"Message received from {user_id}: {text[:100]}...")
 
-        # Get or create dialogue_id
-        state = None
-        if user_id not in self._dialogue_ids:
-            state = await self._storage.get_dialogue_state(user_id)
-            if state:
-                self._dialogue_ids[user_id] = state.dialogue_id
-            else:
-                self._dialogue_ids[user_id] = str(uuid.uuid4())
+        if self._coalesce:
+            return await self._coalesce_message(user_id, text)
+        return await self._mailboxes.submit(
+            user_id, lambda: self._handle_turn(user_id, [text])
+        )
 
-        dialogue_id = self._dialogue_ids[user_id]
+    async def _coalesce_message(self, user_id: str, text: str) -> str:
+        """Join the user's queued turn if there is one, else queue a new turn.
+
+        Every caller whose message joined the turn gets its response.
+        """
+        turn = self._queued_turns.get(user_id)
+        if turn is not None:
+            if len(turn.texts) >= self._mailbox_depth:
+                raise MailboxFullError(
+                    f"Queued turn for {user_id} is full ({self._mailbox_depth} messages)"
+                )
+            turn.texts.append(text)
+            self._coalesced_messages += 1
+            return await asyncio.shield(turn.result)
+
+        loop = asyncio.get_running_loop()
+        turn = _QueuedTurn(texts=[text], result=loop.create_future())
+        self._queued_turns[user_id] = turn
+
+        async def run() -> str:
+            # Messages arriving from here on start the next turn
+            if self._queued_turns.get(user_id) is turn:
+                del self._queued_turns[user_id]
+            return await self._handle_turn(user_id, turn.texts)
+
+        submitted = asyncio.create_task(self._mailboxes.submit(user_id, run))
+        submitted.add_done_callback(lambda task: _copy_result(task, turn.result))
+        try:
+            return await asyncio.shield(turn.result)
+        finally:
+            if turn.result.done() and self._queued_turns.get(user_id) is turn:
+                del self._queued_turns[user_id]
+
+    async def _handle_turn(self, user_id: str, texts: list[str]) -> str:
+        """Process user messages with one LLM call; runs in the user's mailbox."""
+        started = time.monotonic()
+        buffer = await self._activate(user_id)
+        buffer = await self._rollover_if_due(user_id, buffer)
+        for text in texts:
+            dialogue_id = await self._receive(user_id, buffer, text)
 
-        # Get or create buffer
-        if user_id not in self._buffers:
-            if state is None:
-                state = await self._storage.get_dialogue_state(user_id)
-            if not state:
-                state = DialogueState(user_id=user_id, dialogue_id=dialogue_id)
-            self._buffers[user_id] = DialogueBuffer(state)
-
-            # Start background timer for this user
-            self._buffer_tasks[user_id] = asyncio.create_task(
-                self._buffer_timer(user_id)
+        # Generate response
+        try:
+            context = await self._build_context(dialogue_id)
+            llm_started = time.monotonic()
+            response_text = await self._llm.complete(
+                messages=context.messages, system=context.system
             )
+            self._step_timings.record({"llm": time.monotonic() - llm_started})
+            logger.debug(f"Generated response for {user_id}: {response_text[:50]}...")
+        except Exception as e:
+            logger.error(f"LLM error for {user_id}: {e}", exc_info=True)
+            response_text = ERROR_RESPONSE
 
-        buffer = self._buffers[user_id]
+        await self._respond(
+            user_id, buffer, dialogue_id, response_text, {"message_count": len(texts)}
+        )
+        self._step_timings.record({"turn": time.monotonic() - started})
+        return response_text
+
+    async def handle_message_stream(self, user_id: str, text: str) -> AsyncIterator[str]:
+        """Like handle_message, but return the response as text chunks.
+
+        The user Message is saved before this returns; the assistant Message
+        is saved when the stream ends (or is closed early, with the text
+        received so far). The user's mailbox is held until then, so callers
+        must exhaust or aclose() the stream, including when it is never
+        iterated (aclose() may be called more than once).
+        """
+        if not self._running:
+            raise RuntimeError("DialogueAgent not started")
+
+        logger.info(f"Message received from {user_id}: {text[:100]}...")
+
+        release = await self._mailboxes.hold(user_id)
+        try:
+            buffer = await self._activate(user_id)
+            buffer = await self._rollover_if_due(user_id, buffer)
+            dialogue_id = await self._receive(user_id, buffer, text)
+        except BaseException:
+            release()
+            raise
+        return _ResponseStream(
+            self._stream_response(user_id, buffer, dialogue_id, release), release
+        )
+
+    async def _stream_response(
+        self,
+        user_id: str,
+        buffer: DialogueBuffer,
+        dialogue_id: str,
+        release: Callable[[], None],
+    ) -> AsyncIterator[str]:
+        """Stream the LLM response and save it once the stream ends."""
+        chunks: list[str] = []
+        started = time.monotonic()
+        first_chunk_ms = None
+        try:
+            context = await self._build_context(dialogue_id)
+            async for chunk in self._llm.stream(
+                messages=context.messages, system=context.system
+            ):
+                if first_chunk_ms is None:
+                    first_chunk_ms = round((time.monotonic() - started) * 1000)
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"LLM error for {user_id}: {e}", exc_info=True)
+            if not chunks:
+                chunks.append(ERROR_RESPONSE)
+                yield ERROR_RESPONSE
+        finally:
+            try:
+                if chunks:
+                    await self._respond(
+                        user_id,
+                        buffer,
+                        dialogue_id,
+                        "".join(chunks),
+                        {"first_chunk_ms": first_chunk_ms},
+                    )
+            finally:
+                release()
+
+    async def _receive(self, user_id: str, buffer: DialogueBuffer, text: str) -> str:
+        """Save the user Message, add it to the buffer and context. Return dialogue_id.
+
+        Saving, tracking and loading a cold context run concurrently; the
+        message joins the buffer and context once it is saved and loaded.
+        """
+        dialogue_id = self._dialogue_ids[user_id]
 
         # Create user message
         user_message = Message(
@@ -123,33 +355,67 @@ class DialogueAgent:
             timestamp=datetime.now(timezone.utc),
         )
 
-        await self._storage.save_message(user_message)
-        buffer.add(user_message)
-
-        await self._tracker.track(
-            event_type="message_received",
-            actor="dialogue_agent",
-            data={
-                "user_id": user_id,
-                "dialogue_id": dialogue_id,
-                "message_text": text,
-            },
-        )
-
-        # Get dialogue context
-        all_messages = await self._storage.get_messages(dialogue_id)
-        context = [
-            {"role": msg.role, "content": msg.content} for msg in all_messages
-        ]
-
-        # Generate response
-        try:
-            response_text = await self._llm.complete(messages=context)
-            logger.debug(f"Generated response for {user_id}: {response_text[:50]}...")
-        except Exception as e:
-            logger.error(f"LLM error for {user_id}: {e}", exc_info=True)
-            response_text = "Извините, произошла ошибка при генерации ответа."
+        async def save() -> None:
+            await self._save_message(user_message)
+
+        async def track() -> None:
+            await self._track(
+                "message_received",
+                {
+                    "user_id": user_id,
+                    "dialogue_id": dialogue_id,
+                    "message_text": text,
+                },
+            )
 
+        async def load_context() -> None:
+            await self._load_context(dialogue_id, exclude_id=user_message.id)
+
+        async def append() -> None:
+            buffer.add(user_message)
+            self._schedule_flush(user_id)
+            self._append_context(user_message)
+
+        pipeline = Pipeline()
+        pipeline.step("save", save)
+        pipeline.step("track", track)
+        # Write-behind applies writes in order: earlier queued messages are
+        # only readable once the save has gone through
+        pipeline.step("load_context", load_context, after=("save",) if self._writes else ())
+        pipeline.step("append", append, after=("save", "load_context"))
+        await pipeline.run()
+        self._step_timings.record(pipeline.timings)
+        return dialogue_id
+
+    async def _build_context(self, dialogue_id: str) -> AssembledContext:
+        """Messages and system prompt for the next LLM call."""
+        started = time.monotonic()
+        context = await self._get_context(dialogue_id)
+        if self._context_assembler:
+            assembled = await self._context_assembler.assemble(
+                dialogue_id, context, self._context_tokens.get(dialogue_id)
+            )
+        else:
+            assembled = AssembledContext(messages=list(context))
+        if self._session_policy.enabled:
+            carryover = await self._get_carryover(dialogue_id)
+            if carryover:
+                previous = f"Summary of the previous sessions:\n{carryover}"
+                assembled.system = (
+                    f"{previous}\n\n{assembled.system}" if assembled.system else previous
+                )
+        self._step_timings.record({"assemble": time.monotonic() - started})
+        return assembled
+
+    async def _respond(
+        self,
+        user_id: str,
+        buffer: DialogueBuffer,
+        dialogue_id: str,
+        response_text: str,
+        trace_data: dict | None = None,
+    ) -> None:
+        """Save the assistant Message, add it to the buffer and context."""
         # Create assistant message
         assistant_message = Message(
             id=str(uuid.uuid4()),
@@ -159,30 +425,33 @@ class DialogueAgent:
             timestamp=datetime.now(timezone.utc),
         )
 
-        await self._storage.save_message(assistant_message)
+        await self._save_message(assistant_message, wait=False)
         buffer.add(assistant_message)
+        self._schedule_flush(user_id)
+        self._append_context(assistant_message)
 
-        await self._tracker.track(
-            event_type="message_responded",
-            actor="dialogue_agent",
-            data={
+        await self._track(
+            "message_responded",
+            {
                 "user_id": user_id,
                 "dialogue_id": dialogue_id,
                 "response_text": response_text,
+                **(trace_data or {}),
             },
         )
 
-        return response_text
-
     async def deliver_output(self, user_id: str, content: str) -> None:
         """Deliver output from OutputRouter to user."""
         if not self._running:
             raise RuntimeError("DialogueAgent not started")
 
-        # Get or create dialogue_id
-        if user_id not in self._dialogue_ids:
-            self._dialogue_ids[user_id] = str(uuid.uuid4())
+        await self._mailboxes.submit(
+            user_id, lambda: self._deliver_turn(user_id, content)
+        )
 
+    async def _deliver_turn(self, user_id: str, content: str) -> None:
+        """Save delivered output; runs in the user's mailbox."""
+        await self._activate(user_id)
         dialogue_id = self._dialogue_ids[user_id]
 
         # Create system message
@@ -194,67 +463,558 @@ class DialogueAgent:
             timestamp=datetime.now(timezone.utc),
         )
 
-        await self._storage.save_message(system_message)
+        await self._save_message(system_message)
+        self._append_context(system_message)
 
-        await self._tracker.track(
-            event_type="output_delivered",
-            actor="dialogue_agent",
-            data={
+        await self._track(
+            "output_delivered",
+            {
                 "user_id": user_id,
                 "content": content,
             },
         )
 
-    async def _buffer_timer(self, user_id: str) -> None:
-        """Background timer for publishing buffered messages."""
-        while self._running:
+    def get_metrics(self) -> dict:
+        """In-memory dialogue counts, eviction counters and mailbox depths."""
+        return {
+            "mailboxes": self._mailboxes.get_metrics(),
+            "active_dialogues": len(self._buffers),
+            "cached_contexts": len(self._contexts),
+            "max_dialogues": self._max_dialogues,
+            "idle_timeout": self._idle_timeout,
+            "evictions": self._evictions,
+            "rehydrations": self._rehydrations,
+            "restored_dialogues": self._restored,
+            "restore_seconds": self._restore_seconds,
+            "checkpoint": {
+                "interval": self._checkpoint_interval,
+                "dirty": len(self._dirty),
+                "checkpoints": self._checkpoints,
+                "saved_states": self._checkpointed_states,
+                "last_seconds": self._checkpoint_seconds,
+            },
+            "sessions": {
+                "rollovers": sum(self._rollovers.values()),
+                "reasons": dict(self._rollovers),
+            },
+            "coalesced_messages": self._coalesced_messages,
+            "steps_ms": self._step_timings.snapshot(),
+            "flush": self._flush_metrics.snapshot(),
+            **({"writes": self._writes.get_metrics()} if self._writes else {}),
+        }
+
+    async def _activate(self, user_id: str) -> DialogueBuffer:
+        """Return the user's buffer, rehydrating DialogueState from Storage if cold."""
+        buffer = self._buffers.get(user_id)
+        if buffer is None:
+            state = await self._storage.get_dialogue_state(user_id)
+            stored = state is not None
+            unpublished: list[Message] = []
+            if state:
+                self._rehydrations += 1
+                unpublished = await self._storage.get_messages(
+                    state.dialogue_id, after=state.last_published_timestamp
+                )
+            else:
+                state = DialogueState(user_id=user_id, dialogue_id=str(uuid.uuid4()))
+
+            team_id = await self._get_team_id(user_id) if self._team_flush_policies else None
+
+            # Another message for this user may have activated it meanwhile
+            buffer = self._buffers.get(user_id)
+            if buffer is None:
+                buffer = self._add_buffer(state, unpublished, team_id)
+                if not stored:
+                    self._dirty.add(user_id)
+                    await self._start_session(state.dialogue_id, user_id)
+
+        self._last_active[user_id] = time.monotonic()
+        self._last_active.move_to_end(user_id)
+        if self._idle_timeout:
+            self._scheduler.arm(("idle", user_id), self._idle_timeout, self._on_idle)
+        await self._evict_over_limit(keep=user_id)
+        return buffer
+
+    async def _restore(self) -> None:
+        """Rebuild buffers of stored dialogues in one pass, up to max_dialogues.
+
+        Messages newer than a dialogue's last published timestamp are
+        buffered again and flushed per the flush policy. Dialogues beyond the
+        limit are rehydrated lazily on their next message. With owns_user set,
+        other shards' dialogues are left to them, so they are neither
+        published twice nor overwritten by a stale copy on eviction.
+        """
+        started = time.monotonic()
+        dialogues = await self._storage.get_restorable_dialogues(
+            limit=self._max_dialogues, user_filter=self._owns_user
+        )
+
+        # Most recently updated first; _last_active is least recent first
+        for state, team_id, unpublished in reversed(dialogues):
+            self._add_buffer(state, unpublished, team_id)
+            if self._idle_timeout:
+                self._scheduler.arm(
+                    ("idle", state.user_id), self._idle_timeout, self._on_idle
+                )
+
+        self._restored = len(dialogues)
+        self._restore_seconds = time.monotonic() - started
+        logger.info(
+            f"Restored {self._restored} dialogues in {self._restore_seconds:.3f}s"
+        )
+
+    def _add_buffer(
+        self,
+        state: DialogueState,
+        unpublished: list[Message],
+        team_id: str | None = None,
+    ) -> DialogueBuffer:
+        """Register a buffer for state with its unpublished messages.
+
+        team_id picks the team's flush policy, if it has one; without it the
+        user keeps the policy already resolved for them.
+        """
+        user_id = state.user_id
+        buffer = DialogueBuffer(state)
+        for message in unpublished:
+            buffer.add(message)
+        self._buffers[user_id] = buffer
+        self._dialogue_ids[user_id] = state.dialogue_id
+        self._last_active[user_id] = time.monotonic()
+        policy = self._team_flush_policies.get(team_id) if team_id else None
+        if policy:
+            self._user_flush_policies[user_id] = policy
+        self._schedule_flush(user_id)
+        return buffer
+
+    async def _checkpoint_loop(self) -> None:
+        """Background task saving changed DialogueStates every checkpoint_interval."""
+        while True:
+            await asyncio.sleep(self._checkpoint_interval)
             try:
-                await asyncio.sleep(5)  # 5 second timeout
-
-                if user_id not in self._buffers:
-                    continue
-
-                buffer = self._buffers[user_id]
-                unpublished = buffer.get_unpublished()
-
-                if unpublished:
-                    # Publish to EventBus
-                    bus_message = BusMessage(
-                        id=str(uuid.uuid4()),
-                        topic=Topic.INPUT,
-                        payload={
-                            "user_id": user_id,
-                            "dialogue_id": self._dialogue_ids[user_id],
-                            "messages": [
-                                {
-                                    "id": msg.id,
-                                    "role": msg.role,
-                                    "content": msg.content,
-                                    "timestamp": msg.timestamp.isoformat(),
-                                }
-                                for msg in unpublished
-                            ],
-                        },
-                        source="dialogue_agent",
-                        timestamp=datetime.now(timezone.utc),
-                    )
+                await self._checkpoint()
+            except Exception as e:
+                logger.error(f"DialogueState checkpoint failed: {e}", exc_info=True)
+
+    async def _checkpoint(self) -> int:
+        """Save DialogueStates changed since the last checkpoint in one transaction.
+
+        Return the number of states saved. On failure or cancellation they
+        stay dirty for the next checkpoint.
+        """
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+        states = [
+            self._buffers[user_id]._dialogue_state
+            for user_id in dirty
+            if user_id in self._buffers
+        ]
 
-                    await self._event_bus.publish(bus_message)
+        started = time.monotonic()
+        try:
+            await self._storage.save_dialogue_states(states)
+        except BaseException:
+            # Also when stop() cancels the loop mid-save: its final checkpoint
+            # must still see these states
+            self._dirty |= dirty
+            raise
+        self._checkpoint_seconds = time.monotonic() - started
+        self._checkpoints += 1
+        self._checkpointed_states += len(states)
+        logger.debug(f"Checkpointed {len(states)} dialogue states")
+        return len(states)
+
+    async def _evict_over_limit(self, keep: str) -> None:
+        """Evict least recently active dialogues above max_dialogues."""
+        if not self._max_dialogues:
+            return
+        excess = len(self._buffers) - self._max_dialogues
+        if excess <= 0:
+            return
+
+        # Dialogues with unpublished messages wait for their flush, ones with
+        # a turn in progress for the turn
+        candidates = (
+            user_id
+            for user_id in self._last_active
+            if user_id != keep
+            and self._buffers[user_id].unpublished_count == 0
+            and not self._mailboxes.busy(user_id)
+        )
+        for user_id in list(islice(candidates, excess)):
+            await self._evict(user_id)
+
+    async def _on_idle(self, key: tuple[str, str]) -> None:
+        """Evict a dialogue after idle_timeout without activity."""
+        user_id = key[1]
+        buffer = self._buffers.get(user_id)
+        if buffer is None:
+            return
+        if buffer.unpublished_count or self._mailboxes.busy(user_id):
+            self._scheduler.arm(key, self._idle_timeout, self._on_idle)
+            return
+        await self._evict(user_id)
+
+    async def _evict(self, user_id: str) -> bool:
+        """Persist DialogueState and drop the user's in-memory structures."""
+        buffer = self._buffers.get(user_id)
+        if buffer is None or self._mailboxes.busy(user_id):
+            return False
+        last_active = self._last_active.get(user_id)
+
+        await self._storage.save_dialogue_state(buffer._dialogue_state)
+
+        # Activity during the save keeps the dialogue warm
+        if (
+            self._buffers.get(user_id) is not buffer
+            or self._last_active.get(user_id) != last_active
+            or buffer.unpublished_count
+            or self._mailboxes.busy(user_id)
+        ):
+            return False
+
+        dialogue_id = self._dialogue_ids.pop(user_id)
+        del self._buffers[user_id]
+        self._dirty.discard(user_id)
+        del self._last_active[user_id]
+        self._user_flush_policies.pop(user_id, None)
+        self._flush_reasons.pop(user_id, None)
+        self._scheduler.cancel(user_id)
+        self._scheduler.cancel(("idle", user_id))
+        self._forget_dialogue(dialogue_id)
+
+        self._evictions += 1
+        logger.debug(f"Evicted dialogue {dialogue_id} of {user_id}")
+        return True
+
+    def _forget_dialogue(self, dialogue_id: str) -> None:
+        """Drop the dialogue's cached context and session data."""
+        self._contexts.pop(dialogue_id, None)
+        self._context_tokens.pop(dialogue_id, None)
+        self._session_stats.pop(dialogue_id, None)
+        self._carryovers.pop(dialogue_id, None)
+        if self._context_assembler:
+            self._context_assembler.forget(dialogue_id)
+
+    async def _start_session(
+        self,
+        dialogue_id: str,
+        user_id: str,
+        previous_dialogue_id: str | None = None,
+        carryover: str | None = None,
+    ) -> None:
+        """Record the session of a new dialogue."""
+        await self._storage.save_dialogue_session(
+            DialogueSession(
+                dialogue_id=dialogue_id,
+                user_id=user_id,
+                started_at=datetime.now(timezone.utc),
+                previous_dialogue_id=previous_dialogue_id,
+                carryover=carryover,
+            )
+        )
+        if self._session_policy.enabled:
+            self._session_stats[dialogue_id] = SessionStats()
+            self._carryovers[dialogue_id] = carryover
+
+    async def _rollover_if_due(
+        self, user_id: str, buffer: DialogueBuffer
+    ) -> DialogueBuffer:
+        """Open a new dialogue for the user if the session policy says so.
+
+        Runs before a user message joins the dialogue. Return the buffer
+        the message goes to.
+        """
+        if not self._session_policy.enabled:
+            return buffer
+        dialogue_id = self._dialogue_ids[user_id]
+        stats = self._session_stats.get(dialogue_id)
+        if stats is None:
+            count, last_message_at = await self._storage.get_message_stats(dialogue_id)
+            stats = self._session_stats[dialogue_id] = SessionStats(count, last_message_at)
+
+        reason = self._session_policy.rollover_reason(stats, datetime.now(timezone.utc))
+        if reason is None:
+            return buffer
+        return await self._rollover(user_id, dialogue_id, reason)
+
+    async def _rollover(
+        self, user_id: str, dialogue_id: str, reason: str
+    ) -> DialogueBuffer:
+        """End the user's dialogue and start a new one carrying its summary."""
+        # Subscribers get the rest of the old dialogue under its own id
+        self._scheduler.cancel(user_id)
+        self._flush_reasons[user_id] = "rollover"
+        await self._flush_buffer(user_id)
+
+        carryover = await self._get_carryover(dialogue_id)
+        try:
+            history, history_start = await self._get_session_tail(dialogue_id)
+            summary = await self._storage.get_dialogue_summary(dialogue_id)
+            carryover = await summarize_session(
+                self._llm,
+                history,
+                carryover,
+                summary,
+                self._session_policy,
+                history_start=history_start,
+            )
+        except Exception as e:
+            # The new session starts with the previous carryover only
+            logger.warning(f"Session summary failed for {dialogue_id}: {e}")
+
+        state = DialogueState(user_id=user_id, dialogue_id=str(uuid.uuid4()))
+        if self._writes:
+            await self._writes.drain()
+        async with self._storage.batch():
+            await self._storage.end_dialogue_session(
+                dialogue_id, datetime.now(timezone.utc)
+            )
+            await self._start_session(state.dialogue_id, user_id, dialogue_id, carryover)
+            await self._storage.save_dialogue_state(state)
 
-                    # Update published timestamp
-                    buffer.set_published_timestamp(datetime.now(timezone.utc))
+        self._forget_dialogue(dialogue_id)
+        buffer = self._add_buffer(state, [])
+        # An in-flight checkpoint may still write the old state
+        self._dirty.add(user_id)
+        self._rollovers[reason] += 1
+        logger.info(f"Rolled over dialogue of {user_id} ({reason}): {state.dialogue_id}")
+        return buffer
+
+    async def _get_carryover(self, dialogue_id: str) -> str | None:
+        """Summary of earlier sessions the dialogue started with."""
+        if dialogue_id not in self._carryovers:
+            session = await self._storage.get_dialogue_session(dialogue_id)
+            self._carryovers[dialogue_id] = session.carryover if session else None
+        return self._carryovers[dialogue_id]
+
+    async def _get_session_tail(self, dialogue_id: str) -> tuple[list[dict], int]:
+        """Messages to summarize at rollover and the position of the first one.
+
+        A cold dialogue is not loaded whole: only its most recent messages
+        within summary_input_tokens are read, picked by the stored running
+        token totals.
+        """
+        if dialogue_id in self._contexts:
+            return self._contexts[dialogue_id], 0
+        window = await self._storage.get_token_window(
+            dialogue_id, self._session_policy.summary_input_tokens
+        )
+        message_count, _ = await self._storage.get_dialogue_tokens(dialogue_id)
+        history = [{"role": m.role, "content": m.content} for m in window]
+        return history, message_count - len(window)
+
+    async def _get_context(self, dialogue_id: str) -> list[dict]:
+        """Return the cached LLM context, loading it from Storage on a miss."""
+        await self._load_context(dialogue_id)
+        return self._contexts[dialogue_id]
+
+    async def _load_context(self, dialogue_id: str, exclude_id: str | None = None) -> None:
+        """Cache the dialogue's context from Storage unless it is cached.
+
+        exclude_id leaves out a message being saved concurrently, which may
+        or may not be stored yet; the caller appends it once it is.
+        """
+        if dialogue_id in self._contexts:
+            return
+        messages = await self._storage.get_messages(dialogue_id)
+        if dialogue_id in self._contexts:
+            return
+
+        context, tokens = [], [0]
+        for msg in messages:
+            if msg.id != exclude_id:
+                context.append({"role": msg.role, "content": msg.content})
+                tokens.append(tokens[-1] + self._token_count(msg))
+        self._contexts[dialogue_id] = context
+        self._context_tokens[dialogue_id] = tokens
+
+    def _append_context(self, message: Message) -> None:
+        """Append a saved message to its dialogue's context if it is cached.
+
+        A cold dialogue is left uncached so the next load reads the full
+        history from Storage.
+        """
+        context = self._contexts.get(message.dialogue_id)
+        if context is not None:
+            context.append({"role": message.role, "content": message.content})
+            tokens = self._context_tokens[message.dialogue_id]
+            tokens.append(tokens[-1] + self._token_count(message))
+
+    async def _save_message(self, message: Message, wait: bool = True) -> None:
+        """Save a Message; with write-behind and wait=False it is only queued.
+
+        Writes go through one FIFO, so a waited-for save also persists every
+        message queued before it. The token count is set before queueing so
+        the context can use it right away.
+        """
+        self._token_count(message)
+        if self._writes is None:
+            await self._storage.save_message(message)
+        elif wait:
+            await self._writes.submit(lambda: self._storage.save_message(message))
+        else:
+            await self._writes.enqueue(
+                lambda: self._storage.save_message(message), message_to_record(message)
+            )
 
-                    await self._tracker.track(
-                        event_type="buffer_published",
-                        actor="dialogue_agent",
-                        data={
-                            "user_id": user_id,
-                            "dialogue_id": self._dialogue_ids[user_id],
-                            "message_count": len(unpublished),
-                        },
-                    )
+        stats = self._session_stats.get(message.dialogue_id)
+        if stats:
+            stats.message_count += 1
+            stats.last_message_at = message.timestamp
+
+    def _token_count(self, message: Message) -> int:
+        """Message.token_count, estimated (once) if Storage has not set it."""
+        if message.token_count is None:
+            message.token_count = self._storage.token_estimator.count(message.content)
+        return message.token_count
+
+    async def _track(self, event_type: str, data: dict) -> None:
+        """Track a dialogue_agent event; queued when write-behind is on.
+
+        A queued event gets its id up front, so replaying it from the
+        journal cannot save it twice.
+        """
+        if self._writes is None:
+            await self._tracker.track(
+                event_type=event_type, actor="dialogue_agent", data=data
+            )
+            return
 
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Buffer timer error for {user_id}: {e}", exc_info=True)
+        event = TraceEvent(
+            id=str(uuid.uuid4()),
+            event_type=event_type,
+            actor="dialogue_agent",
+            data=data,
+            timestamp=datetime.now(timezone.utc),
+        )
+        await self._writes.enqueue(
+            lambda: self._storage.save_trace_event(event), trace_event_to_record(event)
+        )
+
+    async def _replay_writes(self, records: list[dict]) -> None:
+        """Save journaled messages and trace events; rows already saved are skipped."""
+        models = [record_to_model(record) for record in records]
+        await self._storage.import_rows(
+            messages=[m for m in models if isinstance(m, Message)],
+            trace_events=[m for m in models if isinstance(m, TraceEvent)],
+        )
+
+    async def _get_team_id(self, user_id: str) -> str | None:
+        """Team of the user, for picking its flush policy."""
+        user = await self._storage.get_user(user_id)
+        return user.team_id if user else None
+
+    def _schedule_flush(self, user_id: str) -> None:
+        """(Re)arm the buffer flush deadline from the user's flush policy."""
+        buffer = self._buffers[user_id]
+        if not buffer.unpublished_count:
+            return
+        policy = self._user_flush_policies.get(user_id, self._flush_policy)
+        delay, reason = policy.flush_delay(buffer, time.monotonic())
+        self._flush_reasons[user_id] = reason
+        self._scheduler.arm(user_id, delay, self._flush_buffer)
+
+    async def _flush_buffer(self, user_id: str) -> None:
+        """Publish buffered messages to EventBus."""
+        if not self._running or user_id not in self._buffers:
+            return
+
+        buffer = self._buffers[user_id]
+        unpublished = buffer.get_unpublished()
+        reason = self._flush_reasons.pop(user_id, "idle")
+
+        if unpublished:
+            now = time.monotonic()
+            latency = now - (buffer.first_unpublished_at or now)
+
+            # Subscribers may read the dialogue from Storage: persist it first
+            if self._writes:
+                await self._writes.drain()
+
+            # Publish to EventBus
+            bus_message = BusMessage(
+                id=str(uuid.uuid4()),
+                topic=Topic.INPUT,
+                payload={
+                    "user_id": user_id,
+                    "dialogue_id": self._dialogue_ids[user_id],
+                    "messages": [
+                        {
+                            "id": msg.id,
+                            "role": msg.role,
+                            "content": msg.content,
+                            "timestamp": msg.timestamp.isoformat(),
+                        }
+                        for msg in unpublished
+                    ],
+                },
+                source="dialogue_agent",
+                timestamp=datetime.now(timezone.utc),
+            )
+
+            await self._event_bus.publish(bus_message)
+
+            # Advance the cursor past exactly what was published; messages
+            # added while publishing stay pending for the next flush
+            buffer.mark_published(len(unpublished))
+            self._dirty.add(user_id)
+            self._flush_metrics.record(len(unpublished), latency, reason)
+
+            await self._track(
+                "buffer_published",
+                {
+                    "user_id": user_id,
+                    "dialogue_id": self._dialogue_ids[user_id],
+                    "message_count": len(unpublished),
+                    "reason": reason,
+                },
+            )
+
+            if self._buffers.get(user_id) is buffer and not self._scheduler.is_armed(user_id):
+                self._schedule_flush(user_id)
+
+
+@dataclass
+class _QueuedTurn:
+    """User messages waiting in a mailbox to be answered by one LLM call."""
+
+    texts: list[str]
+    result: asyncio.Future
+
+
+def _copy_result(task: asyncio.Task, future: asyncio.Future) -> None:
+    """Propagate a finished task's outcome to a future."""
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class _ResponseStream:
+    """Chunk iterator that releases the user's mailbox even if never started.
+
+    Closing an async generator that has not started skips its finally
+    block, so release() is also called from aclose() (it is idempotent).
+    """
+
+    def __init__(self, chunks: AsyncGenerator[str, None], release: Callable[[], None]):
+        self._chunks = chunks
+        self._release = release
+
+    def __aiter__(self) -> "_ResponseStream":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._chunks.__anext__()
+
+    async def aclose(self) -> None:
+        try:
+            await self._chunks.aclose()
+        finally:
+            self._release()
@@ -1,40 +1,127 @@
 """DialogueBuffer implementation."""
 
+import time
+from collections import deque
 from datetime import datetime
+from itertools import islice
 
 from ..models import DialogueState, Message
 
+# Published messages kept for get_all() after publication
+DEFAULT_PUBLISHED_TAIL = 20
+
 
 class DialogueBuffer:
-    """Computed subset of Messages for publication to EventBus."""
+    """Computed subset of Messages for publication to EventBus.
+
+    Messages are kept in arrival order with a cursor at the first
+    unpublished one. Published messages beyond a bounded tail are dropped,
+    so an idle dialogue holds at most published_tail messages.
+    """
 
-    def __init__(self, dialogue_state: DialogueState):
+    def __init__(
+        self, dialogue_state: DialogueState, published_tail: int = DEFAULT_PUBLISHED_TAIL
+    ):
         self._dialogue_state = dialogue_state
-        self._messages: list[Message] = []
+        self._published_tail = published_tail
+        self._messages: deque[Message] = deque()
+        self._published = 0  # leading messages already published
+
+        # Unpublished size and arrival times (monotonic) for flush policies
+        self._unpublished_bytes = 0
+        self._first_unpublished_at: float | None = None
+        self._last_added_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def unpublished_count(self) -> int:
+        """Number of messages waiting for publication."""
+        return len(self._messages) - self._published
+
+    @property
+    def unpublished_bytes(self) -> int:
+        """UTF-8 size of the unpublished message contents."""
+        return self._unpublished_bytes
+
+    @property
+    def first_unpublished_at(self) -> float | None:
+        """Monotonic time the oldest unpublished message arrived."""
+        return self._first_unpublished_at
+
+    @property
+    def last_added_at(self) -> float | None:
+        """Monotonic time the newest unpublished message arrived."""
+        return self._last_added_at
 
     def add(self, message: Message) -> None:
         """Add a message to the buffer."""
         self._messages.append(message)
 
-    def get_unpublished(self) -> list[Message]:
-        """Get messages after last_published_timestamp."""
-        if not self._dialogue_state.last_published_timestamp:
-            return self._messages.copy()
+        # Messages at or before the published timestamp count as published
+        last_published = self._dialogue_state.last_published_timestamp
+        if (
+            last_published
+            and self._published == len(self._messages) - 1
+            and message.timestamp <= last_published
+        ):
+            self._advance(1)
+            return
+
+        now = time.monotonic()
+        if self._first_unpublished_at is None:
+            self._first_unpublished_at = now
+        self._last_added_at = now
+        self._unpublished_bytes += len(message.content.encode("utf-8"))
 
-        return [
-            msg
-            for msg in self._messages
-            if msg.timestamp > self._dialogue_state.last_published_timestamp
-        ]
+    def get_unpublished(self) -> list[Message]:
+        """Get messages after the published cursor."""
+        return list(islice(self._messages, self._published, None))
 
     def get_all(self) -> list[Message]:
-        """Get all messages in buffer."""
-        return self._messages.copy()
+        """Get the published tail and all unpublished messages."""
+        return list(self._messages)
 
     def clear(self) -> None:
         """Clear the buffer."""
         self._messages.clear()
+        self._published = 0
+        self._reset_unpublished()
+
+    def mark_published(self, count: int) -> None:
+        """Move the cursor past the first count unpublished messages."""
+        count = min(count, self.unpublished_count)
+        if count <= 0:
+            return
+        last = self._messages[self._published + count - 1]
+        self._dialogue_state.last_published_timestamp = last.timestamp
+        self._advance(count)
 
     def set_published_timestamp(self, timestamp: datetime) -> None:
         """Update the last published timestamp."""
         self._dialogue_state.last_published_timestamp = timestamp
+
+        count = 0
+        for message in islice(self._messages, self._published, None):
+            if message.timestamp > timestamp:
+                break
+            count += 1
+        self._advance(count)
+
+    def _advance(self, count: int) -> None:
+        """Advance the cursor and trim published messages beyond the tail."""
+        if count <= 0:
+            return
+        self._published += count
+        while self._published > self._published_tail:
+            self._messages.popleft()
+            self._published -= 1
+        self._reset_unpublished()
+
+    def _reset_unpublished(self) -> None:
+        """Recompute unpublished size; remaining messages count as just arrived."""
+        remaining = self.get_unpublished()
+        self._unpublished_bytes = sum(len(m.content.encode("utf-8")) for m in remaining)
+        self._first_unpublished_at = time.monotonic() if remaining else None
+        self._last_added_at = self._first_unpublished_at
@@ -0,0 +1,193 @@
+"""Token-budgeted LLM context with rolling summaries."""
+
+import bisect
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Protocol
+
+from ..llm import ILLMProvider
+from ..logging_config import get_logger
+from ..models import DialogueSummary
+from ..storage import IStorage
+from ..storage.tokens import estimate_tokens
+
+logger = get_logger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a team member "
+    "and an assistant. Merge the new messages into the current summary. Keep "
+    "facts, decisions, tasks, names and open questions; drop small talk. "
+    "Answer with the updated summary only, in the language of the conversation."
+)
+
+
+def token_prefix(history: list[dict]) -> list[int]:
+    """Running token totals: element i is the tokens of history[:i]."""
+    totals = [0]
+    for message in history:
+        totals.append(totals[-1] + estimate_tokens(message["content"]))
+    return totals
+
+
+def window_start(
+    history: list[dict],
+    start: int,
+    budget: int,
+    turns: int,
+    tokens: list[int] | None = None,
+) -> int:
+    """Index of the first message of the most recent window that fits.
+
+    The window holds at most turns messages and budget tokens (the last
+    message always), begins no earlier than start and opens with a user
+    message. tokens are the running totals from token_prefix(), computed
+    when not given; the window is found by binary search over them.
+    """
+    if tokens is None:
+        tokens = token_prefix(history)
+    end = len(history)
+    last = end - 1
+    lowest = min(max(start, end - turns, 0), last)
+    index = bisect.bisect_left(tokens, tokens[end] - budget, lo=lowest, hi=last)
+
+    # The LLM expects the conversation to open with a user message
+    while index < len(history) - 1 and history[index]["role"] != "user":
+        index += 1
+    return index
+
+
+@dataclass
+class AssembledContext:
+    """Messages and system prompt to send to the LLM."""
+
+    messages: list[dict]
+    system: str | None = None
+
+
+class IContextAssembler(Protocol):
+    """Builds the LLM context for a dialogue turn."""
+
+    async def assemble(
+        self, dialogue_id: str, history: list[dict], tokens: list[int] | None = None
+    ) -> AssembledContext:
+        """Fit the dialogue history into the context budget.
+
+        tokens are the running token totals of history (see token_prefix),
+        computed from the messages when not given.
+        """
+        ...
+
+    def forget(self, dialogue_id: str) -> None:
+        """Drop cached state for a dialogue."""
+        ...
+
+
+class ContextAssembler:
+    """Keeps recent turns verbatim and folds older ones into a stored summary.
+
+    While the unsummarized tail of the dialogue fits token_budget and
+    recent_turns, it is sent as is. Once it overflows, the oldest messages
+    are merged into the summary until the tail is back to half of both
+    limits, so the summarization call runs once every several turns rather
+    than on every message.
+    """
+
+    def __init__(
+        self,
+        llm_provider: ILLMProvider,
+        storage: IStorage,
+        token_budget: int = 4000,
+        recent_turns: int = 20,
+        summary_max_tokens: int = 512,
+    ):
+        self._llm = llm_provider
+        self._storage = storage
+        self._token_budget = token_budget
+        self._recent_turns = recent_turns
+        self._summary_max_tokens = summary_max_tokens
+
+        # dialogue_id -> summary (None once loaded and absent)
+        self._summaries: dict[str, DialogueSummary | None] = {}
+
+    async def assemble(
+        self, dialogue_id: str, history: list[dict], tokens: list[int] | None = None
+    ) -> AssembledContext:
+        """Fit the dialogue history into the context budget."""
+        if tokens is None or len(tokens) != len(history) + 1:
+            tokens = token_prefix(history)
+        summary = await self._get_summary(dialogue_id)
+        start = min(summary.summarized_count, len(history)) if summary else 0
+        summary_tokens = estimate_tokens(summary.summary) if summary else 0
+
+        tail = history[start:]
+        if len(tail) <= self._recent_turns and (
+            tokens[-1] - tokens[start] <= self._token_budget - summary_tokens
+        ):
+            return AssembledContext(messages=list(tail), system=self._system(summary))
+
+        keep_from = window_start(
+            history,
+            start,
+            max(1, self._token_budget // 2 - self._summary_max_tokens),
+            max(1, self._recent_turns // 2),
+            tokens,
+        )
+        try:
+            summary = await self._summarize(
+                dialogue_id, summary, history[start:keep_from], keep_from
+            )
+        except Exception as e:
+            # Send the trimmed window anyway; the next turn retries the summary
+            logger.warning(f"Summary update failed for {dialogue_id}: {e}")
+
+        return AssembledContext(
+            messages=list(history[keep_from:]), system=self._system(summary)
+        )
+
+    def forget(self, dialogue_id: str) -> None:
+        """Drop cached state for a dialogue."""
+        self._summaries.pop(dialogue_id, None)
+
+    async def _get_summary(self, dialogue_id: str) -> DialogueSummary | None:
+        if dialogue_id not in self._summaries:
+            self._summaries[dialogue_id] = await self._storage.get_dialogue_summary(
+                dialogue_id
+            )
+        return self._summaries[dialogue_id]
+
+    async def _summarize(
+        self,
+        dialogue_id: str,
+        previous: DialogueSummary | None,
+        evicted: list[dict],
+        summarized_count: int,
+    ) -> DialogueSummary | None:
+        """Merge evicted messages into the summary and persist it."""
+        if not evicted:
+            return previous
+
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in evicted)
+        prompt = f"New messages:\n{transcript}"
+        if previous:
+            prompt = f"Current summary:\n{previous.summary}\n\n{prompt}"
+
+        text = await self._llm.complete(
+            messages=[{"role": "user", "content": prompt}],
+            system=SUMMARY_SYSTEM_PROMPT,
+            max_tokens=self._summary_max_tokens,
+        )
+        summary = DialogueSummary(
+            dialogue_id=dialogue_id,
+            summary=text,
+            summarized_count=summarized_count,
+            updated_at=datetime.now(timezone.utc),
+        )
+        await self._storage.save_dialogue_summary(summary)
+        self._summaries[dialogue_id] = summary
+        return summary
+
+    @staticmethod
+    def _system(summary: DialogueSummary | None) -> str | None:
+        if not summary:
+            return None
+        return f"Summary of the earlier conversation:\n{summary.summary}"
@@ -0,0 +1,97 @@
+"""When to publish a DialogueBuffer to Topic.INPUT, and flush metrics."""
+
+import json
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, fields
+from typing import Protocol
+
+from ..metrics import summarize
+from .buffer import DialogueBuffer
+
+# Recent flushes kept for percentile metrics
+METRICS_WINDOW = 1000
+
+
+class IFlushPolicy(Protocol):
+    """Decides when a buffer with unpublished messages is published."""
+
+    def flush_delay(self, buffer: DialogueBuffer, now: float) -> tuple[float, str]:
+        """Seconds from now until the buffer should be flushed, and why."""
+        ...
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    """Idle debounce bounded by a max age, with size thresholds.
+
+    A buffer is flushed once no message has arrived for idle_delay seconds,
+    but no later than max_age seconds after its first unpublished message.
+    Reaching max_messages or max_bytes flushes immediately.
+    """
+
+    idle_delay: float = 2.0
+    max_age: float = 5.0
+    max_messages: int = 50
+    max_bytes: int = 64 * 1024
+
+    def flush_delay(self, buffer: DialogueBuffer, now: float) -> tuple[float, str]:
+        """Seconds from now until the buffer should be flushed, and why."""
+        if buffer.unpublished_count >= self.max_messages:
+            return 0.0, "max_messages"
+        if buffer.unpublished_bytes >= self.max_bytes:
+            return 0.0, "max_bytes"
+
+        idle_due = (buffer.last_added_at or now) + self.idle_delay
+        age_due = (buffer.first_unpublished_at or now) + self.max_age
+        if idle_due <= age_due:
+            return max(0.0, idle_due - now), "idle"
+        return max(0.0, age_due - now), "max_age"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FlushPolicy":
+        """Build a policy from a dict of field overrides."""
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown flush policy fields: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+def parse_team_policies(value: str | None, base: FlushPolicy) -> dict[str, FlushPolicy]:
+    """Parse per-team overrides: JSON object of team_id -> policy fields."""
+    if not value:
+        return {}
+    data = json.loads(value)
+    return {
+        team_id: FlushPolicy.from_dict({**asdict(base), **overrides})
+        for team_id, overrides in data.items()
+    }
+
+
+class FlushMetrics:
+    """Batch sizes, flush latency and flush reasons."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._flushes = 0
+        self._messages = 0
+        self._reasons: Counter[str] = Counter()
+        self._batch_sizes: deque[int] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def record(self, batch_size: int, latency: float, reason: str) -> None:
+        """Record one flush: messages published and seconds since the first one arrived."""
+        self._flushes += 1
+        self._messages += batch_size
+        self._reasons[reason] += 1
+        self._batch_sizes.append(batch_size)
+        self._latencies.append(latency)
+
+    def snapshot(self) -> dict:
+        """Current metrics (percentiles over the recent window)."""
+        return {
+            "flushes": self._flushes,
+            "messages": self._messages,
+            "reasons": dict(self._reasons),
+            "batch_size": summarize(self._batch_sizes),
+            "latency_seconds": summarize(self._latencies),
+        }
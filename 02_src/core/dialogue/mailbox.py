@@ -0,0 +1,155 @@
+"""Per-dialogue mailboxes: ordered processing within a key, parallel across keys."""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from ..logging_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Pending jobs allowed per mailbox (the running job is not counted)
+DEFAULT_MAILBOX_DEPTH = 100
+
+
+class MailboxFullError(RuntimeError):
+    """Raised when a mailbox is at its depth limit."""
+
+
+@dataclass(eq=False)
+class _Mailbox:
+    jobs: deque[tuple[Callable[[], Awaitable[Any]], asyncio.Future]] = field(
+        default_factory=deque
+    )
+    task: asyncio.Task | None = None
+
+
+class Mailboxes:
+    """Lightweight actors keyed by dialogue.
+
+    Each key has a FIFO mailbox drained by its own worker task, so jobs for
+    one key run strictly one after another in submission order while
+    different keys run concurrently. A worker exists only while its mailbox
+    has work; idle keys cost nothing.
+    """
+
+    def __init__(self, max_depth: int = DEFAULT_MAILBOX_DEPTH):
+        self._max_depth = max_depth
+        self._mailboxes: dict[Hashable, _Mailbox] = {}
+        self._processed = 0
+        self._rejected = 0
+        self._peak_depth = 0
+
+    def depth(self, key: Hashable) -> int:
+        """Pending jobs for key, excluding the one running."""
+        mailbox = self._mailboxes.get(key)
+        return len(mailbox.jobs) if mailbox else 0
+
+    def busy(self, key: Hashable) -> bool:
+        """Whether key has a job running or pending."""
+        return key in self._mailboxes
+
+    async def submit(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn in key's mailbox and return its result.
+
+        Raises MailboxFullError if max_depth jobs are already pending. If the
+        caller is cancelled before fn starts, fn is skipped; once started it
+        runs to completion.
+        """
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes[key] = _Mailbox()
+        if len(mailbox.jobs) >= self._max_depth:
+            self._rejected += 1
+            raise MailboxFullError(
+                f"Mailbox for {key} is full ({self._max_depth} pending)"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        mailbox.jobs.append((fn, future))
+        self._peak_depth = max(self._peak_depth, len(mailbox.jobs))
+        if mailbox.task is None:
+            mailbox.task = asyncio.create_task(self._drain(key, mailbox))
+
+        return await future
+
+    async def hold(self, key: Hashable) -> Callable[[], None]:
+        """Wait for key's turn and hold it until the returned release() is called.
+
+        For work that outlives a single call, such as a streamed response.
+        """
+        started = asyncio.get_running_loop().create_future()
+        finished = asyncio.Event()
+
+        async def job() -> None:
+            started.set_result(None)
+            await finished.wait()
+
+        submitted = asyncio.create_task(self.submit(key, job))
+        # Retrieve the outcome so a cancelled or failed hold is not reported
+        submitted.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            await asyncio.wait({started, submitted}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            submitted.cancel()
+            finished.set()
+            raise
+        if not started.done():
+            started.cancel()
+            submitted.result()  # Raises MailboxFullError
+
+        return finished.set
+
+    def get_metrics(self) -> dict:
+        """Mailbox depths and counters."""
+        depths = [len(m.jobs) for m in self._mailboxes.values()]
+        return {
+            "active_mailboxes": len(self._mailboxes),
+            "pending_jobs": sum(depths),
+            "max_depth": max(depths, default=0),
+            "peak_depth": self._peak_depth,
+            "depth_limit": self._max_depth,
+            "processed": self._processed,
+            "rejected": self._rejected,
+        }
+
+    async def close(self) -> None:
+        """Cancel running workers and pending jobs."""
+        mailboxes = list(self._mailboxes.values())
+        self._mailboxes.clear()
+        for mailbox in mailboxes:
+            for _, future in mailbox.jobs:
+                future.cancel()
+            mailbox.jobs.clear()
+            if mailbox.task:
+                mailbox.task.cancel()
+        await asyncio.gather(
+            *(m.task for m in mailboxes if m.task), return_exceptions=True
+        )
+
+    async def _drain(self, key: Hashable, mailbox: _Mailbox) -> None:
+        """Worker: run queued jobs in order until the mailbox is empty."""
+        try:
+            while mailbox.jobs:
+                fn, future = mailbox.jobs.popleft()
+                if future.done():  # Caller gave up before the job started
+                    continue
+                try:
+                    result = await fn()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+                self._processed += 1
+        finally:
+            mailbox.task = None
+            if self._mailboxes.get(key) is mailbox and not mailbox.jobs:
+                del self._mailboxes[key]
@@ -0,0 +1,84 @@
+"""Dependency-aware async step pipeline with per-step timings."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from ..metrics import summarize
+
+# Recent runs kept per step for percentiles
+METRICS_WINDOW = 1000
+
+
+class Pipeline:
+    """Steps that start as soon as the steps they depend on have finished.
+
+    Steps take no arguments and share data through closures. Independent
+    steps run concurrently; if any step fails, the others are cancelled and
+    the error is raised from run().
+    """
+
+    def __init__(self):
+        self._steps: dict[str, tuple[Callable[[], Awaitable[Any]], tuple[str, ...]]] = {}
+        self.timings: dict[str, float] = {}  # step -> seconds, excluding waits
+
+    def step(
+        self, name: str, fn: Callable[[], Awaitable[Any]], after: tuple[str, ...] = ()
+    ) -> None:
+        """Add a step; its dependencies must already be added."""
+        if name in self._steps:
+            raise ValueError(f"Duplicate pipeline step: {name}")
+        missing = [dependency for dependency in after if dependency not in self._steps]
+        if missing:
+            raise ValueError(f"Step {name} depends on unknown steps: {', '.join(missing)}")
+        self._steps[name] = (fn, after)
+
+    async def run(self) -> dict[str, Any]:
+        """Run all steps and return their results by name."""
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_step(name: str) -> Any:
+            fn, after = self._steps[name]
+            for dependency in after:
+                await tasks[dependency]
+            started = time.monotonic()
+            result = await fn()
+            self.timings[name] = time.monotonic() - started
+            return result
+
+        for name in self._steps:
+            tasks[name] = asyncio.create_task(run_step(name))
+        try:
+            done, pending = await asyncio.wait(
+                tasks.values(), return_when=asyncio.FIRST_EXCEPTION
+            )
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        for task in tasks.values():
+            if task in done and not task.cancelled() and task.exception():
+                # Collect the cancelled steps so none is left running
+                await asyncio.gather(*pending, return_exceptions=True)
+                raise task.exception()
+        return {name: task.result() for name, task in tasks.items()}
+
+
+class StepTimings:
+    """Latency percentiles per pipeline step."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._window = window
+        self._seconds: dict[str, deque[float]] = {}
+
+    def record(self, timings: dict[str, float]) -> None:
+        """Record one run's step durations in seconds."""
+        for name, seconds in timings.items():
+            if name not in self._seconds:
+                self._seconds[name] = deque(maxlen=self._window)
+            self._seconds[name].append(seconds)
+
+    def snapshot(self) -> dict:
+        """Milliseconds per step (percentiles over the recent window)."""
+        return {name: summarize(values, scale=1000) for name, values in self._seconds.items()}
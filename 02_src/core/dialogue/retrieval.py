@@ -0,0 +1,307 @@
+"""Offline retrieval of relevant earlier messages for the LLM context.
+
+Requires numpy (optional dependency, enabled with CONTEXT_RETRIEVAL=1).
+"""
+
+import hashlib
+import math
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from ..storage import IStorage
+from .context import AssembledContext, estimate_tokens, token_prefix, window_start
+
+DEFAULT_DIMENSIONS = 512
+# Team index entries kept per team, oldest dropped first
+DEFAULT_MAX_TEAM_ENTRIES = 10_000
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Unigrams and bigrams hashed into a fixed-size unit vector.
+
+    Needs no vocabulary or training, so vectors can be computed for one
+    message at a time and compared across dialogues.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self._dimensions = dimensions
+
+    @property
+    def dimensions(self) -> int:
+        return self._dimensions
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """One L2-normalized float32 row per text."""
+        vectors = np.zeros((len(texts), self._dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = Counter(tokens)
+            features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+            for feature, count in features.items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = -1.0 if h & 0x80000000 else 1.0
+                vectors[row, h % self._dimensions] += sign * (1.0 + math.log(count))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class VectorIndex:
+    """Growable matrix of unit vectors with cosine top-k search.
+
+    Each entry also carries an integer group (e.g. the source dialogue),
+    so searches can mask groups out without touching the keys.
+    """
+
+    def __init__(self, dimensions: int, max_size: int | None = None):
+        self._vectors = np.zeros((16, dimensions), dtype=np.float32)
+        self._groups = np.zeros(16, dtype=np.int64)
+        self._keys: list = []
+        self._max_size = max_size
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, keys: list, vectors: np.ndarray, group: int = 0) -> None:
+        """Append vectors of one group; beyond max_size the oldest entries are dropped."""
+        size = len(self._keys)
+        needed = size + len(keys)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+            grown[:size] = self._vectors[:size]
+            self._vectors = grown
+            groups = np.zeros(capacity, dtype=np.int64)
+            groups[:size] = self._groups[:size]
+            self._groups = groups
+        self._vectors[size:needed] = vectors
+        self._groups[size:needed] = group
+        self._keys.extend(keys)
+
+        if self._max_size and len(self._keys) > self._max_size:
+            drop = len(self._keys) - self._max_size
+            self._vectors[: self._max_size] = self._vectors[drop : len(self._keys)]
+            self._groups[: self._max_size] = self._groups[drop : len(self._keys)]
+            del self._keys[:drop]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        rows: int | None = None,
+        mask: np.ndarray | None = None,
+    ) -> list[tuple[object, float]]:
+        """Top k (key, cosine) among the first rows entries where mask is True."""
+        size = len(self._keys) if rows is None else min(rows, len(self._keys))
+        if size == 0 or k <= 0:
+            return []
+        scores = self._vectors[:size] @ query
+        if mask is not None:
+            scores = np.where(mask[:size], scores, -np.inf)
+
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[i], float(scores[i])) for i in top if scores[i] > -np.inf]
+
+    def keys(self) -> list:
+        return list(self._keys)
+
+    def groups(self) -> np.ndarray:
+        """Group of each entry (a view, in key order)."""
+        return self._groups[: len(self._keys)]
+
+    def last_key(self, group: int) -> object | None:
+        """Key of the newest entry of group, if any."""
+        rows = np.flatnonzero(self.groups() == group)
+        return self._keys[rows[-1]] if len(rows) else None
+
+
+class RetrievalContextAssembler:
+    """Recent turns verbatim plus the earlier messages most similar to the new one.
+
+    Every message of a dialogue is embedded once, as it first appears in
+    the history, into a per-dialogue index (and a per-team index when
+    team_turns is set). When the history overflows the recent window, the
+    retrieved_turns earlier messages closest to the latest user message are
+    added to the system prompt in chronological order.
+    """
+
+    def __init__(
+        self,
+        storage: IStorage,
+        token_budget: int = 4000,
+        recent_turns: int = 10,
+        retrieved_turns: int = 4,
+        team_turns: int = 0,
+        min_score: float = 0.15,
+        embedder: HashingEmbedder | None = None,
+        max_team_entries: int = DEFAULT_MAX_TEAM_ENTRIES,
+    ):
+        self._storage = storage
+        self._token_budget = token_budget
+        self._recent_turns = recent_turns
+        self._retrieved_turns = retrieved_turns
+        self._team_turns = team_turns
+        self._min_score = min_score
+        self._embedder = embedder or HashingEmbedder()
+        self._max_team_entries = max_team_entries
+
+        # dialogue_id -> index keyed by history position
+        self._dialogues: dict[str, VectorIndex] = {}
+        # team_id -> index keyed by (dialogue_id, position, role, content),
+        # grouped by _dialogue_group(dialogue_id)
+        self._teams: dict[str, VectorIndex] = {}
+        # dialogue_id -> team_id, once known
+        self._dialogue_teams: dict[str, str] = {}
+
+    async def assemble(
+        self, dialogue_id: str, history: list[dict], tokens: list[int] | None = None
+    ) -> AssembledContext:
+        """Fit the dialogue history into the context budget."""
+        if tokens is None or len(tokens) != len(history) + 1:
+            tokens = token_prefix(history)
+        await self._index(dialogue_id, history)
+        if len(history) <= self._recent_turns and tokens[-1] <= self._token_budget:
+            return AssembledContext(messages=list(history))
+
+        # A quarter of the budget is reserved for retrieved messages
+        retrieval_budget = self._token_budget // 4
+        start = window_start(
+            history, 0, self._token_budget - retrieval_budget, self._recent_turns, tokens
+        )
+        query = self._embedder.embed([_latest_user_text(history[start:])])[0]
+
+        sections = []
+        hits = self._dialogues[dialogue_id].search(
+            query, self._retrieved_turns, rows=start
+        )
+        earlier = [
+            history[position]
+            for position, score in sorted(hits, key=lambda hit: hit[0])
+            if score >= self._min_score
+        ]
+        earlier = _fit(earlier, retrieval_budget)
+        if earlier:
+            sections.append(
+                "Relevant earlier messages from this conversation:\n" + _transcript(earlier)
+            )
+            retrieval_budget -= sum(estimate_tokens(m["content"]) for m in earlier)
+
+        team_messages = self._search_team(dialogue_id, query)
+        team_messages = _fit(team_messages, retrieval_budget)
+        if team_messages:
+            sections.append(
+                "Related messages from other conversations in the team:\n"
+                + _transcript(team_messages)
+            )
+
+        return AssembledContext(
+            messages=list(history[start:]),
+            system="\n\n".join(sections) if sections else None,
+        )
+
+    def forget(self, dialogue_id: str) -> None:
+        """Drop the dialogue's index; its team index entries are kept.
+
+        They stay searchable from other dialogues and are not added again
+        when the dialogue is assembled after a rehydration.
+        """
+        self._dialogues.pop(dialogue_id, None)
+        self._dialogue_teams.pop(dialogue_id, None)
+
+    async def _index(self, dialogue_id: str, history: list[dict]) -> None:
+        """Embed messages not indexed yet (the tail of the history)."""
+        index = self._dialogues.get(dialogue_id)
+        if index is None or len(index) > len(history):
+            index = self._dialogues[dialogue_id] = VectorIndex(self._embedder.dimensions)
+        new = history[len(index) :]
+        if not new:
+            return
+
+        vectors = self._embedder.embed([m["content"] for m in new])
+        index.add(list(range(len(index), len(history))), vectors)
+
+        if self._team_turns:
+            team_id = await self._team_id(dialogue_id)
+            if team_id:
+                team_index = self._teams.get(team_id)
+                if team_index is None:
+                    team_index = self._teams[team_id] = VectorIndex(
+                        self._embedder.dimensions, max_size=self._max_team_entries
+                    )
+                # Messages indexed before the team was known (or before the
+                # dialogue was forgotten) are added or skipped by position
+                group = _dialogue_group(dialogue_id)
+                last = team_index.last_key(group)
+                start = last[1] + 1 if last else 0
+                if start >= len(history):
+                    return
+                if start != len(history) - len(new):
+                    vectors = self._embedder.embed([m["content"] for m in history[start:]])
+                team_index.add(
+                    [
+                        (dialogue_id, position, m["role"], m["content"])
+                        for position, m in enumerate(history[start:], start)
+                    ],
+                    vectors,
+                    group,
+                )
+
+    def _search_team(self, dialogue_id: str, query: np.ndarray) -> list[dict]:
+        """Closest messages of other dialogues in the same team."""
+        if not self._team_turns:
+            return []
+        team_index = self._teams.get(self._dialogue_teams.get(dialogue_id) or "")
+        if team_index is None:
+            return []
+        mask = team_index.groups() != _dialogue_group(dialogue_id)
+        hits = team_index.search(query, self._team_turns, mask=mask)
+        return [
+            {"role": role, "content": content}
+            for (_, _, role, content), score in hits
+            if score >= self._min_score
+        ]
+
+    async def _team_id(self, dialogue_id: str) -> str | None:
+        """Team of the dialogue's user; looked up again until it is known."""
+        if dialogue_id not in self._dialogue_teams:
+            team_id = await self._storage.get_dialogue_team(dialogue_id)
+            if team_id is None:
+                return None
+            self._dialogue_teams[dialogue_id] = team_id
+        return self._dialogue_teams[dialogue_id]
+
+
+def _dialogue_group(dialogue_id: str) -> int:
+    """Stable 64-bit id of a dialogue for VectorIndex groups."""
+    digest = hashlib.blake2b(dialogue_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _latest_user_text(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        if message["role"] == "user":
+            return message["content"]
+    return messages[-1]["content"] if messages else ""
+
+
+def _fit(messages: list[dict], budget: int) -> list[dict]:
+    """Leading messages that fit the token budget."""
+    fitted = []
+    for message in messages:
+        budget -= estimate_tokens(message["content"])
+        if budget < 0:
+            break
+        fitted.append(message)
+    return fitted
+
+
+def _transcript(messages: list[dict]) -> str:
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
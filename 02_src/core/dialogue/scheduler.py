@@ -0,0 +1,205 @@
+"""Hierarchical timer wheel for per-dialogue deadlines."""
+
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Protocol
+
+from ..logging_config import get_logger
+
+logger = get_logger(__name__)
+
+TimerCallback = Callable[[Hashable], Awaitable[None]]
+
+
+class IScheduler(Protocol):
+    """Keyed one-shot timers."""
+
+    def arm(self, key: Hashable, delay: float, callback: TimerCallback) -> None:
+        """Run callback(key) after delay seconds, replacing any timer for key."""
+        ...
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the timer for key. Return True if one was armed."""
+        ...
+
+    def is_armed(self, key: Hashable) -> bool:
+        """Check whether a timer is armed for key."""
+        ...
+
+    async def start(self) -> None:
+        """Start firing timers."""
+        ...
+
+    async def stop(self) -> None:
+        """Drop all timers and cancel running callbacks."""
+        ...
+
+
+@dataclass(eq=False)
+class _Timer:
+    key: Hashable
+    deadline: int  # absolute tick
+    callback: TimerCallback
+    bucket: dict | None = None
+
+
+class TimerWheel:
+    """Hierarchical timer wheel driven by a single asyncio task.
+
+    Level 0 has `slots` buckets of one tick each; every higher level covers
+    `slots` times the span of the level below. Arm and cancel are O(1): a
+    timer lives in exactly one bucket dict. Timers in higher levels cascade
+    down as their bucket comes due. With no timers armed the driver task
+    waits on an event instead of ticking.
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 64, levels: int = 4):
+        self._tick = tick
+        self._slots = slots
+        self._levels = levels
+        self._wheels: list[list[dict[Hashable, _Timer]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._timers: dict[Hashable, _Timer] = {}
+        self._callbacks: set[asyncio.Task] = set()
+
+        self._origin = 0.0
+        self._current = 0  # last processed tick
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    async def start(self) -> None:
+        """Start firing timers."""
+        if self._task:
+            return
+        self._origin = asyncio.get_running_loop().time()
+        self._current = 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Drop all timers and cancel running callbacks."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        for task in list(self._callbacks):
+            task.cancel()
+        await asyncio.gather(*self._callbacks, return_exceptions=True)
+
+        for wheel in self._wheels:
+            for bucket in wheel:
+                bucket.clear()
+        self._timers.clear()
+
+    def arm(self, key: Hashable, delay: float, callback: TimerCallback) -> None:
+        """Run callback(key) after delay seconds, replacing any timer for key."""
+        if not self._task:
+            raise RuntimeError("TimerWheel not started")
+
+        self.cancel(key)
+        if not self._timers:
+            # Nothing armed, so no ticks need processing: jump to now
+            self._current = self._now_tick()
+
+        deadline = self._now_tick() + max(1, math.ceil(delay / self._tick))
+        timer = _Timer(key=key, deadline=deadline, callback=callback)
+        self._timers[key] = timer
+        self._place(timer)
+        self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the timer for key. Return True if one was armed."""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        if timer.bucket is not None:
+            timer.bucket.pop(key, None)
+            timer.bucket = None
+        return True
+
+    def is_armed(self, key: Hashable) -> bool:
+        """Check whether a timer is armed for key."""
+        return key in self._timers
+
+    def _now_tick(self) -> int:
+        return int((asyncio.get_running_loop().time() - self._origin) / self._tick)
+
+    def _place(self, timer: _Timer) -> None:
+        """Put a timer into the bucket matching its distance from now."""
+        delta = timer.deadline - self._current
+        if delta <= 0:
+            self._fire(timer)
+            return
+
+        span = self._slots
+        level = 0
+        while delta >= span and level < self._levels - 1:
+            span *= self._slots
+            level += 1
+
+        # Beyond the top level: park in the furthest bucket and re-cascade
+        target = min(timer.deadline, self._current + span - 1)
+        granularity = span // self._slots
+        bucket = self._wheels[level][(target // granularity) % self._slots]
+        bucket[timer.key] = timer
+        timer.bucket = bucket
+
+    def _advance(self) -> None:
+        """Process one tick: cascade higher levels, then fire due timers."""
+        self._current += 1
+
+        granularity = self._slots
+        for level in range(1, self._levels):
+            if self._current % granularity:
+                break
+            bucket = self._wheels[level][(self._current // granularity) % self._slots]
+            timers = list(bucket.values())
+            bucket.clear()
+            for timer in timers:
+                self._place(timer)
+            granularity *= self._slots
+
+        bucket = self._wheels[0][self._current % self._slots]
+        if bucket:
+            timers = list(bucket.values())
+            bucket.clear()
+            for timer in timers:
+                self._fire(timer)
+
+    def _fire(self, timer: _Timer) -> None:
+        self._timers.pop(timer.key, None)
+        timer.bucket = None
+        task = asyncio.create_task(self._run_callback(timer))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    @staticmethod
+    async def _run_callback(timer: _Timer) -> None:
+        try:
+            await timer.callback(timer.key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Timer callback error for {timer.key}: {e}", exc_info=True)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._timers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            next_tick_at = self._origin + (self._current + 1) * self._tick
+            await asyncio.sleep(max(0.0, next_tick_at - loop.time()))
+
+            now = self._now_tick()
+            while self._current < now and self._timers:
+                self._advance()
+            if not self._timers:
+                self._current = now
@@ -0,0 +1,96 @@
+"""Session rollover: when a user's dialogue is closed and a new one opened."""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from ..llm import ILLMProvider
+from ..models import DialogueSummary
+from .context import SUMMARY_SYSTEM_PROMPT, estimate_tokens
+
+# Most recent session tokens sent to the LLM for the carryover summary
+DEFAULT_SUMMARY_INPUT_TOKENS = 8000
+
+
+@dataclass
+class SessionStats:
+    """Size and last activity of the current session."""
+
+    message_count: int = 0
+    last_message_at: datetime | None = None
+
+
+@dataclass(frozen=True)
+class SessionPolicy:
+    """Roll a dialogue over after idle_timeout seconds or max_messages messages.
+
+    None disables a limit. The new session receives a summary of the
+    previous ones of at most summary_max_tokens tokens.
+    """
+
+    idle_timeout: float | None = None
+    max_messages: int | None = None
+    summary_max_tokens: int = 512
+    summary_input_tokens: int = DEFAULT_SUMMARY_INPUT_TOKENS
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.idle_timeout or self.max_messages)
+
+    def rollover_reason(self, stats: SessionStats, now: datetime) -> str | None:
+        """Why the session should roll over before the next user message, if it should."""
+        if not stats.message_count:
+            return None
+        if self.max_messages and stats.message_count >= self.max_messages:
+            return "max_messages"
+        if (
+            self.idle_timeout
+            and stats.last_message_at
+            and (now - stats.last_message_at).total_seconds() >= self.idle_timeout
+        ):
+            return "idle"
+        return None
+
+
+async def summarize_session(
+    llm: ILLMProvider,
+    history: list[dict],
+    carryover: str | None,
+    summary: DialogueSummary | None,
+    policy: SessionPolicy,
+    history_start: int = 0,
+) -> str | None:
+    """Summary of a finished session merged into the carryover it started with.
+
+    A rolling summary of the session (from ContextAssembler) stands in for
+    the messages it covers; of the rest, only the most recent ones within
+    summary_input_tokens are sent. history may be the tail of the session
+    starting at message position history_start.
+    """
+    start = 0
+    if summary:
+        start = min(max(summary.summarized_count - history_start, 0), len(history))
+    budget = policy.summary_input_tokens
+    tail: list[dict] = []
+    for message in reversed(history[start:]):
+        budget -= estimate_tokens(message["content"])
+        if budget < 0:
+            break
+        tail.append(message)
+    tail.reverse()
+    if not tail and not summary:
+        return carryover
+
+    parts = []
+    if carryover:
+        parts.append(f"Summary of earlier sessions:\n{carryover}")
+    if summary:
+        parts.append(f"Summary of the start of this session:\n{summary.summary}")
+    if tail:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in tail)
+        parts.append(f"New messages:\n{transcript}")
+
+    return await llm.complete(
+        messages=[{"role": "user", "content": "\n\n".join(parts)}],
+        system=SUMMARY_SYSTEM_PROMPT,
+        max_tokens=policy.summary_max_tokens,
+    )
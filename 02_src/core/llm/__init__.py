@@ -1,5 +1,6 @@
 """LLM module."""
 
+from .cache import CachingLLMProvider
 from .llm_provider import ILLMProvider, LLMProvider
 
-__all__ = ["ILLMProvider", "LLMProvider"]
+__all__ = ["CachingLLMProvider", "ILLMProvider", "LLMProvider"]
@@ -0,0 +1,202 @@
+"""Response cache for identical LLM requests."""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import AsyncIterator
+
+from ..logging_config import get_logger
+from ..storage import IStorage
+from .llm_provider import ILLMProvider
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 3600.0
+
+
+def request_key(
+    model: str, system: str | None, messages: list[dict], max_tokens: int
+) -> str:
+    """Stable hash of an LLM request (independent of dict key order)."""
+    payload = json.dumps(
+        [model, system, messages, max_tokens],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachingLLMProvider:
+    """ILLMProvider wrapper answering repeated requests from a cache.
+
+    Responses are kept in an in-memory LRU of max_entries for ttl seconds
+    (None keeps them until evicted). With storage set, they are also
+    written to its llm_cache table, so they survive restarts and are
+    shared by processes using the same database. Concurrent identical
+    requests wait for a single upstream call. Failed calls are not cached.
+    A stream is served from the cache as one chunk and cached once it
+    completes.
+    """
+
+    def __init__(
+        self,
+        provider: ILLMProvider,
+        model: str | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float | None = DEFAULT_TTL,
+        storage: IStorage | None = None,
+    ):
+        self._provider = provider
+        self._model = model if model is not None else getattr(provider, "model", "")
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._storage = storage
+        self._purged = False
+
+        # key -> (response, expires_at epoch seconds or None), least recent first
+        self._entries: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+        self._hits = 0
+        self._persistent_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expired = 0
+
+    async def complete(
+        self,
+        messages: list[dict],
+        system: str | None = None,
+        max_tokens: int = 1024,
+    ) -> str:
+        """Generate completion, or return the cached one for the same request."""
+        key = request_key(self._model, system, messages, max_tokens)
+        cached = await self._lookup(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._provider.complete(
+                messages=messages, system=system, max_tokens=max_tokens
+            )
+        except Exception as e:
+            # Waiters get the error too; mark it retrieved in case there are none
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result(response)
+        await self._store(key, response)
+        return response
+
+    async def stream(
+        self,
+        messages: list[dict],
+        system: str | None = None,
+        max_tokens: int = 1024,
+    ) -> AsyncIterator[str]:
+        """Generate completion as text chunks; a cached response is one chunk."""
+        key = request_key(self._model, system, messages, max_tokens)
+        cached = await self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+
+        self._misses += 1
+        chunks = []
+        async for chunk in self._provider.stream(
+            messages=messages, system=system, max_tokens=max_tokens
+        ):
+            chunks.append(chunk)
+            yield chunk
+        await self._store(key, "".join(chunks))
+
+    def get_metrics(self) -> dict:
+        """Hit rate, cache size and eviction counters."""
+        lookups = self._hits + self._persistent_hits + self._misses + self._coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "ttl": self._ttl,
+            "persistent": self._storage is not None,
+            "hits": self._hits,
+            "persistent_hits": self._persistent_hits,
+            "coalesced": self._coalesced,
+            "misses": self._misses,
+            "hit_rate": (lookups - self._misses) / lookups if lookups else None,
+            "evictions": self._evictions,
+            "expired": self._expired,
+        }
+
+    def clear(self) -> None:
+        """Drop the in-memory entries."""
+        self._entries.clear()
+
+    async def _lookup(self, key: str) -> str | None:
+        """Cached response from memory, then from storage."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            response, expires_at = entry
+            if expires_at is None or expires_at > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return response
+            del self._entries[key]
+            self._expired += 1
+
+        if self._storage is None:
+            return None
+        try:
+            if not self._purged:
+                self._purged = True
+                await self._storage.purge_llm_responses(now)
+            response = await self._storage.get_llm_response(key, now)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+        if response is None:
+            return None
+
+        # The stored expiry is not read back; the entry gets a fresh ttl
+        self._remember(key, response, now)
+        self._persistent_hits += 1
+        return response
+
+    async def _store(self, key: str, response: str) -> None:
+        now = time.time()
+        expires_at = self._remember(key, response, now)
+        if self._storage is None:
+            return
+        try:
+            await self._storage.save_llm_response(key, response, expires_at)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def _remember(self, key: str, response: str, now: float) -> float | None:
+        """Put a response in the LRU and return its expiry."""
+        expires_at = now + self._ttl if self._ttl else None
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+        return expires_at
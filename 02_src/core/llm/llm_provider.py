@@ -1,7 +1,7 @@
 """LLM Provider implementation using Anthropic Claude API."""
 
 import os
-from typing import Protocol
+from typing import AsyncIterator, Protocol
 
 import anthropic
 
@@ -18,6 +18,15 @@ class ILLMProvider(Protocol):
         """Generate completion."""
         ...
 
+    def stream(
+        self,
+        messages: list[dict],
+        system: str | None = None,
+        max_tokens: int = 1024,
+    ) -> AsyncIterator[str]:
+        """Generate completion as text chunks."""
+        ...
+
 
 class LLMProvider:
     """Anthropic Claude API provider."""
@@ -30,6 +39,10 @@ class LLMProvider:
         self._model = model
         self._client = anthropic.AsyncAnthropic(api_key=self._api_key)
 
+    @property
+    def model(self) -> str:
+        return self._model
+
     async def complete(
         self,
         messages: list[dict],  # [{"role": "user", "content": "..."}]
@@ -54,3 +67,25 @@ class LLMProvider:
         except Exception as e:
             # Re-raise for handling by caller
             raise RuntimeError(f"LLM API error: {e}") from e
+
+    async def stream(
+        self,
+        messages: list[dict],
+        system: str | None = None,
+        max_tokens: int = 1024,
+    ) -> AsyncIterator[str]:
+        """Generate completion using Claude API, yielding text as it arrives."""
+        kwargs = {"system": system} if system else {}
+        try:
+            async with self._client.messages.stream(
+                model=self._model,
+                messages=messages,
+                max_tokens=max_tokens,
+                **kwargs,
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+
+        except Exception as e:
+            # Re-raise for handling by caller
+            raise RuntimeError(f"LLM API error: {e}") from e
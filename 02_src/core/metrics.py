@@ -0,0 +1,22 @@
+"""Percentile summaries for the latency and size metrics in get_metrics()."""
+
+import statistics
+from typing import Iterable
+
+
+def summarize(values: Iterable[float], scale: float = 1.0) -> dict:
+    """Average, p50, p95 and max of values, each multiplied by scale."""
+    values = [v * scale for v in values]
+    if not values:
+        return {"avg": None, "p50": None, "p95": None, "max": None}
+    if len(values) == 1:
+        p50 = p95 = values[0]
+    else:
+        quantiles = statistics.quantiles(values, n=20, method="inclusive")
+        p50, p95 = quantiles[9], quantiles[18]
+    return {
+        "avg": statistics.fmean(values),
+        "p50": p50,
+        "p95": p95,
+        "max": max(values),
+    }
@@ -1,8 +1,8 @@
 """Core data models for Team Assistant."""
 
 from .messages import Attachment, Message, Team, User
-from .dialogue import DialogueState
-from .agents import AgentState, BusMessage, Topic
+from .dialogue import DialogueSession, DialogueState, DialogueSummary
+from .agents import AgentState, BusMessage, BusMessagePage, Topic
 from .tracing import TraceEvent
 
 __all__ = [
@@ -12,10 +12,13 @@ __all__ = [
     "Message",
     "Attachment",
     # Dialogue
+    "DialogueSession",
     "DialogueState",
+    "DialogueSummary",
     # Agents
     "AgentState",
     "BusMessage",
+    "BusMessagePage",
     "Topic",
     # Tracing
     "TraceEvent",
@@ -31,3 +31,11 @@ class BusMessage:
     payload: dict  # varies by topic
     source: str  # component that published
     timestamp: datetime
+
+
+@dataclass
+class BusMessagePage:
+    """One page of a keyset-paginated BusMessage query."""
+
+    messages: list[BusMessage]
+    next_cursor: str | None = None  # opaque, None when there are no more rows
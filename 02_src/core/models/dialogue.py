@@ -11,3 +11,25 @@ class DialogueState:
     user_id: str
     dialogue_id: str
     last_published_timestamp: datetime | None = None
+
+
+@dataclass
+class DialogueSummary:
+    """Rolling summary of the dialogue turns that left the context window."""
+
+    dialogue_id: str
+    summary: str
+    summarized_count: int  # Leading messages of the dialogue covered by summary
+    updated_at: datetime | None = None
+
+
+@dataclass
+class DialogueSession:
+    """One dialogue of a user; rolling over starts the next one."""
+
+    dialogue_id: str
+    user_id: str
+    started_at: datetime
+    ended_at: datetime | None = None
+    previous_dialogue_id: str | None = None
+    carryover: str | None = None  # Summary of the earlier sessions given to this one
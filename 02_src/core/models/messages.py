@@ -43,3 +43,4 @@ class Message:
     content: str
     timestamp: datetime
     attachments: list[Attachment] = field(default_factory=list)
+    token_count: int | None = None  # Estimated by Storage when saved
@@ -1,5 +1,24 @@
 """Storage module."""
 
+from .serializer import ISerializer, available_serializers, get_serializer
 from .storage import IStorage, Storage
+from .tokens import ITokenEstimator, get_token_estimator
+from .tuning import TUNING_PROFILES, TuningProfile, get_tuning_profile
+from .write_behind import WriteBehind, WriteJournal
+from .writer import SQLiteWriter
 
-__all__ = ["IStorage", "Storage"]
+__all__ = [
+    "ISerializer",
+    "available_serializers",
+    "get_serializer",
+    "IStorage",
+    "Storage",
+    "ITokenEstimator",
+    "get_token_estimator",
+    "SQLiteWriter",
+    "TUNING_PROFILES",
+    "TuningProfile",
+    "get_tuning_profile",
+    "WriteBehind",
+    "WriteJournal",
+]
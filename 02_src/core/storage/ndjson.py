@@ -0,0 +1,273 @@
+"""Streaming NDJSON export and import of dialogues, bus messages and traces.
+
+Each line is one JSON object with a "type" field: "message",
+"dialogue_state", "bus_message" or "trace_event". Export walks the tables
+with keyset-paginated async generators and import inserts in batches, so
+memory stays bounded by the batch size on both sides.
+
+Command line (from 02_src):
+    python -m core.storage.ndjson export --db ../03_data/team_assistant.db \\
+        --out dump.ndjson --after 2024-01-01T00:00:00+00:00 --team team1
+    python -m core.storage.ndjson import --db staging.db --in dump.ndjson
+"""
+
+import argparse
+import asyncio
+import base64
+import codecs
+import sys
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator
+
+from ..models import Attachment, BusMessage, DialogueState, Message, Topic, TraceEvent
+from .storage import IStorage, Storage
+
+RECORD_TYPES = ("message", "dialogue_state", "bus_message", "trace_event")
+
+
+def _ts(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _parse_ts(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def message_to_record(message: Message) -> dict:
+    """Convert a Message to an NDJSON record."""
+    return {
+        "type": "message",
+        "id": message.id,
+        "dialogue_id": message.dialogue_id,
+        "role": message.role,
+        "content": message.content,
+        "timestamp": _ts(message.timestamp),
+        "attachments": [
+            {
+                "id": a.id,
+                "type": a.type,
+                "data": base64.b64encode(a.data).decode("ascii") if a.data else None,
+                "url": a.url,
+            }
+            for a in message.attachments
+        ],
+    }
+
+
+def dialogue_state_to_record(state: DialogueState) -> dict:
+    """Convert a DialogueState to an NDJSON record."""
+    return {
+        "type": "dialogue_state",
+        "user_id": state.user_id,
+        "dialogue_id": state.dialogue_id,
+        "last_published_timestamp": _ts(state.last_published_timestamp),
+    }
+
+
+def bus_message_to_record(message: BusMessage) -> dict:
+    """Convert a BusMessage to an NDJSON record."""
+    return {
+        "type": "bus_message",
+        "id": message.id,
+        "topic": message.topic.value,
+        "payload": message.payload,
+        "source": message.source,
+        "timestamp": _ts(message.timestamp),
+    }
+
+
+def trace_event_to_record(event: TraceEvent) -> dict:
+    """Convert a TraceEvent to an NDJSON record."""
+    return {
+        "type": "trace_event",
+        "id": event.id,
+        "event_type": event.event_type,
+        "actor": event.actor,
+        "data": event.data,
+        "timestamp": _ts(event.timestamp),
+    }
+
+
+def record_to_model(record: dict) -> Message | DialogueState | BusMessage | TraceEvent:
+    """Convert an NDJSON record back to its model. Raises ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError("Record is not a JSON object")
+    record_type = record.get("type")
+    try:
+        if record_type == "message":
+            return Message(
+                id=record["id"],
+                dialogue_id=record["dialogue_id"],
+                role=record["role"],
+                content=record["content"],
+                timestamp=_parse_ts(record["timestamp"]),
+                attachments=[
+                    Attachment(
+                        id=a["id"],
+                        message_id=record["id"],
+                        type=a["type"],
+                        data=base64.b64decode(a["data"]) if a.get("data") else None,
+                        url=a.get("url"),
+                    )
+                    for a in record.get("attachments", [])
+                ],
+            )
+        if record_type == "dialogue_state":
+            return DialogueState(
+                user_id=record["user_id"],
+                dialogue_id=record["dialogue_id"],
+                last_published_timestamp=_parse_ts(record.get("last_published_timestamp")),
+            )
+        if record_type == "bus_message":
+            return BusMessage(
+                id=record["id"],
+                topic=Topic(record["topic"]),
+                payload=record["payload"],
+                source=record["source"],
+                timestamp=_parse_ts(record["timestamp"]),
+            )
+        if record_type == "trace_event":
+            return TraceEvent(
+                id=record["id"],
+                event_type=record["event_type"],
+                actor=record["actor"],
+                data=record["data"],
+                timestamp=_parse_ts(record["timestamp"]),
+            )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed {record_type} record: {e}") from e
+    raise ValueError(f"Unknown record type: {record_type!r}")
+
+
+async def export_ndjson(
+    storage: IStorage,
+    after: datetime | None = None,
+    before: datetime | None = None,
+    team_id: str | None = None,
+    batch_size: int = 500,
+) -> AsyncIterator[str]:
+    """Yield NDJSON lines (with trailing newline) for all matching rows."""
+    dumps = storage.serializer.dumps
+
+    async for state in storage.iter_dialogue_states(team_id=team_id, batch_size=batch_size):
+        yield dumps(dialogue_state_to_record(state)) + "\n"
+    async for message in storage.iter_messages(after, before, team_id, batch_size):
+        yield dumps(message_to_record(message)) + "\n"
+    async for bus_message in storage.iter_bus_messages(after, before, team_id, batch_size):
+        yield dumps(bus_message_to_record(bus_message)) + "\n"
+    async for event in storage.iter_trace_events(after, before, team_id, batch_size):
+        yield dumps(trace_event_to_record(event)) + "\n"
+
+
+async def iter_lines(chunks: AsyncIterable[bytes | str]) -> AsyncIterator[str]:
+    """Split a stream of byte/str chunks into lines."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def import_ndjson(
+    storage: IStorage, lines: AsyncIterable[str], batch_size: int = 500
+) -> dict[str, int]:
+    """Insert NDJSON records in batches of batch_size; returns counts per type.
+
+    Rows whose id already exists are skipped. Raises ValueError (with the
+    line number) on a malformed line; batches before it stay committed.
+    """
+    loads = storage.serializer.loads
+    counts = {record_type: 0 for record_type in RECORD_TYPES}
+    pending: dict[str, list] = {record_type: [] for record_type in RECORD_TYPES}
+    pending_count = 0
+
+    async def flush() -> None:
+        await storage.import_rows(
+            messages=pending["message"],
+            dialogue_states=pending["dialogue_state"],
+            bus_messages=pending["bus_message"],
+            trace_events=pending["trace_event"],
+        )
+        for record_type, rows in pending.items():
+            counts[record_type] += len(rows)
+            rows.clear()
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+            model = record_to_model(record)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+
+        pending[record["type"]].append(model)
+        pending_count += 1
+        if pending_count >= batch_size:
+            await flush()
+            pending_count = 0
+
+    if pending_count:
+        await flush()
+    return counts
+
+
+async def _read_file_lines(path: str) -> AsyncIterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+async def _main_async(args: argparse.Namespace) -> None:
+    storage = Storage(args.db)
+    await storage.init()
+    try:
+        if args.command == "export":
+            out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+            try:
+                async for line in export_ndjson(
+                    storage,
+                    after=_parse_ts(args.after),
+                    before=_parse_ts(args.before),
+                    team_id=args.team,
+                ):
+                    out.write(line)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+        else:
+            counts = await import_ndjson(storage, _read_file_lines(args.input))
+            print(", ".join(f"{k}: {v}" for k, v in counts.items()))
+    finally:
+        await storage.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NDJSON export/import")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="write NDJSON to a file or stdout")
+    export_parser.add_argument("--db", required=True, help="database path")
+    export_parser.add_argument("--out", help="output file (default: stdout)")
+    export_parser.add_argument("--after", help="ISO timestamp lower bound")
+    export_parser.add_argument("--before", help="ISO timestamp upper bound")
+    export_parser.add_argument("--team", help="team id filter")
+
+    import_parser = sub.add_parser("import", help="read NDJSON from a file")
+    import_parser.add_argument("--db", required=True, help="database path")
+    import_parser.add_argument("--in", dest="input", required=True, help="input file")
+
+    asyncio.run(_main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,16 @@ CREATE TABLE IF NOT EXISTS messages (
     role TEXT NOT NULL CHECK(role IN ('user', 'assistant', 'system')),
     content TEXT NOT NULL,
     timestamp TIMESTAMP NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    token_count INTEGER,  -- Estimated when saved
+    token_offset INTEGER  -- Tokens of the dialogue's earlier messages (running total)
+);
+
+-- Running message and token totals per dialogue
+CREATE TABLE IF NOT EXISTS dialogue_tokens (
+    dialogue_id TEXT PRIMARY KEY,
+    message_count INTEGER NOT NULL,
+    token_count INTEGER NOT NULL
 );
 
 -- Attachments
@@ -43,6 +52,31 @@ CREATE TABLE IF NOT EXISTS dialogue_states (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- DialogueSummary (rolling summary of turns outside the context window)
+CREATE TABLE IF NOT EXISTS dialogue_summaries (
+    dialogue_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    summarized_count INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- DialogueSession (a user's dialogues, oldest first by started_at)
+CREATE TABLE IF NOT EXISTS dialogue_sessions (
+    dialogue_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    ended_at TIMESTAMP,
+    previous_dialogue_id TEXT,
+    carryover TEXT
+);
+
+-- LLM responses cached by request hash (CachingLLMProvider)
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    expires_at REAL  -- Epoch seconds; NULL never expires
+);
+
 -- AgentState
 CREATE TABLE IF NOT EXISTS agent_states (
     agent_id TEXT PRIMARY KEY,
@@ -73,7 +107,15 @@ CREATE TABLE IF NOT EXISTS bus_messages (
 
 CREATE INDEX IF NOT EXISTS idx_messages_dialogue_id ON messages(dialogue_id);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_dialogue_timestamp ON messages(dialogue_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_dialogue_sessions_user ON dialogue_sessions(user_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_attachments_message_id ON attachments(message_id);
 CREATE INDEX IF NOT EXISTS idx_trace_events_timestamp ON trace_events(timestamp);
 CREATE INDEX IF NOT EXISTS idx_trace_events_event_type ON trace_events(event_type);
 CREATE INDEX IF NOT EXISTS idx_trace_events_actor ON trace_events(actor);
-CREATE INDEX IF NOT EXISTS idx_bus_messages_topic ON bus_messages(topic);
+DROP INDEX IF EXISTS idx_bus_messages_topic;
+CREATE INDEX IF NOT EXISTS idx_bus_messages_timestamp ON bus_messages(timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_bus_messages_topic_timestamp ON bus_messages(topic, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_bus_messages_source_timestamp ON bus_messages(source, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_bus_messages_dialogue_id
+    ON bus_messages(json_extract(payload, '$.dialogue_id'), timestamp, id);
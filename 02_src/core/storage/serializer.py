@@ -0,0 +1,109 @@
+"""Serializers for JSON columns (payload, data, sgr_traces)."""
+
+import json
+from typing import Any, Callable, Protocol
+
+
+class ISerializer(Protocol):
+    """Encodes JSON column values to text and back."""
+
+    name: str
+
+    def dumps(self, obj: Any) -> str:
+        """Encode a value as JSON text."""
+        ...
+
+    def loads(self, data: str | bytes) -> Any:
+        """Decode JSON text."""
+        ...
+
+
+class JsonSerializer:
+    """Standard library json (always available)."""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    """orjson: Rust implementation, several times faster than json."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any) -> str:
+        return self._orjson.dumps(obj, option=self._options).decode("utf-8")
+
+    def loads(self, data: str | bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgspecSerializer:
+    """msgspec: C implementation with reusable encoder/decoder."""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+        self._decode_error = msgspec.DecodeError
+
+    def dumps(self, obj: Any) -> str:
+        return self._encoder.encode(obj).decode("utf-8")
+
+    def loads(self, data: str | bytes) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except self._decode_error as e:
+            # Match json/orjson, whose decode errors are ValueErrors
+            raise ValueError(str(e)) from e
+
+
+# Preference order for "auto": fastest first, stdlib last
+SERIALIZERS: dict[str, Callable[[], ISerializer]] = {
+    "orjson": OrjsonSerializer,
+    "msgspec": MsgspecSerializer,
+    "json": JsonSerializer,
+}
+
+
+def available_serializers() -> list[str]:
+    """Names of serializers whose backing library is installed."""
+    names = []
+    for name, factory in SERIALIZERS.items():
+        try:
+            factory()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_serializer(serializer: "str | ISerializer | None" = None) -> ISerializer:
+    """Resolve a serializer by name; None or "auto" picks the fastest installed."""
+    if serializer is not None and not isinstance(serializer, str):
+        return serializer
+
+    if serializer in (None, "auto"):
+        for factory in SERIALIZERS.values():
+            try:
+                return factory()
+            except ImportError:
+                continue
+
+    if serializer not in SERIALIZERS:
+        known = ", ".join(SERIALIZERS)
+        raise ValueError(f"Unknown serializer {serializer!r} (known: auto, {known})")
+    return SERIALIZERS[serializer]()
@@ -1,19 +1,36 @@
 """SQLite storage implementation."""
 
+import asyncio
+import base64
+import binascii
+import contextvars
 import json
+import os
+import sqlite3
 import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Protocol
+from contextlib import AbstractAsyncContextManager
+from typing import AsyncIterator, Callable, Protocol
 
 import aiosqlite
 
 from ..config import resolve_db_path
+from ..logging_config import get_logger
+from .serializer import ISerializer, get_serializer
+from .tokens import ITokenEstimator, get_token_estimator
+from .tuning import TuningProfile, get_tuning_profile
+from .writer import SQLiteWriter
 from ..models import (
     AgentState,
     Attachment,
     BusMessage,
+    BusMessagePage,
+    DialogueSession,
     DialogueState,
+    DialogueSummary,
     Message,
     Team,
     TraceEvent,
@@ -21,12 +38,29 @@ from ..models import (
     User,
 )
 
+logger = get_logger(__name__)
+
+ENGINES = ("aiosqlite", "thread")
+
+# (sql, params); a list of param tuples runs the statement with executemany
+Statement = tuple[str, "tuple | list[tuple]"]
+
 
 class IStorage(Protocol):
     """Persistent storage for all system data (SQLite)."""
 
-    async def init(self) -> None:
-        """Initialize database and create tables."""
+    @property
+    def serializer(self) -> ISerializer:
+        """Serializer used for JSON columns."""
+        ...
+
+    @property
+    def token_estimator(self) -> ITokenEstimator:
+        """Estimator of Message.token_count."""
+        ...
+
+    async def init(self, migrate: bool = True) -> None:
+        """Initialize database and create tables (unless migrate is False)."""
         ...
 
     async def close(self) -> None:
@@ -44,6 +78,16 @@ class IStorage(Protocol):
         """Get messages for a dialogue, optionally after a timestamp."""
         ...
 
+    async def get_dialogue_tokens(self, dialogue_id: str) -> tuple[int, int]:
+        """Running message and token totals of a dialogue."""
+        ...
+
+    async def get_token_window(
+        self, dialogue_id: str, token_budget: int
+    ) -> list[Message]:
+        """Most recent messages of a dialogue whose token counts fit token_budget."""
+        ...
+
     # DialogueState
     async def save_dialogue_state(self, state: DialogueState) -> None:
         """Save dialogue state."""
@@ -53,6 +97,67 @@ class IStorage(Protocol):
         """Get dialogue state for a user."""
         ...
 
+    async def save_dialogue_states(self, states: list[DialogueState]) -> None:
+        """Save several dialogue states in one transaction."""
+        ...
+
+    async def get_restorable_dialogues(
+        self,
+        limit: int | None = None,
+        user_filter: Callable[[str], bool] | None = None,
+    ) -> list[tuple[DialogueState, str | None, list[Message]]]:
+        """Dialogue states, most recently updated first, with team_id and unpublished messages."""
+        ...
+
+    # DialogueSummary
+    async def save_dialogue_summary(self, summary: DialogueSummary) -> None:
+        """Save dialogue summary."""
+        ...
+
+    async def get_dialogue_summary(self, dialogue_id: str) -> DialogueSummary | None:
+        """Get the rolling summary of a dialogue."""
+        ...
+
+    # DialogueSession
+    async def save_dialogue_session(self, session: DialogueSession) -> None:
+        """Save dialogue session."""
+        ...
+
+    async def end_dialogue_session(self, dialogue_id: str, ended_at: datetime) -> None:
+        """Mark a dialogue session as ended."""
+        ...
+
+    async def get_dialogue_session(self, dialogue_id: str) -> DialogueSession | None:
+        """Get the session of a dialogue."""
+        ...
+
+    async def get_dialogue_sessions(self, user_id: str) -> list[DialogueSession]:
+        """Get a user's sessions, oldest first."""
+        ...
+
+    async def get_message_stats(self, dialogue_id: str) -> tuple[int, datetime | None]:
+        """Number of messages in a dialogue and the timestamp of the latest one."""
+        ...
+
+    async def migrate_dialogue_sessions(self) -> int:
+        """Create sessions for dialogues stored without one."""
+        ...
+
+    # LLM response cache
+    async def get_llm_response(self, key: str, now: float) -> str | None:
+        """Cached LLM response for key unless it expired before now (epoch seconds)."""
+        ...
+
+    async def save_llm_response(
+        self, key: str, response: str, expires_at: float | None
+    ) -> None:
+        """Cache an LLM response until expires_at (epoch seconds, None for never)."""
+        ...
+
+    async def purge_llm_responses(self, now: float) -> int:
+        """Delete cached LLM responses expired before now."""
+        ...
+
     # AgentState
     async def save_agent_state(self, agent_id: str, state: AgentState) -> None:
         """Save agent state."""
@@ -86,6 +191,19 @@ class IStorage(Protocol):
         """Get bus messages (newest first)."""
         ...
 
+    async def query_bus_messages(
+        self,
+        topic: Topic | None = None,
+        source: str | None = None,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        dialogue_id: str | None = None,
+        cursor: str | None = None,
+        limit: int = 100,
+    ) -> BusMessagePage:
+        """Get a page of bus messages (newest first) with optional filters."""
+        ...
+
     # Users / Teams
     async def save_team(self, team: Team) -> None:
         """Save a team."""
@@ -99,39 +217,427 @@ class IStorage(Protocol):
         """Get a user by ID."""
         ...
 
+    async def get_dialogue_team(self, dialogue_id: str) -> str | None:
+        """Team of the user owning a dialogue."""
+        ...
+
     # Lifecycle
     async def clear(self) -> None:
         """Clear all data."""
         ...
 
+    async def snapshot(self) -> None:
+        """Write the database to its snapshot file (in-memory mode only)."""
+        ...
+
+    def batch(self) -> "AbstractAsyncContextManager[None]":
+        """Group writes made inside the block into one transaction."""
+        ...
+
+    # Bulk export / import
+    def iter_messages(
+        self,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        team_id: str | None = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[Message]:
+        """Stream messages (oldest first) in pages of batch_size."""
+        ...
+
+    def iter_dialogue_states(
+        self, team_id: str | None = None, batch_size: int = 500
+    ) -> AsyncIterator[DialogueState]:
+        """Stream dialogue states in pages of batch_size."""
+        ...
+
+    def iter_bus_messages(
+        self,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        team_id: str | None = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[BusMessage]:
+        """Stream bus messages (oldest first) in pages of batch_size."""
+        ...
+
+    def iter_trace_events(
+        self,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        team_id: str | None = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[TraceEvent]:
+        """Stream trace events (oldest first) in pages of batch_size."""
+        ...
+
+    async def import_rows(
+        self,
+        messages: list[Message] = (),
+        dialogue_states: list[DialogueState] = (),
+        bus_messages: list[BusMessage] = (),
+        trace_events: list[TraceEvent] = (),
+    ) -> None:
+        """Bulk-insert rows in one transaction, skipping existing ids."""
+        ...
+
+
+def _encode_cursor(timestamp: str, row_id: str) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor."""
+    raw = json.dumps([timestamp, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """Decode a cursor produced by _encode_cursor."""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(timestamp, str) or not isinstance(row_id, str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return timestamp, row_id
+
+
+@dataclass
+class _PendingBatch:
+    """Writes collected by Storage.batch() for one task."""
+
+    storage: "Storage"
+    statements: list[Statement] = field(default_factory=list)
+    closed: bool = False
+
+
+_pending_batch: contextvars.ContextVar[_PendingBatch | None] = contextvars.ContextVar(
+    "storage_pending_batch", default=None
+)
+
+
+def _token_offset_statements(dialogue_ids: set[str]) -> list[Statement]:
+    """Recompute token offsets and totals of dialogues from their token counts."""
+    params = [(dialogue_id,) for dialogue_id in dialogue_ids]
+    return [
+        (
+            """
+            UPDATE messages SET token_offset = t.token_offset
+            FROM (
+                SELECT id, SUM(token_count) OVER (
+                    ORDER BY timestamp, rowid
+                ) - token_count AS token_offset
+                FROM messages WHERE dialogue_id = ?
+            ) t
+            WHERE messages.id = t.id
+            """,
+            params,
+        ),
+        (
+            """
+            INSERT OR REPLACE INTO dialogue_tokens (dialogue_id, message_count, token_count)
+            SELECT dialogue_id, COUNT(*), SUM(token_count)
+            FROM messages WHERE dialogue_id = ?
+            GROUP BY dialogue_id
+            """,
+            params,
+        ),
+    ]
+
+
+def _parse_ts(value: str) -> datetime:
+    """Parse a stored timestamp as UTC."""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def _time_conditions(
+    column: str, after: datetime | None, before: datetime | None
+) -> tuple[list[str], list]:
+    """WHERE fragments for an optional (after, before) range on column."""
+    conditions, params = [], []
+    if after:
+        conditions.append(f"{column} > ?")
+        params.append(after)
+    if before:
+        conditions.append(f"{column} < ?")
+        params.append(before)
+    return conditions, params
+
+
+def _execute_statements(conn: sqlite3.Connection, statements: list[Statement]) -> None:
+    """Unit of work: run statements in one transaction on the writer thread."""
+    with conn:
+        for sql, params in statements:
+            if isinstance(params, list):
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+
 
 class Storage:
-    """SQLite storage implementation."""
+    """SQLite storage implementation.
+
+    With snapshot_path set, the database lives entirely in memory and is
+    copied to snapshot_path via the SQLite backup API every
+    snapshot_interval seconds and on close(). An existing snapshot is
+    loaded on init(). At most snapshot_interval seconds of writes can be
+    lost on a crash.
+
+    tuning selects a TuningProfile (by name or instance) whose PRAGMAs are
+    applied at connect time; its optimize_interval schedules a periodic
+    PRAGMA optimize. shared=True marks a database file written by several
+    processes (sharded mode): the profile gets WAL and a busy_timeout.
 
-    def __init__(self, db_path: str | Path | None = None):
+    engine picks how statements reach SQLite: "aiosqlite" (default) hops
+    to the aiosqlite thread per statement, "thread" runs each whole
+    operation as one unit of work on a dedicated SQLiteWriter thread.
+
+    serializer encodes the JSON columns (payload, data, sgr_traces); the
+    default "auto" picks the fastest installed library (orjson, msgspec,
+    then stdlib json).
+
+    token_estimator computes Message.token_count once, when a message is
+    saved. Each message also stores its dialogue's running token total
+    before it (in save order), so token windows are range queries.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        snapshot_path: str | Path | None = None,
+        snapshot_interval: float = 30.0,
+        tuning: str | TuningProfile | None = None,
+        engine: str = "aiosqlite",
+        serializer: str | ISerializer | None = "auto",
+        token_estimator: str | ITokenEstimator | None = None,
+        shared: bool = False,
+    ):
         if db_path is None:
             self._db_path = resolve_db_path()
         else:
             self._db_path = resolve_db_path(db_path)
-        self._conn: aiosqlite.Connection | None = None
-
-    async def init(self) -> None:
-        """Initialize database and create tables."""
-        self._conn = await aiosqlite.connect(self._db_path)
-
-        # Read and execute schema
-        schema_path = Path(__file__).parent / "schema.sql"
-        with open(schema_path, "r", encoding="utf-8") as f:
-            schema_sql = f.read()
-        await self._conn.executescript(schema_sql)
-        await self._conn.commit()
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown storage engine {engine!r} (known: {', '.join(ENGINES)})")
+        self._engine = engine
+        self._conn: aiosqlite.Connection | SQLiteWriter | None = None
+
+        # In-memory mode with periodic snapshots
+        self._snapshot_path: Path | None = None
+        if snapshot_path is not None:
+            if self._db_path != ":memory:":
+                raise ValueError("snapshot_path requires an in-memory database")
+            if snapshot_interval <= 0:
+                raise ValueError("snapshot_interval must be positive")
+            self._snapshot_path = Path(resolve_db_path(snapshot_path))
+        self._snapshot_interval = snapshot_interval
+        self._snapshot_task: asyncio.Task | None = None
+        self._snapshot_lock = asyncio.Lock()
+
+        self._tuning = get_tuning_profile(tuning)
+        if shared:
+            if self._db_path == ":memory:":
+                raise ValueError("shared requires a database file")
+            self._tuning = self._tuning.for_shared_file()
+        self._serializer = get_serializer(serializer)
+        self._token_estimator = get_token_estimator(token_estimator)
+        self._optimize_task: asyncio.Task | None = None
+        # Serializes transactions on the shared aiosqlite connection
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def serializer(self) -> ISerializer:
+        """Serializer used for JSON columns."""
+        return self._serializer
+
+    @property
+    def token_estimator(self) -> ITokenEstimator:
+        """Estimator of Message.token_count."""
+        return self._token_estimator
+
+    @property
+    def tuning(self) -> TuningProfile:
+        """Active tuning profile."""
+        return self._tuning
+
+    async def init(self, migrate: bool = True) -> None:
+        """Initialize database and create tables.
+
+        migrate=False skips schema creation and data migrations, for
+        processes sharing a database another process has already prepared.
+        """
+        if self._engine == "thread":
+            self._conn = await SQLiteWriter(self._db_path).start()
+        else:
+            self._conn = await aiosqlite.connect(self._db_path)
+        for statement in self._tuning.pragma_statements():
+            await self._conn.execute(statement)
+
+        if self._snapshot_path and self._snapshot_path.exists():
+            await self._restore_snapshot()
+
+        if migrate:
+            # Read and execute schema
+            schema_path = Path(__file__).parent / "schema.sql"
+            with open(schema_path, "r", encoding="utf-8") as f:
+                schema_sql = f.read()
+            await self._conn.executescript(schema_sql)
+            await self._conn.commit()
+            await self._migrate_message_tokens()
+            migrated = await self.migrate_dialogue_sessions()
+            if migrated:
+                logger.info(f"Created {migrated} dialogue sessions for existing dialogues")
+
+        if self._snapshot_path:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+        if self._tuning.optimize_interval:
+            self._optimize_task = asyncio.create_task(self._optimize_loop())
 
     async def close(self) -> None:
         """Close database connection."""
+        for task in (self._snapshot_task, self._optimize_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._snapshot_task = None
+        self._optimize_task = None
+
         if self._conn:
+            if self._tuning.optimize_interval:
+                await self.optimize()
+            if self._snapshot_path:
+                await self.snapshot()
             await self._conn.close()
             self._conn = None
 
+    async def snapshot(self) -> None:
+        """Write the in-memory database to the snapshot file.
+
+        The copy goes to a temporary file first and replaces the previous
+        snapshot atomically, so a crash mid-copy never corrupts it.
+        """
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+        if not self._snapshot_path:
+            raise RuntimeError("Storage has no snapshot_path configured")
+
+        async with self._snapshot_lock:
+            self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._snapshot_path.with_name(self._snapshot_path.name + ".tmp")
+            target = sqlite3.connect(tmp_path, check_same_thread=False)
+            try:
+                if isinstance(self._conn, SQLiteWriter):
+                    # One unit of work on the writer thread, between transactions
+                    await self._conn.backup(target)
+                else:
+                    # A backup started inside another task's open transaction
+                    # spins on SQLITE_LOCKED and blocks the connection's thread
+                    async with self._write_lock:
+                        await self._conn.backup(target)
+            finally:
+                target.close()
+            os.replace(tmp_path, self._snapshot_path)
+
+    async def _restore_snapshot(self) -> None:
+        """Load the snapshot file into the in-memory database."""
+        source = await aiosqlite.connect(self._snapshot_path)
+        try:
+            if isinstance(self._conn, SQLiteWriter):
+                # The writer thread is idle until init() returns
+                await source.backup(self._conn.connection)
+            else:
+                await source.backup(self._conn)
+        finally:
+            await source.close()
+        logger.info(f"Restored in-memory storage from {self._snapshot_path}")
+
+    async def optimize(self) -> None:
+        """Run PRAGMA optimize to refresh query planner statistics."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+        await self._conn.execute("PRAGMA optimize")
+
+    async def _optimize_loop(self) -> None:
+        """Background task running PRAGMA optimize every optimize_interval."""
+        while True:
+            await asyncio.sleep(self._tuning.optimize_interval)
+            try:
+                await self.optimize()
+            except Exception as e:
+                logger.error(f"Storage optimize failed: {e}", exc_info=True)
+
+    async def _snapshot_loop(self) -> None:
+        """Background task writing snapshots every snapshot_interval seconds."""
+        while True:
+            await asyncio.sleep(self._snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"Storage snapshot failed: {e}", exc_info=True)
+
+    # Writes
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """Group writes made inside the block into one transaction.
+
+        save_*/clear calls awaited inside the block (in the same task) only
+        queue their statements; everything is committed as one unit of work
+        when the block exits and discarded if it raises. Reads inside the
+        block do not see the queued writes. Nested blocks join the outer one.
+        """
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        current = _pending_batch.get()
+        if current is not None and current.storage is self and not current.closed:
+            yield
+            return
+
+        pending = _PendingBatch(storage=self)
+        token = _pending_batch.set(pending)
+        try:
+            yield
+        finally:
+            pending.closed = True
+            _pending_batch.reset(token)
+        if pending.statements:
+            await self._commit(pending.statements)
+
+    async def _write(self, statements: list[Statement]) -> None:
+        """Commit statements, or queue them if a batch() is open."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        pending = _pending_batch.get()
+        if pending is not None and pending.storage is self and not pending.closed:
+            pending.statements.extend(statements)
+            return
+        await self._commit(statements)
+
+    async def _write_one(self, sql: str, params: tuple) -> None:
+        """Commit (or queue) a single statement."""
+        await self._write([(sql, params)])
+
+    async def _commit(self, statements: list[Statement]) -> None:
+        """Run statements in one transaction on the configured engine."""
+        if isinstance(self._conn, SQLiteWriter):
+            await self._conn.submit(_execute_statements, statements)
+            return
+
+        # A concurrent transaction's rollback would undo these statements too
+        async with self._write_lock:
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        await self._conn.executemany(sql, params)
+                    else:
+                        await self._conn.execute(sql, params)
+                await self._conn.commit()
+            except BaseException:
+                # Also on cancellation: the next transaction must not commit
+                # this one's statements
+                await self._conn.rollback()
+                raise
+
     # Messages
     async def save_message(self, message: Message) -> None:
         """Save a message to storage."""
@@ -140,38 +646,59 @@ class Storage:
 
         # Generate ID if not provided
         msg_id = message.id or str(uuid.uuid4())
+        if message.token_count is None:
+            message.token_count = self._token_estimator.count(message.content)
 
-        await self._conn.execute(
-            """
-            INSERT INTO messages (id, dialogue_id, role, content, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-            """,
+        statements: list[Statement] = [
             (
-                msg_id,
-                message.dialogue_id,
-                message.role,
-                message.content,
-                message.timestamp,
-            ),
-        )
-
-        # Save attachments
-        for attachment in message.attachments:
-            await self._conn.execute(
                 """
-                INSERT INTO attachments (id, message_id, type, data, url)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO messages
+                (id, dialogue_id, role, content, timestamp, token_count, token_offset)
+                VALUES (?, ?, ?, ?, ?, ?, COALESCE(
+                    (SELECT token_count FROM dialogue_tokens WHERE dialogue_id = ?), 0
+                ))
                 """,
                 (
-                    attachment.id or str(uuid.uuid4()),
                     msg_id,
-                    attachment.type,
-                    attachment.data,
-                    attachment.url,
+                    message.dialogue_id,
+                    message.role,
+                    message.content,
+                    message.timestamp,
+                    message.token_count,
+                    message.dialogue_id,
                 ),
+            ),
+            (
+                """
+                INSERT INTO dialogue_tokens (dialogue_id, message_count, token_count)
+                VALUES (?, 1, ?)
+                ON CONFLICT(dialogue_id) DO UPDATE SET
+                    message_count = message_count + 1,
+                    token_count = token_count + excluded.token_count
+                """,
+                (message.dialogue_id, message.token_count),
+            ),
+        ]
+
+        # Save attachments
+        for attachment in message.attachments:
+            statements.append(
+                (
+                    """
+                    INSERT INTO attachments (id, message_id, type, data, url)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (
+                        attachment.id or str(uuid.uuid4()),
+                        msg_id,
+                        attachment.type,
+                        attachment.data,
+                        attachment.url,
+                    ),
+                )
             )
 
-        await self._conn.commit()
+        await self._write(statements)
 
     async def get_messages(
         self, dialogue_id: str, after: datetime | None = None
@@ -181,52 +708,47 @@ class Storage:
             raise RuntimeError("Storage not initialized")
 
         if after:
-            cursor = await self._conn.execute(
-                """
-                SELECT id, dialogue_id, role, content, timestamp
-                FROM messages
-                WHERE dialogue_id = ? AND timestamp > ?
-                ORDER BY timestamp ASC
-                """,
-                (dialogue_id, after),
-            )
+            where_clause = "WHERE dialogue_id = ? AND timestamp > ?"
+            params: tuple = (dialogue_id, after)
         else:
-            cursor = await self._conn.execute(
-                """
-                SELECT id, dialogue_id, role, content, timestamp
-                FROM messages
-                WHERE dialogue_id = ?
-                ORDER BY timestamp ASC
-                """,
-                (dialogue_id,),
-            )
+            where_clause = "WHERE dialogue_id = ?"
+            params = (dialogue_id,)
 
+        cursor = await self._conn.execute(
+            f"""
+            SELECT id, dialogue_id, role, content, timestamp, token_count
+            FROM messages
+            {where_clause}
+            ORDER BY timestamp ASC
+            """,
+            params,
+        )
         rows = await cursor.fetchall()
 
-        messages = []
-        for row in rows:
-            # Get attachments for this message
+        # Get attachments for all returned messages in one query
+        attachments_by_message: dict[str, list[Attachment]] = {}
+        if rows:
             att_cursor = await self._conn.execute(
-                """
-                SELECT id, type, data, url
+                f"""
+                SELECT id, message_id, type, data, url
                 FROM attachments
-                WHERE message_id = ?
+                WHERE message_id IN (SELECT id FROM messages {where_clause})
                 """,
-                (row[0],),
+                params,
             )
-            att_rows = await att_cursor.fetchall()
-
-            attachments = [
-                Attachment(
-                    id=att[0],
-                    message_id=row[0],
-                    type=att[1],
-                    data=att[2],
-                    url=att[3],
+            for att in await att_cursor.fetchall():
+                attachments_by_message.setdefault(att[1], []).append(
+                    Attachment(
+                        id=att[0],
+                        message_id=att[1],
+                        type=att[2],
+                        data=att[3],
+                        url=att[4],
+                    )
                 )
-                for att in att_rows
-            ]
 
+        messages = []
+        for row in rows:
             # Fix timezone for timestamp
             ts = datetime.fromisoformat(row[4]).replace(tzinfo=timezone.utc)
 
@@ -237,19 +759,66 @@ class Storage:
                     role=row[2],
                     content=row[3],
                     timestamp=ts,
-                    attachments=attachments,
+                    attachments=attachments_by_message.get(row[0], []),
+                    token_count=row[5],
                 )
             )
 
         return messages
 
+    async def get_dialogue_tokens(self, dialogue_id: str) -> tuple[int, int]:
+        """Running message and token totals of a dialogue."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            "SELECT message_count, token_count FROM dialogue_tokens WHERE dialogue_id = ?",
+            (dialogue_id,),
+        )
+        row = await cursor.fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    async def get_token_window(
+        self, dialogue_id: str, token_budget: int
+    ) -> list[Message]:
+        """Most recent messages of a dialogue whose token counts fit token_budget.
+
+        Selected by the stored running totals (an index range scan), so no
+        message text is read to size the window. Attachments are not loaded.
+        """
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            """
+            SELECT id, dialogue_id, role, content, timestamp, token_count
+            FROM messages
+            WHERE dialogue_id = ? AND token_offset >= (
+                SELECT token_count FROM dialogue_tokens WHERE dialogue_id = ?
+            ) - ?
+            ORDER BY token_offset
+            """,
+            (dialogue_id, dialogue_id, token_budget),
+        )
+        return [
+            Message(
+                id=row[0],
+                dialogue_id=row[1],
+                role=row[2],
+                content=row[3],
+                timestamp=_parse_ts(row[4]),
+                token_count=row[5],
+            )
+            for row in await cursor.fetchall()
+        ]
+
     # DialogueState
     async def save_dialogue_state(self, state: DialogueState) -> None:
         """Save dialogue state."""
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        await self._conn.execute(
+        await self._write_one(
             """
             INSERT OR REPLACE INTO dialogue_states
             (user_id, dialogue_id, last_published_timestamp, updated_at)
@@ -257,7 +826,29 @@ class Storage:
             """,
             (state.user_id, state.dialogue_id, state.last_published_timestamp),
         )
-        await self._conn.commit()
+
+    async def save_dialogue_states(self, states: list[DialogueState]) -> None:
+        """Save several dialogue states in one transaction."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+        if not states:
+            return
+
+        await self._write(
+            [
+                (
+                    """
+                    INSERT OR REPLACE INTO dialogue_states
+                    (user_id, dialogue_id, last_published_timestamp, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    """,
+                    [
+                        (s.user_id, s.dialogue_id, s.last_published_timestamp)
+                        for s in states
+                    ],
+                )
+            ]
+        )
 
     async def get_dialogue_state(self, user_id: str) -> DialogueState | None:
         """Get dialogue state for a user."""
@@ -287,13 +878,306 @@ class Storage:
             ),
         )
 
+    async def get_restorable_dialogues(
+        self,
+        limit: int | None = None,
+        user_filter: Callable[[str], bool] | None = None,
+    ) -> list[tuple[DialogueState, str | None, list[Message]]]:
+        """Dialogue states, most recently updated first, with the user's team_id
+        (None for unknown users) and unpublished messages.
+
+        Only users accepted by user_filter (all by default) are returned, up
+        to limit. Two set-based queries regardless of the number of
+        dialogues: the states, then every message newer than its dialogue's
+        last_published_timestamp. Messages are returned without attachments.
+        """
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        # LIMIT -1 is unlimited in SQLite; the filter runs before the limit
+        cursor = await self._conn.execute(
+            """
+            SELECT ds.user_id, ds.dialogue_id, ds.last_published_timestamp, u.team_id
+            FROM dialogue_states ds
+            LEFT JOIN users u ON u.id = ds.user_id
+            ORDER BY ds.updated_at DESC, ds.user_id
+            LIMIT ?
+            """,
+            (-1 if limit is None or user_filter else limit,),
+        )
+        rows = await cursor.fetchall()
+        if user_filter:
+            rows = [row for row in rows if user_filter(row[0])][:limit]
+        states = [
+            (
+                DialogueState(
+                    user_id=row[0],
+                    dialogue_id=row[1],
+                    last_published_timestamp=_parse_ts(row[2]) if row[2] else None,
+                ),
+                row[3],
+            )
+            for row in rows
+        ]
+        if not states:
+            return []
+
+        cursor = await self._conn.execute(
+            """
+            SELECT m.id, m.dialogue_id, m.role, m.content, m.timestamp
+            FROM dialogue_states ds
+            JOIN messages m ON m.dialogue_id = ds.dialogue_id
+            WHERE ds.user_id IN (SELECT value FROM json_each(?))
+              AND (ds.last_published_timestamp IS NULL
+                   OR m.timestamp > ds.last_published_timestamp)
+            ORDER BY m.dialogue_id, m.timestamp
+            """,
+            (json.dumps([state.user_id for state, _ in states]),),
+        )
+        messages_by_dialogue: dict[str, list[Message]] = {}
+        for row in await cursor.fetchall():
+            messages_by_dialogue.setdefault(row[1], []).append(
+                Message(
+                    id=row[0],
+                    dialogue_id=row[1],
+                    role=row[2],
+                    content=row[3],
+                    timestamp=_parse_ts(row[4]),
+                )
+            )
+
+        return [
+            (state, team_id, messages_by_dialogue.get(state.dialogue_id, []))
+            for state, team_id in states
+        ]
+
+    # DialogueSummary
+    async def save_dialogue_summary(self, summary: DialogueSummary) -> None:
+        """Save dialogue summary."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        await self._write_one(
+            """
+            INSERT OR REPLACE INTO dialogue_summaries
+            (dialogue_id, summary, summarized_count, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """,
+            (summary.dialogue_id, summary.summary, summary.summarized_count),
+        )
+
+    async def get_dialogue_summary(self, dialogue_id: str) -> DialogueSummary | None:
+        """Get the rolling summary of a dialogue."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            """
+            SELECT dialogue_id, summary, summarized_count, updated_at
+            FROM dialogue_summaries
+            WHERE dialogue_id = ?
+            """,
+            (dialogue_id,),
+        )
+        row = await cursor.fetchone()
+
+        if not row:
+            return None
+
+        return DialogueSummary(
+            dialogue_id=row[0],
+            summary=row[1],
+            summarized_count=row[2],
+            updated_at=_parse_ts(row[3]) if row[3] else None,
+        )
+
+    # DialogueSession
+    async def save_dialogue_session(self, session: DialogueSession) -> None:
+        """Save dialogue session."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        await self._write_one(
+            """
+            INSERT OR REPLACE INTO dialogue_sessions
+            (dialogue_id, user_id, started_at, ended_at, previous_dialogue_id, carryover)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                session.dialogue_id,
+                session.user_id,
+                session.started_at,
+                session.ended_at,
+                session.previous_dialogue_id,
+                session.carryover,
+            ),
+        )
+
+    async def end_dialogue_session(self, dialogue_id: str, ended_at: datetime) -> None:
+        """Mark a dialogue session as ended."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        await self._write_one(
+            "UPDATE dialogue_sessions SET ended_at = ? WHERE dialogue_id = ?",
+            (ended_at, dialogue_id),
+        )
+
+    async def get_dialogue_session(self, dialogue_id: str) -> DialogueSession | None:
+        """Get the session of a dialogue."""
+        sessions = await self._select_sessions("dialogue_id = ?", (dialogue_id,))
+        return sessions[0] if sessions else None
+
+    async def get_dialogue_sessions(self, user_id: str) -> list[DialogueSession]:
+        """Get a user's sessions, oldest first."""
+        return await self._select_sessions("user_id = ?", (user_id,))
+
+    async def _select_sessions(self, where: str, params: tuple) -> list[DialogueSession]:
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            f"""
+            SELECT dialogue_id, user_id, started_at, ended_at,
+                   previous_dialogue_id, carryover
+            FROM dialogue_sessions
+            WHERE {where}
+            ORDER BY started_at
+            """,
+            params,
+        )
+        return [
+            DialogueSession(
+                dialogue_id=row[0],
+                user_id=row[1],
+                started_at=_parse_ts(row[2]),
+                ended_at=_parse_ts(row[3]) if row[3] else None,
+                previous_dialogue_id=row[4],
+                carryover=row[5],
+            )
+            for row in await cursor.fetchall()
+        ]
+
+    async def get_message_stats(self, dialogue_id: str) -> tuple[int, datetime | None]:
+        """Number of messages in a dialogue and the timestamp of the latest one."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            "SELECT COUNT(*), MAX(timestamp) FROM messages WHERE dialogue_id = ?",
+            (dialogue_id,),
+        )
+        count, latest = await cursor.fetchone()
+        return count, _parse_ts(latest) if latest else None
+
+    async def migrate_dialogue_sessions(self) -> int:
+        """Create sessions for dialogues stored without one.
+
+        Databases from before sessions have one dialogue per user in
+        dialogue_states; each gets a session starting at its first message.
+        Return the number of sessions created.
+        """
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            """
+            INSERT INTO dialogue_sessions (dialogue_id, user_id, started_at)
+            SELECT ds.dialogue_id, ds.user_id, COALESCE(
+                (
+                    SELECT MIN(m.timestamp) FROM messages m
+                    WHERE m.dialogue_id = ds.dialogue_id
+                ),
+                ds.updated_at
+            )
+            FROM dialogue_states ds
+            WHERE NOT EXISTS (
+                SELECT 1 FROM dialogue_sessions s WHERE s.dialogue_id = ds.dialogue_id
+            )
+            """
+        )
+        await self._conn.commit()
+        return cursor.rowcount
+
+    async def _migrate_message_tokens(self) -> None:
+        """Add token columns to an older messages table and fill them in."""
+        cursor = await self._conn.execute("PRAGMA table_info(messages)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        for column in ("token_count", "token_offset"):
+            if column not in columns:
+                await self._conn.execute(f"ALTER TABLE messages ADD COLUMN {column} INTEGER")
+        await self._conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_messages_dialogue_tokens
+            ON messages(dialogue_id, token_offset)
+            """
+        )
+
+        cursor = await self._conn.execute(
+            "SELECT id, dialogue_id, content FROM messages WHERE token_count IS NULL"
+        )
+        rows = await cursor.fetchall()
+        if rows:
+            await self._conn.executemany(
+                "UPDATE messages SET token_count = ? WHERE id = ?",
+                [(self._token_estimator.count(row[2]), row[0]) for row in rows],
+            )
+            for sql, params in _token_offset_statements({row[1] for row in rows}):
+                await self._conn.executemany(sql, params)
+            logger.info(f"Computed token counts of {len(rows)} stored messages")
+        await self._conn.commit()
+
+    # LLM response cache
+    async def get_llm_response(self, key: str, now: float) -> str | None:
+        """Cached LLM response for key unless it expired before now (epoch seconds)."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            """
+            SELECT response FROM llm_cache
+            WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)
+            """,
+            (key, now),
+        )
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def save_llm_response(
+        self, key: str, response: str, expires_at: float | None
+    ) -> None:
+        """Cache an LLM response until expires_at (epoch seconds, None for never)."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        await self._write_one(
+            """
+            INSERT OR REPLACE INTO llm_cache (key, response, expires_at)
+            VALUES (?, ?, ?)
+            """,
+            (key, response, expires_at),
+        )
+
+    async def purge_llm_responses(self, now: float) -> int:
+        """Delete cached LLM responses expired before now."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        cursor = await self._conn.execute(
+            "SELECT COUNT(*) FROM llm_cache WHERE expires_at <= ?", (now,)
+        )
+        (expired,) = await cursor.fetchone()
+        if expired:
+            await self._write_one("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        return expired
+
     # AgentState
     async def save_agent_state(self, agent_id: str, state: AgentState) -> None:
         """Save agent state."""
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        await self._conn.execute(
+        await self._write_one(
             """
             INSERT OR REPLACE INTO agent_states
             (agent_id, data, sgr_traces, updated_at)
@@ -301,11 +1185,10 @@ class Storage:
             """,
             (
                 agent_id,
-                json.dumps(state.data),
-                json.dumps(state.sgr_traces),
+                self._serializer.dumps(state.data),
+                self._serializer.dumps(state.sgr_traces),
             ),
         )
-        await self._conn.commit()
 
     async def get_agent_state(self, agent_id: str) -> AgentState | None:
         """Get agent state."""
@@ -327,8 +1210,8 @@ class Storage:
 
         return AgentState(
             agent_id=row[0],
-            data=json.loads(row[1]),
-            sgr_traces=json.loads(row[2]),
+            data=self._serializer.loads(row[1]),
+            sgr_traces=self._serializer.loads(row[2]),
         )
 
     # TraceEvents
@@ -337,7 +1220,7 @@ class Storage:
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        await self._conn.execute(
+        await self._write_one(
             """
             INSERT INTO trace_events (id, event_type, actor, data, timestamp)
             VALUES (?, ?, ?, ?, ?)
@@ -346,11 +1229,10 @@ class Storage:
                 event.id or str(uuid.uuid4()),
                 event.event_type,
                 event.actor,
-                json.dumps(event.data),
+                self._serializer.dumps(event.data),
                 event.timestamp,
             ),
         )
-        await self._conn.commit()
 
     async def get_trace_events(
         self,
@@ -392,12 +1274,13 @@ class Storage:
         cursor = await self._conn.execute(query, params)
         rows = await cursor.fetchall()
 
+        loads = self._serializer.loads
         return [
             TraceEvent(
                 id=row[0],
                 event_type=row[1],
                 actor=row[2],
-                data=json.loads(row[3]),
+                data=loads(row[3]),
                 timestamp=datetime.fromisoformat(row[4]).replace(tzinfo=timezone.utc),
             )
             for row in rows
@@ -409,7 +1292,7 @@ class Storage:
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        await self._conn.execute(
+        await self._write_one(
             """
             INSERT INTO bus_messages (id, topic, payload, source, timestamp)
             VALUES (?, ?, ?, ?, ?)
@@ -417,39 +1300,93 @@ class Storage:
             (
                 message.id or str(uuid.uuid4()),
                 message.topic.value,
-                json.dumps(message.payload),
+                self._serializer.dumps(message.payload),
                 message.source,
                 message.timestamp,
             ),
         )
-        await self._conn.commit()
 
     async def get_bus_messages(self, limit: int = 100) -> list[BusMessage]:
         """Get bus messages (newest first)."""
+        page = await self.query_bus_messages(limit=limit)
+        return page.messages
+
+    async def query_bus_messages(
+        self,
+        topic: Topic | None = None,
+        source: str | None = None,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        dialogue_id: str | None = None,
+        cursor: str | None = None,
+        limit: int = 100,
+    ) -> BusMessagePage:
+        """Get a page of bus messages (newest first) with optional filters.
+
+        Pages are keyset-paginated on (timestamp, id): pass the returned
+        next_cursor back as cursor to continue. Raises ValueError for a
+        malformed cursor.
+        """
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        cursor = await self._conn.execute(
-            """
+        # Build query dynamically
+        conditions = []
+        params: list = []
+
+        if topic:
+            conditions.append("topic = ?")
+            params.append(Topic(topic).value)
+        if source:
+            conditions.append("source = ?")
+            params.append(source)
+        if after:
+            conditions.append("timestamp > ?")
+            params.append(after)
+        if before:
+            conditions.append("timestamp < ?")
+            params.append(before)
+        if dialogue_id:
+            # Matches the expression index idx_bus_messages_dialogue_id
+            conditions.append("json_extract(payload, '$.dialogue_id') = ?")
+            params.append(dialogue_id)
+        if cursor:
+            cursor_ts, cursor_id = _decode_cursor(cursor)
+            conditions.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([cursor_ts, cursor_ts, cursor_id])
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # Fetch one extra row to know whether another page exists
+        query = f"""
             SELECT id, topic, payload, source, timestamp
             FROM bus_messages
-            ORDER BY timestamp DESC
+            {where_clause}
+            ORDER BY timestamp DESC, id DESC
             LIMIT ?
-            """,
-            (limit,),
-        )
-        rows = await cursor.fetchall()
+        """
+        params.append(limit + 1)
 
-        return [
+        db_cursor = await self._conn.execute(query, params)
+        rows = await db_cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][4], rows[-1][0])
+
+        loads = self._serializer.loads
+        messages = [
             BusMessage(
                 id=row[0],
                 topic=Topic(row[1]),
-                payload=json.loads(row[2]),
+                payload=loads(row[2]),
                 source=row[3],
                 timestamp=datetime.fromisoformat(row[4]).replace(tzinfo=timezone.utc),
             )
             for row in rows
         ]
+        return BusMessagePage(messages=messages, next_cursor=next_cursor)
 
     # Users / Teams
     async def save_team(self, team: Team) -> None:
@@ -457,28 +1394,26 @@ class Storage:
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        await self._conn.execute(
+        await self._write_one(
             """
             INSERT OR REPLACE INTO teams (id, name)
             VALUES (?, ?)
             """,
             (team.id, team.name),
         )
-        await self._conn.commit()
 
     async def save_user(self, user: User) -> None:
         """Save a user."""
         if not self._conn:
             raise RuntimeError("Storage not initialized")
 
-        await self._conn.execute(
+        await self._write_one(
             """
             INSERT OR REPLACE INTO users (id, team_id, name)
             VALUES (?, ?, ?)
             """,
             (user.id, user.team_id, user.name),
         )
-        await self._conn.commit()
 
     async def get_user(self, user_id: str) -> User | None:
         """Get a user by ID."""
@@ -500,6 +1435,331 @@ class Storage:
 
         return User(id=row[0], team_id=row[1], name=row[2])
 
+    async def get_dialogue_team(self, dialogue_id: str) -> str | None:
+        """Team of the user owning a dialogue."""
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        # The session is recorded when a dialogue starts, its state only at
+        # the next checkpoint, and a rolled-over dialogue keeps its session
+        cursor = await self._conn.execute(
+            """
+            SELECT u.team_id
+            FROM users u
+            WHERE u.id = COALESCE(
+                (SELECT user_id FROM dialogue_sessions WHERE dialogue_id = ?),
+                (SELECT user_id FROM dialogue_states WHERE dialogue_id = ?)
+            )
+            """,
+            (dialogue_id, dialogue_id),
+        )
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+    # Bulk export / import
+    async def _iter_pages(
+        self,
+        table: str,
+        columns: list[str],
+        key_columns: list[str],
+        conditions: list[str],
+        params: list,
+        batch_size: int,
+    ) -> AsyncIterator[list]:
+        """Yield raw rows page by page using keyset pagination on key_columns.
+
+        Only one page is held in memory at a time.
+        """
+        if not self._conn:
+            raise RuntimeError("Storage not initialized")
+
+        key_indexes = [columns.index(column) for column in key_columns]
+        key_list = ", ".join(key_columns)
+        last_key: list | None = None
+
+        while True:
+            page_conditions = list(conditions)
+            page_params = list(params)
+            if last_key is not None:
+                placeholders = ", ".join("?" * len(key_columns))
+                page_conditions.append(f"({key_list}) > ({placeholders})")
+                page_params.extend(last_key)
+
+            where_clause = (
+                f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+            )
+            cursor = await self._conn.execute(
+                f"""
+                SELECT {", ".join(columns)}
+                FROM {table}
+                {where_clause}
+                ORDER BY {key_list}
+                LIMIT ?
+                """,
+                page_params + [batch_size],
+            )
+            rows = await cursor.fetchall()
+            if not rows:
+                return
+
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last_key = [rows[-1][i] for i in key_indexes]
+
+    async def iter_messages(
+        self,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        team_id: str | None = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[Message]:
+        """Stream messages (oldest first) in pages of batch_size.
+
+        team_id keeps messages of dialogues whose user belongs to the team,
+        including the user's earlier sessions.
+        """
+        conditions, params = _time_conditions("timestamp", after, before)
+        if team_id:
+            # dialogue_states holds only each user's current dialogue
+            conditions.append(
+                """dialogue_id IN (
+                    SELECT s.dialogue_id FROM dialogue_sessions s
+                    JOIN users u ON u.id = s.user_id
+                    WHERE u.team_id = ?
+                    UNION
+                    SELECT ds.dialogue_id FROM dialogue_states ds
+                    JOIN users u ON u.id = ds.user_id
+                    WHERE u.team_id = ?
+                )"""
+            )
+            params.extend([team_id, team_id])
+
+        async for rows in self._iter_pages(
+            "messages",
+            ["id", "dialogue_id", "role", "content", "timestamp"],
+            ["timestamp", "id"],
+            conditions,
+            params,
+            batch_size,
+        ):
+            placeholders = ",".join("?" * len(rows))
+            att_cursor = await self._conn.execute(
+                f"""
+                SELECT id, message_id, type, data, url
+                FROM attachments
+                WHERE message_id IN ({placeholders})
+                """,
+                [row[0] for row in rows],
+            )
+            attachments_by_message: dict[str, list[Attachment]] = {}
+            for att in await att_cursor.fetchall():
+                attachments_by_message.setdefault(att[1], []).append(
+                    Attachment(id=att[0], message_id=att[1], type=att[2], data=att[3], url=att[4])
+                )
+
+            for row in rows:
+                yield Message(
+                    id=row[0],
+                    dialogue_id=row[1],
+                    role=row[2],
+                    content=row[3],
+                    timestamp=_parse_ts(row[4]),
+                    attachments=attachments_by_message.get(row[0], []),
+                )
+
+    async def iter_dialogue_states(
+        self, team_id: str | None = None, batch_size: int = 500
+    ) -> AsyncIterator[DialogueState]:
+        """Stream dialogue states in pages of batch_size."""
+        conditions, params = [], []
+        if team_id:
+            conditions.append("user_id IN (SELECT id FROM users WHERE team_id = ?)")
+            params.append(team_id)
+
+        async for rows in self._iter_pages(
+            "dialogue_states",
+            ["user_id", "dialogue_id", "last_published_timestamp"],
+            ["user_id"],
+            conditions,
+            params,
+            batch_size,
+        ):
+            for row in rows:
+                yield DialogueState(
+                    user_id=row[0],
+                    dialogue_id=row[1],
+                    last_published_timestamp=_parse_ts(row[2]) if row[2] else None,
+                )
+
+    async def iter_bus_messages(
+        self,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        team_id: str | None = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[BusMessage]:
+        """Stream bus messages (oldest first) in pages of batch_size.
+
+        team_id keeps messages whose payload user_id belongs to the team.
+        """
+        conditions, params = _time_conditions("timestamp", after, before)
+        if team_id:
+            conditions.append(
+                "json_extract(payload, '$.user_id') IN "
+                "(SELECT id FROM users WHERE team_id = ?)"
+            )
+            params.append(team_id)
+
+        loads = self._serializer.loads
+        async for rows in self._iter_pages(
+            "bus_messages",
+            ["id", "topic", "payload", "source", "timestamp"],
+            ["timestamp", "id"],
+            conditions,
+            params,
+            batch_size,
+        ):
+            for row in rows:
+                yield BusMessage(
+                    id=row[0],
+                    topic=Topic(row[1]),
+                    payload=loads(row[2]),
+                    source=row[3],
+                    timestamp=_parse_ts(row[4]),
+                )
+
+    async def iter_trace_events(
+        self,
+        after: datetime | None = None,
+        before: datetime | None = None,
+        team_id: str | None = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[TraceEvent]:
+        """Stream trace events (oldest first) in pages of batch_size.
+
+        team_id keeps events whose data user_id belongs to the team.
+        """
+        conditions, params = _time_conditions("timestamp", after, before)
+        if team_id:
+            conditions.append(
+                "json_extract(data, '$.user_id') IN "
+                "(SELECT id FROM users WHERE team_id = ?)"
+            )
+            params.append(team_id)
+
+        loads = self._serializer.loads
+        async for rows in self._iter_pages(
+            "trace_events",
+            ["id", "event_type", "actor", "data", "timestamp"],
+            ["timestamp", "id"],
+            conditions,
+            params,
+            batch_size,
+        ):
+            for row in rows:
+                yield TraceEvent(
+                    id=row[0],
+                    event_type=row[1],
+                    actor=row[2],
+                    data=loads(row[3]),
+                    timestamp=_parse_ts(row[4]),
+                )
+
+    async def import_rows(
+        self,
+        messages: list[Message] = (),
+        dialogue_states: list[DialogueState] = (),
+        bus_messages: list[BusMessage] = (),
+        trace_events: list[TraceEvent] = (),
+    ) -> None:
+        """Bulk-insert rows in one transaction, skipping existing ids."""
+        dumps = self._serializer.dumps
+        statements: list[Statement] = []
+
+        if messages:
+            statements.append(
+                (
+                    """
+                    INSERT OR IGNORE INTO messages
+                    (id, dialogue_id, role, content, timestamp, token_count)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            m.id,
+                            m.dialogue_id,
+                            m.role,
+                            m.content,
+                            m.timestamp,
+                            m.token_count
+                            if m.token_count is not None
+                            else self._token_estimator.count(m.content),
+                        )
+                        for m in messages
+                    ],
+                )
+            )
+            statements.extend(
+                _token_offset_statements({m.dialogue_id for m in messages})
+            )
+            attachments = [
+                (a.id, m.id, a.type, a.data, a.url) for m in messages for a in m.attachments
+            ]
+            if attachments:
+                statements.append(
+                    (
+                        """
+                        INSERT OR IGNORE INTO attachments (id, message_id, type, data, url)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        attachments,
+                    )
+                )
+        if dialogue_states:
+            statements.append(
+                (
+                    """
+                    INSERT OR IGNORE INTO dialogue_states
+                    (user_id, dialogue_id, last_published_timestamp, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    """,
+                    [
+                        (s.user_id, s.dialogue_id, s.last_published_timestamp)
+                        for s in dialogue_states
+                    ],
+                )
+            )
+        if bus_messages:
+            statements.append(
+                (
+                    """
+                    INSERT OR IGNORE INTO bus_messages (id, topic, payload, source, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (m.id, m.topic.value, dumps(m.payload), m.source, m.timestamp)
+                        for m in bus_messages
+                    ],
+                )
+            )
+        if trace_events:
+            statements.append(
+                (
+                    """
+                    INSERT OR IGNORE INTO trace_events (id, event_type, actor, data, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (e.id, e.event_type, e.actor, dumps(e.data), e.timestamp)
+                        for e in trace_events
+                    ],
+                )
+            )
+
+        if statements:
+            await self._write(statements)
+
     # Lifecycle
     async def clear(self) -> None:
         """Clear all data."""
@@ -510,6 +1770,10 @@ class Storage:
             "attachments",
             "messages",
             "dialogue_states",
+            "dialogue_summaries",
+            "dialogue_sessions",
+            "dialogue_tokens",
+            "llm_cache",
             "agent_states",
             "trace_events",
             "bus_messages",
@@ -517,7 +1781,4 @@ class Storage:
             "teams",
         ]
 
-        for table in tables:
-            await self._conn.execute(f"DELETE FROM {table}")
-
-        await self._conn.commit()
+        await self._write([(f"DELETE FROM {table}", ()) for table in tables])
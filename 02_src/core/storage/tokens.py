@@ -0,0 +1,61 @@
+"""Local token count estimators for stored messages."""
+
+import re
+from typing import Callable, Protocol
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class ITokenEstimator(Protocol):
+    """Estimates how many LLM tokens a text takes, without calling the LLM."""
+
+    name: str
+
+    def count(self, text: str) -> int:
+        """Estimated token count of text."""
+        ...
+
+
+class CharTokenEstimator:
+    """About 4 characters per token (fast, language-agnostic)."""
+
+    name = "chars"
+
+    def count(self, text: str) -> int:
+        return len(text) // 4 + 1
+
+
+class WordTokenEstimator:
+    """Words and punctuation, with long words split into several tokens."""
+
+    name = "words"
+
+    def count(self, text: str) -> int:
+        return sum(len(piece) // 6 + 1 for piece in _WORD_RE.findall(text)) + 1
+
+
+TOKEN_ESTIMATORS: dict[str, Callable[[], ITokenEstimator]] = {
+    "chars": CharTokenEstimator,
+    "words": WordTokenEstimator,
+}
+
+_default = CharTokenEstimator()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return _default.count(text)
+
+
+def get_token_estimator(
+    estimator: "str | ITokenEstimator | None" = None,
+) -> ITokenEstimator:
+    """Resolve an estimator by name; None picks "chars"."""
+    if estimator is not None and not isinstance(estimator, str):
+        return estimator
+    if estimator is None:
+        return CharTokenEstimator()
+    if estimator not in TOKEN_ESTIMATORS:
+        known = ", ".join(TOKEN_ESTIMATORS)
+        raise ValueError(f"Unknown token estimator {estimator!r} (known: {known})")
+    return TOKEN_ESTIMATORS[estimator]()
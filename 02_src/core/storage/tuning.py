@@ -0,0 +1,96 @@
+"""SQLite tuning profiles applied when Storage connects."""
+
+from dataclasses import dataclass, replace
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+# ms a process waits for another one's write lock on a shared database file
+SHARED_BUSY_TIMEOUT = 30_000
+
+
+@dataclass(frozen=True)
+class TuningProfile:
+    """Named set of connection PRAGMAs. None leaves the SQLite default."""
+
+    name: str
+    mmap_size: int | None = None  # bytes of the DB file to memory-map
+    cache_size: int | None = None  # pages if positive, KiB if negative
+    temp_store: str | None = None  # "DEFAULT", "FILE" or "MEMORY"
+    journal_size_limit: int | None = None  # bytes kept after a checkpoint
+    journal_mode: str | None = None  # e.g. "WAL"; persists in the database file
+    busy_timeout: int | None = None  # ms to wait for another connection's lock
+    optimize_interval: float | None = None  # seconds between PRAGMA optimize
+
+    def pragma_statements(self) -> list[str]:
+        """PRAGMA statements to run right after connecting."""
+        statements = []
+        if self.mmap_size is not None:
+            statements.append(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.cache_size is not None:
+            statements.append(f"PRAGMA cache_size = {int(self.cache_size)}")
+        if self.temp_store is not None:
+            if self.temp_store.upper() not in ("DEFAULT", "FILE", "MEMORY"):
+                raise ValueError(f"Invalid temp_store: {self.temp_store}")
+            statements.append(f"PRAGMA temp_store = {self.temp_store.upper()}")
+        if self.journal_size_limit is not None:
+            statements.append(
+                f"PRAGMA journal_size_limit = {int(self.journal_size_limit)}"
+            )
+        if self.journal_mode is not None:
+            if self.journal_mode.upper() not in JOURNAL_MODES:
+                raise ValueError(f"Invalid journal_mode: {self.journal_mode}")
+            statements.append(f"PRAGMA journal_mode = {self.journal_mode.upper()}")
+        if self.busy_timeout is not None:
+            statements.append(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        return statements
+
+    def for_shared_file(self) -> "TuningProfile":
+        """This profile for a database file written by several processes.
+
+        WAL lets readers run while another process writes, and busy_timeout
+        makes a writer wait for the lock instead of failing with
+        "database is locked". Values set on the profile are kept.
+        """
+        return replace(
+            self,
+            journal_mode=self.journal_mode or "WAL",
+            busy_timeout=self.busy_timeout
+            if self.busy_timeout is not None
+            else SHARED_BUSY_TIMEOUT,
+        )
+
+
+TUNING_PROFILES: dict[str, TuningProfile] = {
+    # SQLite defaults, kept as the baseline for comparisons
+    "default": TuningProfile(name="default"),
+    # Moderate memory use, suitable for a shared dev/staging host
+    "balanced": TuningProfile(
+        name="balanced",
+        mmap_size=64 * 1024 * 1024,
+        cache_size=-16 * 1024,  # 16 MiB
+        temp_store="MEMORY",
+        journal_size_limit=16 * 1024 * 1024,
+        optimize_interval=3600.0,
+    ),
+    # Trades memory for read/write throughput on a dedicated host
+    "throughput": TuningProfile(
+        name="throughput",
+        mmap_size=256 * 1024 * 1024,
+        cache_size=-64 * 1024,  # 64 MiB
+        temp_store="MEMORY",
+        journal_size_limit=64 * 1024 * 1024,
+        optimize_interval=600.0,
+    ),
+}
+
+
+def get_tuning_profile(profile: "str | TuningProfile | None") -> TuningProfile:
+    """Resolve a profile name (or instance) to a TuningProfile."""
+    if profile is None:
+        return TUNING_PROFILES["default"]
+    if isinstance(profile, TuningProfile):
+        return profile
+    try:
+        return TUNING_PROFILES[profile]
+    except KeyError:
+        known = ", ".join(sorted(TUNING_PROFILES))
+        raise ValueError(f"Unknown tuning profile {profile!r} (known: {known})")
@@ -0,0 +1,281 @@
+"""Write-behind pipeline: storage writes applied in order, off the caller's path."""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from ..logging_config import get_logger
+
+logger = get_logger(__name__)
+
+WriteJob = Callable[[], Awaitable[Any]]
+# Re-applies journaled records (in journal order) after a restart
+ReplayFn = Callable[[list[dict]], Awaitable[Any]]
+
+# Queued writes before enqueue() waits for the worker
+DEFAULT_MAX_PENDING = 10_000
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.1
+
+
+@dataclass(eq=False)
+class _Write:
+    fn: WriteJob
+    future: asyncio.Future | None  # Set when the caller waits for the write
+    queued_at: float
+    journaled: bool = False
+
+
+class WriteJournal:
+    """Append-only file of queued writes, one JSON record per line.
+
+    append() returns once the record is fsynced, so an enqueued write
+    survives a crash of the process. Methods block; WriteBehind runs them
+    in a thread.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def append(self, record: dict) -> None:
+        """Write a record and fsync it."""
+        if self._file is None:
+            self._file = open(self._path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def read(self) -> list[dict]:
+        """Records in append order; a torn last line (crash mid-append) is skipped."""
+        if not os.path.exists(self._path):
+            return []
+        records = []
+        with open(self._path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping torn record in write journal {self._path}")
+        return records
+
+    def truncate(self) -> None:
+        """Drop every record (all of them have been applied)."""
+        with open(self._path, "w", encoding="utf-8") as f:
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class WriteBehind:
+    """Single FIFO of storage writes drained by one worker task.
+
+    Writes are applied strictly in submission order, so a write that is
+    awaited with submit() is durable only after everything enqueued before
+    it. enqueue() returns once the write is queued; failed writes are
+    retried with backoff and logged if they still fail. stop() drains the
+    queue, so nothing accepted before shutdown is lost.
+
+    Without a journal, writes queued when the process dies are lost. With
+    one, enqueue(fn, record) first appends the record to the journal;
+    recover() hands records left over by a crash to a replay function
+    before new writes are accepted. A record may have been applied just
+    before the crash, so replay must be idempotent. The journal is
+    truncated whenever every journaled write has been applied.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        retries: int = DEFAULT_RETRIES,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        journal: WriteJournal | None = None,
+    ):
+        self._max_pending = max_pending
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._journal = journal
+        # Serializes journal appends with queueing, so the queue keeps journal order
+        self._journal_lock = asyncio.Lock()
+        self._unapplied = 0  # Journaled writes not yet applied
+        self._queue: deque[_Write] = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        self._written = 0
+        self._failed = 0
+        self._retried = 0
+        self._peak_pending = 0
+        self._max_lag = 0.0
+        self._replayed = 0
+
+    @property
+    def pending(self) -> int:
+        """Writes queued or being applied."""
+        return len(self._queue)
+
+    async def start(self) -> None:
+        """Start the worker."""
+        self._task = asyncio.create_task(self._run())
+
+    async def recover(self, replay: ReplayFn) -> int:
+        """Replay writes journaled but not applied before a crash; returns their count."""
+        if self._journal is None:
+            return 0
+        records = await asyncio.to_thread(self._journal.read)
+        if records:
+            await self._apply(lambda: replay(records))
+            self._replayed += len(records)
+        async with self._journal_lock:
+            if not self._unapplied:
+                await asyncio.to_thread(self._journal.truncate)
+        return len(records)
+
+    async def enqueue(self, fn: WriteJob, record: dict | None = None) -> None:
+        """Queue a write without waiting for it (waits only while the queue is full).
+
+        With a journal, record (what fn writes) is persisted before this returns.
+        """
+        await self._put(fn, None, record)
+
+    async def submit(self, fn: WriteJob) -> Any:
+        """Queue a write and wait until it (and every earlier write) is applied."""
+        future = asyncio.get_running_loop().create_future()
+        await self._put(fn, future)
+        return await future
+
+    async def drain(self) -> None:
+        """Wait until every write queued so far is applied.
+
+        Writes queued later are not waited for, so this returns under
+        continuous load too.
+        """
+        if self._task is None or not self._queue:
+            return
+        await self.submit(_barrier)
+
+    async def stop(self) -> None:
+        """Apply remaining writes and stop the worker."""
+        if self._task is None:
+            return
+        while self._queue:
+            await self.drain()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._journal is not None:
+            # The worker may have been cancelled before truncating
+            if not self._unapplied:
+                await asyncio.to_thread(self._journal.truncate)
+            self._journal.close()
+
+    def get_metrics(self) -> dict:
+        """Queue depth, lag and write counters."""
+        oldest = self._queue[0].queued_at if self._queue else None
+        return {
+            "pending": self.pending,
+            "peak_pending": self._peak_pending,
+            "max_pending": self._max_pending,
+            "lag_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+            "max_lag_seconds": self._max_lag,
+            "written": self._written,
+            "retried": self._retried,
+            "failed": self._failed,
+            "journal": self._journal.path if self._journal else None,
+            "replayed": self._replayed,
+        }
+
+    async def _put(
+        self, fn: WriteJob, future: asyncio.Future | None, record: dict | None = None
+    ) -> None:
+        if self._task is None:
+            raise RuntimeError("WriteBehind not started")
+        while len(self._queue) >= self._max_pending:
+            self._space.clear()
+            await self._space.wait()
+        if self._journal is None:
+            self._append(fn, future, False)
+            return
+
+        journaled = record is not None
+        if journaled:
+            self._unapplied += 1
+        async with self._journal_lock:
+            try:
+                if journaled:
+                    await asyncio.to_thread(self._journal.append, record)
+            except BaseException:
+                self._unapplied -= 1
+                raise
+            self._append(fn, future, journaled)
+
+    def _append(self, fn: WriteJob, future: asyncio.Future | None, journaled: bool) -> None:
+        self._queue.append(
+            _Write(fn=fn, future=future, queued_at=time.monotonic(), journaled=journaled)
+        )
+        self._peak_pending = max(self._peak_pending, len(self._queue))
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        """Worker: apply queued writes in order."""
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            write = self._queue[0]
+            try:
+                result = await self._apply(write.fn)
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"Write-behind write failed: {e}", exc_info=True)
+                if write.future and not write.future.done():
+                    write.future.set_exception(e)
+            else:
+                if write.fn is not _barrier:
+                    self._written += 1
+                if write.future and not write.future.done():
+                    write.future.set_result(result)
+            finally:
+                # Popped only once applied, so metrics count it as pending
+                self._queue.popleft()
+                self._space.set()
+            self._max_lag = max(self._max_lag, time.monotonic() - write.queued_at)
+            if write.journaled:
+                self._unapplied -= 1
+                await self._truncate_journal()
+
+    async def _truncate_journal(self) -> None:
+        """Empty the journal once every journaled write has been applied."""
+        async with self._journal_lock:
+            # Checked under the lock: an append may have started meanwhile
+            if not self._unapplied:
+                await asyncio.to_thread(self._journal.truncate)
+
+    async def _apply(self, fn: WriteJob) -> Any:
+        """Run a write, retrying with exponential backoff."""
+        for attempt in range(self._retries + 1):
+            try:
+                return await fn()
+            except Exception:
+                if attempt == self._retries:
+                    raise
+                self._retried += 1
+                await asyncio.sleep(self._retry_delay * 2**attempt)
+
+
+async def _barrier() -> None:
+    """No-op write used by drain()."""
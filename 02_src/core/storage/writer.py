@@ -0,0 +1,202 @@
+"""Dedicated writer thread owning a raw sqlite3 connection."""
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from ..logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+UnitOfWork = Callable[..., Any]  # fn(conn: sqlite3.Connection, *args) -> result
+
+
+def _resolve(future: asyncio.Future, result: Any, error: BaseException | None) -> None:
+    """Complete a future on its event loop (ignores cancelled waiters)."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _PrefetchedCursor:
+    """Cursor whose rows were fetched on the writer thread with the statement."""
+
+    def __init__(self, rows: list, rowcount: int, lastrowid: int | None):
+        self._rows = rows
+        self._index = 0
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+    async def fetchone(self) -> Any:
+        if self._index >= len(self._rows):
+            return None
+        row = self._rows[self._index]
+        self._index += 1
+        return row
+
+    async def fetchall(self) -> list:
+        rows = self._rows[self._index :]
+        self._index = len(self._rows)
+        return rows
+
+    async def fetchmany(self, size: int) -> list:
+        rows = self._rows[self._index : self._index + size]
+        self._index += len(rows)
+        return rows
+
+    async def close(self) -> None:
+        self._rows = []
+
+
+class _ExecuteResult:
+    """Awaitable / async context manager returned by SQLiteWriter.execute()."""
+
+    def __init__(self, coro):
+        self._coro = coro
+        self._cursor: _PrefetchedCursor | None = None
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> _PrefetchedCursor:
+        self._cursor = await self._coro
+        return self._cursor
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._cursor:
+            await self._cursor.close()
+
+
+def _execute_fetch(
+    conn: sqlite3.Connection, sql: str, parameters: Iterable
+) -> _PrefetchedCursor:
+    cursor = conn.execute(sql, parameters)
+    try:
+        rows = cursor.fetchall()
+        return _PrefetchedCursor(rows, cursor.rowcount, cursor.lastrowid)
+    finally:
+        cursor.close()
+
+
+class SQLiteWriter:
+    """Runs every database operation on one dedicated thread.
+
+    submit() ships a whole unit of work (a function taking the sqlite3
+    connection) to the thread and resolves a single future, so the
+    cross-thread handoff is paid once per operation or batch rather than
+    once per statement. execute/executescript/commit/backup/close mirror
+    the aiosqlite.Connection methods Storage and its tests use; execute
+    fetches all rows in the same hop.
+    """
+
+    def __init__(self, database: str | Path, **connect_kwargs: Any):
+        self._database = database
+        self._connect_kwargs = connect_kwargs
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._connect_error: BaseException | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Raw connection. Only safe to use from inside a unit of work."""
+        if self._conn is None:
+            raise RuntimeError("SQLiteWriter not started")
+        return self._conn
+
+    async def start(self) -> "SQLiteWriter":
+        """Start the writer thread and open the connection on it."""
+        self._thread = threading.Thread(
+            target=self._run, name="storage-writer", daemon=True
+        )
+        self._thread.start()
+        # Surfaces connect errors to the caller
+        await self.submit(lambda conn: None)
+        return self
+
+    def _run(self) -> None:
+        """Writer thread main loop."""
+        try:
+            self._conn = sqlite3.connect(self._database, **self._connect_kwargs)
+        except BaseException as e:
+            self._connect_error = e
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            fn, args, future, loop = item
+            result, error = None, None
+            if self._connect_error is not None:
+                error = self._connect_error
+            else:
+                try:
+                    result = fn(self._conn, *args)
+                except BaseException as e:
+                    error = e
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:
+                # Event loop already closed; nobody is waiting
+                logger.debug("Dropped writer result: event loop closed")
+
+    async def submit(self, fn: UnitOfWork, *args: Any) -> Any:
+        """Run fn(conn, *args) on the writer thread as one unit of work."""
+        if self._thread is None or not self._thread.is_alive():
+            raise RuntimeError("SQLiteWriter not started")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((fn, args, future, loop))
+        return await future
+
+    async def submit_batch(self, fns: list[UnitOfWork]) -> list[Any]:
+        """Run several units of work back to back, resolving one future."""
+        return await self.submit(lambda conn: [fn(conn) for fn in fns])
+
+    # aiosqlite-compatible surface
+    def execute(self, sql: str, parameters: Iterable = ()) -> _ExecuteResult:
+        """Execute a statement and prefetch its rows in one hop."""
+        return _ExecuteResult(self.submit(_execute_fetch, sql, parameters))
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable]) -> None:
+        """Execute a statement for each parameter set in one hop."""
+        params = list(parameters)
+        await self.submit(lambda conn: conn.executemany(sql, params).close())
+
+    async def executescript(self, sql_script: str) -> None:
+        """Execute a multi-statement script."""
+        await self.submit(lambda conn: conn.executescript(sql_script).close())
+
+    async def commit(self) -> None:
+        """Commit the current transaction."""
+        await self.submit(lambda conn: conn.commit())
+
+    async def rollback(self) -> None:
+        """Roll back the current transaction."""
+        await self.submit(lambda conn: conn.rollback())
+
+    async def backup(self, target: sqlite3.Connection, **kwargs: Any) -> None:
+        """Copy the database into target with the SQLite backup API."""
+        await self.submit(lambda conn: conn.backup(target, **kwargs))
+
+    async def close(self) -> None:
+        """Close the connection and stop the thread."""
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            try:
+                await self.submit(lambda conn: conn.close() if conn else None)
+            finally:
+                self._queue.put(None)
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._thread.join
+                )
+        self._thread = None
+        self._conn = None
@@ -1,6 +1,7 @@
 """Main entry point for Team Assistant Core."""
 
 import os
+import tempfile
 from pathlib import Path
 
 import uvicorn
@@ -27,6 +28,20 @@ def main():
     from core.api.routes import control
     control.set_sim_instance(sim)
 
+    # Sharded mode: dialogues are split across worker processes by user_id
+    shard_workers = int(os.getenv("SHARD_WORKERS", "1"))
+    if shard_workers > 1:
+        from core.api.sharding import run_sharded
+
+        run_sharded(
+            workers=shard_workers,
+            host=api_host,
+            port=api_port,
+            socket_dir=os.getenv("SHARD_SOCKET_DIR", tempfile.gettempdir()),
+            base_port=int(os.getenv("SHARD_BASE_PORT", str(api_port + 1))),
+        )
+        return
+
     # Create FastAPI app
     app = create_fastapi_app()
 
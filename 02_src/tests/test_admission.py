@@ -0,0 +1,129 @@
+"""Tests for AdmissionController."""
+
+import asyncio
+
+import pytest
+
+from core.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController:
+    """Tests for bounded concurrency and load shedding."""
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrency(self):
+        """Test that no more than max_concurrent requests run at once."""
+        controller = AdmissionController(max_concurrent=2, max_queue=10)
+        running = peak = 0
+
+        async def request():
+            nonlocal running, peak
+            async with controller.admit():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(request() for _ in range(6)))
+
+        assert peak == 2
+        metrics = controller.get_metrics()
+        assert metrics["admitted"] == 6
+        assert metrics["active"] == 0
+        assert metrics["peak_queue_depth"] == 4
+
+    @pytest.mark.asyncio
+    async def test_waiters_admitted_in_order(self):
+        """Test that queued requests get slots first come, first served."""
+        controller = AdmissionController(max_concurrent=1, max_queue=10)
+        release = await controller.acquire()
+        order = []
+
+        async def request(n):
+            async with controller.admit():
+                order.append(n)
+
+        tasks = [asyncio.create_task(request(n)) for n in range(3)]
+        await asyncio.sleep(0.01)
+        release()
+        await asyncio.gather(*tasks)
+
+        assert order == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejected_with_429(self):
+        """Test that a request arriving to a full queue is shed at once."""
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        release = await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire()
+
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after >= 1
+        assert controller.get_metrics()["rejected"]["queue_full"] == 1
+        release()
+        (await waiting)()
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_rejected_with_503(self):
+        """Test that a request waiting past queue_timeout is rejected."""
+        controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=0.05)
+        release = await controller.acquire()
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire()
+
+        assert exc_info.value.status_code == 503
+        metrics = controller.get_metrics()
+        assert metrics["rejected"]["timeout"] == 1
+        assert metrics["queue_depth"] == 0
+
+        # The freed slot is not handed to the timed-out waiter
+        release()
+        assert controller.get_metrics()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test that a caller cancelled while queued frees its place."""
+        controller = AdmissionController(max_concurrent=1, max_queue=5)
+        release = await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        release()
+
+        metrics = controller.get_metrics()
+        assert metrics["queue_depth"] == 0
+        assert metrics["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_release_is_idempotent(self):
+        """Test that releasing twice frees only one slot."""
+        controller = AdmissionController(max_concurrent=2)
+        release = await controller.acquire()
+        await controller.acquire()
+
+        release()
+        release()
+
+        assert controller.get_metrics()["active"] == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_time_metrics(self):
+        """Test that queue wait times are summarized."""
+        controller = AdmissionController(max_concurrent=1)
+        release = await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.05)
+        release()
+        (await waiting)()
+
+        wait = controller.get_metrics()["wait_seconds"]
+        assert wait["max"] >= 0.04
+        assert wait["p50"] is not None
@@ -112,14 +112,13 @@ class TestApplicationReset:
 
         # Add some data
         await app._dialogue_agent.handle_message("user1", "Hello")
+        dialogue_id = app._dialogue_agent._dialogue_ids["user1"]
 
         # Reset
         await app.reset()
 
         # Verify storage is cleared
-        messages = await app._storage.get_messages(
-            app._dialogue_agent._dialogue_ids["user1"]
-        )
+        messages = await app._storage.get_messages(dialogue_id)
         assert len(messages) == 0
 
     @pytest.mark.asyncio
@@ -156,6 +155,26 @@ class TestApplicationReset:
         assert state is None
 
 
+    @pytest.mark.asyncio
+    async def test_reset_drops_cached_context(self):
+        """Test that the LLM gets no history from before the reset."""
+        from unittest.mock import AsyncMock
+
+        app = Application(db_path=":memory:")
+        await app.start()
+        try:
+            app._dialogue_agent._llm.complete = AsyncMock(return_value="Reply")
+            await app._dialogue_agent.handle_message("user1", "Before reset")
+
+            await app.reset()
+            await app._dialogue_agent.handle_message("user1", "After reset")
+
+            context = app._dialogue_agent._llm.complete.call_args.kwargs["messages"]
+            assert [m["content"] for m in context] == ["After reset"]
+        finally:
+            await app.stop()
+
+
 class TestApplicationProperties:
     """Tests for Application properties."""
 
@@ -1,8 +1,14 @@
 """Tests for DialogueAgent."""
 
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
 import pytest
 
-from core.models import Message
+from core.dialogue.flush import FlushPolicy
+from core.dialogue.session import SessionPolicy
+from core.models import Message, Topic
 
 
 class TestDialogueAgentHandle:
@@ -87,6 +93,571 @@ class TestDialogueAgentHandle:
             await dialogue_agent.handle_message("user1", "Hello")
 
 
+class TestDialogueAgentContext:
+    """Tests for the in-memory LLM context cache."""
+
+    @pytest.mark.asyncio
+    async def test_context_built_incrementally(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that storage is read once per dialogue, then appended in place."""
+        with patch.object(
+            storage, "get_messages", wraps=storage.get_messages
+        ) as get_messages:
+            await dialogue_agent.handle_message("user1", "First")
+            await dialogue_agent.handle_message("user1", "Second")
+
+        assert get_messages.await_count == 1
+        context = mock_llm.complete.call_args.kwargs["messages"]
+        assert context == [
+            {"role": "user", "content": "First"},
+            {"role": "assistant", "content": "Test response"},
+            {"role": "user", "content": "Second"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_context_includes_delivered_output(
+        self, dialogue_agent, mock_llm
+    ):
+        """Test that system messages from deliver_output join a cached context."""
+        await dialogue_agent.handle_message("user1", "Hello")
+        await dialogue_agent.deliver_output("user1", "Output content")
+        await dialogue_agent.handle_message("user1", "Thanks")
+
+        context = mock_llm.complete.call_args.kwargs["messages"]
+        assert {"role": "system", "content": "Output content"} in context
+        assert context[-1] == {"role": "user", "content": "Thanks"}
+
+    @pytest.mark.asyncio
+    async def test_cold_miss_loads_history(self, dialogue_agent, storage, mock_llm):
+        """Test that an uncached dialogue loads its history from storage."""
+        await dialogue_agent.handle_message("user1", "Hello")
+        dialogue_agent._contexts.clear()
+
+        await dialogue_agent.handle_message("user1", "Again")
+
+        context = mock_llm.complete.call_args.kwargs["messages"]
+        assert [m["content"] for m in context] == ["Hello", "Test response", "Again"]
+
+    @pytest.mark.asyncio
+    async def test_save_and_track_run_concurrently(
+        self, dialogue_agent, storage, tracker
+    ):
+        """Test that tracking and a cold context load do not wait for the save."""
+        save_message = storage.save_message
+        track = tracker.track
+        overlapped = asyncio.Event()
+        saving = asyncio.Event()
+
+        async def slow_save(message):
+            saving.set()
+            await asyncio.sleep(0.05)
+            await save_message(message)
+
+        async def checked_track(**kwargs):
+            if kwargs["event_type"] == "message_received" and saving.is_set():
+                overlapped.set()
+            await track(**kwargs)
+
+        with patch.object(storage, "save_message", slow_save), patch.object(
+            tracker, "track", checked_track
+        ):
+            await dialogue_agent.handle_message("user1", "Hello")
+
+        assert overlapped.is_set()
+        assert dialogue_agent._contexts[dialogue_agent._dialogue_ids["user1"]] == [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Test response"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_token_counts_estimated_once(self, dialogue_agent, storage):
+        """Test that each message is sized once, whether cached or reloaded."""
+        estimator = storage.token_estimator
+        with patch.object(estimator, "count", wraps=estimator.count) as count:
+            await dialogue_agent.handle_message("user1", "First")
+            await dialogue_agent.handle_message("user1", "Second")
+            dialogue_id = dialogue_agent._dialogue_ids["user1"]
+            dialogue_agent._contexts.clear()
+            await dialogue_agent._get_context(dialogue_id)
+
+        assert count.call_count == 4
+        tokens = dialogue_agent._context_tokens[dialogue_id]
+        assert tokens[-1] == (await storage.get_dialogue_tokens(dialogue_id))[1]
+
+    @pytest.mark.asyncio
+    async def test_step_timings_in_metrics(self, dialogue_agent):
+        """Test that every turn step reports its latency."""
+        await dialogue_agent.handle_message("user1", "Hello")
+
+        steps = dialogue_agent.get_metrics()["steps_ms"]
+        assert {"save", "track", "load_context", "append", "assemble", "llm", "turn"} <= set(
+            steps
+        )
+        assert steps["turn"]["max"] >= steps["llm"]["max"]
+
+
+class TestDialogueAgentEviction:
+    """Tests for idle/LRU eviction and lazy rehydration."""
+
+    @pytest.fixture
+    async def make_agent(self, storage, event_bus, tracker, mock_llm):
+        """Factory for agents with custom eviction limits."""
+        from core.dialogue.agent import DialogueAgent
+
+        agents = []
+
+        async def factory(**kwargs):
+            agent = DialogueAgent(mock_llm, event_bus, storage, tracker, **kwargs)
+            await agent.start()
+            agents.append(agent)
+            return agent
+
+        yield factory
+        for agent in agents:
+            await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_over_limit(self, make_agent, storage):
+        """Test that the least recently active published dialogue is evicted."""
+        agent = await make_agent(max_dialogues=2)
+        for user_id in ("user1", "user2"):
+            await agent.handle_message(user_id, "Hello")
+            await agent._flush_buffer(user_id)
+        dialogue_id = agent._dialogue_ids["user1"]
+
+        await agent.handle_message("user3", "Hello")
+
+        assert set(agent._buffers) == {"user2", "user3"}
+        assert dialogue_id not in agent._contexts
+        assert agent.get_metrics()["evictions"] == 1
+        state = await storage.get_dialogue_state("user1")
+        assert state.dialogue_id == dialogue_id
+        assert state.last_published_timestamp is not None
+
+    @pytest.mark.asyncio
+    async def test_unpublished_dialogue_not_evicted(self, make_agent):
+        """Test that dialogues waiting for a flush stay in memory."""
+        agent = await make_agent(max_dialogues=1)
+
+        await agent.handle_message("user1", "Hello")
+        await agent.handle_message("user2", "Hello")
+
+        assert set(agent._buffers) == {"user1", "user2"}
+        assert agent.get_metrics()["evictions"] == 0
+
+    @pytest.mark.asyncio
+    async def test_dialogue_with_turn_in_progress_not_evicted(self, make_agent, storage):
+        """Test that a dialogue is not evicted while its turn saves the message."""
+        agent = await make_agent(max_dialogues=1)
+        await agent.handle_message("user1", "First")
+        await agent._flush_buffer("user1")
+
+        saving = asyncio.Event()
+        release = asyncio.Event()
+        save_message = storage.save_message
+
+        async def slow_save(message):
+            if message.content == "Second":
+                saving.set()
+                await release.wait()
+            await save_message(message)
+
+        with patch.object(storage, "save_message", side_effect=slow_save):
+            turn = asyncio.create_task(agent.handle_message("user1", "Second"))
+            await saving.wait()
+            await agent.handle_message("user2", "Hello")
+            release.set()
+            assert await turn == "Test response"
+
+        assert set(agent._buffers) == {"user1", "user2"}
+        assert agent.get_metrics()["evictions"] == 0
+
+    @pytest.mark.asyncio
+    async def test_evicted_dialogue_rehydrated(self, make_agent, mock_llm):
+        """Test that the next message restores the dialogue and its history."""
+        agent = await make_agent(max_dialogues=1)
+        await agent.handle_message("user1", "First")
+        await agent._flush_buffer("user1")
+        dialogue_id = agent._dialogue_ids["user1"]
+        await agent.handle_message("user2", "Hello")
+        await agent._flush_buffer("user2")
+        assert "user1" not in agent._buffers
+
+        await agent.handle_message("user1", "Second")
+
+        assert agent._dialogue_ids["user1"] == dialogue_id
+        assert agent.get_metrics()["rehydrations"] == 1
+        context = mock_llm.complete.call_args.kwargs["messages"]
+        assert [m["content"] for m in context] == ["First", "Test response", "Second"]
+
+    @pytest.mark.asyncio
+    async def test_idle_dialogue_evicted(self, make_agent):
+        """Test that a dialogue idle past idle_timeout is evicted after its flush."""
+        agent = await make_agent(
+            idle_timeout=0.3, flush_policy=FlushPolicy(idle_delay=0.1, max_age=0.1)
+        )
+
+        await agent.handle_message("user1", "Hello")
+        await asyncio.sleep(0.6)
+
+        assert agent._buffers == {}
+        assert agent._dialogue_ids == {}
+        assert agent.get_metrics()["active_dialogues"] == 0
+        assert agent.get_metrics()["evictions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_deliver_output_uses_stored_dialogue(self, make_agent, storage):
+        """Test that deliver_output to a cold user keeps the stored dialogue_id."""
+        from core.models import DialogueState
+
+        await storage.save_dialogue_state(
+            DialogueState(user_id="user1", dialogue_id="dialogue123")
+        )
+        agent = await make_agent()
+
+        await agent.deliver_output("user1", "Output content")
+
+        messages = await storage.get_messages("dialogue123")
+        assert [m.content for m in messages] == ["Output content"]
+
+
+class TestDialogueAgentMailbox:
+    """Tests for per-user ordering of concurrent messages."""
+
+    @pytest.mark.asyncio
+    async def test_same_user_messages_processed_in_order(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that concurrent messages from one user do not interleave."""
+        in_flight = 0
+        peak = 0
+
+        async def complete(messages, system=None, max_tokens=1024):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return f"Reply to {messages[-1]['content']}"
+
+        mock_llm.complete.side_effect = complete
+
+        responses = await asyncio.gather(
+            *(dialogue_agent.handle_message("user1", f"m{i}") for i in range(3))
+        )
+
+        assert responses == ["Reply to m0", "Reply to m1", "Reply to m2"]
+        assert peak == 1
+        messages = await storage.get_messages(dialogue_agent._dialogue_ids["user1"])
+        assert [m.content for m in messages] == [
+            "m0", "Reply to m0", "m1", "Reply to m1", "m2", "Reply to m2",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_different_users_processed_in_parallel(
+        self, dialogue_agent, mock_llm
+    ):
+        """Test that different users' LLM calls overlap."""
+        in_flight = 0
+        peak = 0
+
+        async def complete(messages, system=None, max_tokens=1024):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.02)
+            in_flight -= 1
+            return "ok"
+
+        mock_llm.complete.side_effect = complete
+
+        await asyncio.gather(
+            *(dialogue_agent.handle_message(f"user{i}", "Hello") for i in range(3))
+        )
+
+        assert peak == 3
+        assert dialogue_agent.get_metrics()["mailboxes"]["processed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_stream_holds_mailbox(self, dialogue_agent, storage, mock_llm):
+        """Test that a message waits for an open stream of the same user."""
+
+        async def stream(messages, system=None, max_tokens=1024):
+            yield "Streamed"
+
+        mock_llm.stream = stream
+        chunks = await dialogue_agent.handle_message_stream("user1", "First")
+        second = asyncio.create_task(dialogue_agent.handle_message("user1", "Second"))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+
+        assert [chunk async for chunk in chunks] == ["Streamed"]
+        await second
+
+        messages = await storage.get_messages(dialogue_agent._dialogue_ids["user1"])
+        assert [m.content for m in messages] == [
+            "First", "Streamed", "Second", "Test response",
+        ]
+
+
+class TestDialogueAgentCoalescing:
+    """Tests for coalescing bursts of messages into one LLM call."""
+
+    @pytest.fixture
+    async def coalescing_agent(self, storage, event_bus, tracker, mock_llm):
+        """DialogueAgent with coalescing enabled."""
+        from core.dialogue.agent import DialogueAgent
+
+        agent = DialogueAgent(mock_llm, event_bus, storage, tracker, coalesce=True)
+        await agent.start()
+        yield agent
+        await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_burst_shares_one_llm_call(
+        self, coalescing_agent, storage, mock_llm
+    ):
+        """Test that messages sent during a generation are answered together."""
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def complete(messages, system=None, max_tokens=1024):
+            started.set()
+            await release.wait()
+            user_texts = [m["content"] for m in messages if m["role"] == "user"]
+            return "Reply to " + ", ".join(user_texts)
+
+        mock_llm.complete.side_effect = complete
+
+        first = asyncio.create_task(coalescing_agent.handle_message("user1", "a"))
+        await started.wait()
+        burst = [
+            asyncio.create_task(coalescing_agent.handle_message("user1", text))
+            for text in ("b", "c", "d")
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+
+        assert await first == "Reply to a"
+        assert await asyncio.gather(*burst) == ["Reply to a, b, c, d"] * 3
+        assert mock_llm.complete.await_count == 2
+        assert coalescing_agent.get_metrics()["coalesced_messages"] == 2
+
+        messages = await storage.get_messages(coalescing_agent._dialogue_ids["user1"])
+        assert [m.content for m in messages] == [
+            "a", "Reply to a", "b", "c", "d", "Reply to a, b, c, d",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_sequential_messages_not_coalesced(
+        self, coalescing_agent, mock_llm
+    ):
+        """Test that messages sent one after another each get their own call."""
+        await coalescing_agent.handle_message("user1", "a")
+        await coalescing_agent.handle_message("user1", "b")
+
+        assert mock_llm.complete.await_count == 2
+        assert coalescing_agent.get_metrics()["coalesced_messages"] == 0
+
+    @pytest.mark.asyncio
+    async def test_llm_error_answers_whole_burst(self, coalescing_agent, mock_llm):
+        """Test that an LLM failure still answers every caller in the batch."""
+        from core.dialogue.agent import ERROR_RESPONSE
+
+        mock_llm.complete.side_effect = RuntimeError("LLM API error")
+
+        responses = await asyncio.gather(
+            *(coalescing_agent.handle_message("user1", t) for t in ("a", "b"))
+        )
+
+        assert responses == [ERROR_RESPONSE, ERROR_RESPONSE]
+
+
+class TestDialogueAgentWriteBehind:
+    """Tests for saving traces and assistant messages after the reply."""
+
+    @pytest.fixture
+    async def agent(self, storage, event_bus, tracker, mock_llm):
+        """DialogueAgent with write-behind enabled."""
+        from core.dialogue.agent import DialogueAgent
+
+        agent = DialogueAgent(mock_llm, event_bus, storage, tracker, write_behind=True)
+        await agent.start()
+        yield agent
+        await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_reply_does_not_wait_for_assistant_save(self, agent, storage):
+        """Test that the response returns while the assistant Message is queued."""
+        save_message = storage.save_message
+        saved = asyncio.Event()
+
+        async def slow_save(message):
+            if message.role == "assistant":
+                await asyncio.sleep(0.2)
+            await save_message(message)
+            if message.role == "assistant":
+                saved.set()
+
+        with patch.object(storage, "save_message", slow_save):
+            response = await asyncio.wait_for(agent.handle_message("user1", "Hello"), 0.15)
+            assert response == "Test response"
+            assert not saved.is_set()
+            await agent._writes.drain()
+
+        messages = await storage.get_messages(agent._dialogue_ids["user1"])
+        assert [m.role for m in messages] == ["user", "assistant"]
+
+    @pytest.mark.asyncio
+    async def test_next_turn_reads_queued_writes(self, agent, storage, mock_llm):
+        """Test that a context loaded from Storage includes the queued reply."""
+        await agent.handle_message("user1", "First")
+        agent._contexts.clear()
+
+        await agent.handle_message("user1", "Second")
+
+        context = mock_llm.complete.call_args.kwargs["messages"]
+        assert [m["content"] for m in context] == ["First", "Test response", "Second"]
+
+    @pytest.mark.asyncio
+    async def test_stop_saves_queued_writes(self, storage, event_bus, tracker, mock_llm):
+        """Test that stop() applies queued messages and trace events."""
+        from core.dialogue.agent import DialogueAgent
+
+        agent = DialogueAgent(mock_llm, event_bus, storage, tracker, write_behind=True)
+        await agent.start()
+        await agent.handle_message("user1", "Hello")
+        dialogue_id = agent._dialogue_ids["user1"]
+        await agent.stop()
+
+        messages = await storage.get_messages(dialogue_id)
+        assert [m.role for m in messages] == ["user", "assistant"]
+        events = await storage.get_trace_events(actor="dialogue_agent")
+        assert {"message_received", "message_responded"} <= {e.event_type for e in events}
+        assert agent.get_metrics()["writes"]["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_journaled_writes_replayed_after_crash(
+        self, storage, event_bus, tracker, mock_llm, tmp_path
+    ):
+        """Test that a reply queued when the process died is saved on restart."""
+        from core.dialogue.agent import DialogueAgent
+
+        journal = str(tmp_path / "writes")
+        agent = DialogueAgent(
+            mock_llm, event_bus, storage, tracker, write_behind=True, write_journal=journal
+        )
+        await agent.start()
+        save_message = storage.save_message
+
+        async def hanging_save(message):
+            if message.role == "assistant":
+                await asyncio.Event().wait()
+            await save_message(message)
+
+        with patch.object(storage, "save_message", hanging_save):
+            await agent.handle_message("user1", "Hello")
+            dialogue_id = agent._dialogue_ids["user1"]
+            # The process dies before the queued reply is written
+            agent._writes._task.cancel()
+            await asyncio.sleep(0)
+
+        restarted = DialogueAgent(
+            mock_llm, event_bus, storage, tracker, write_behind=True, write_journal=journal
+        )
+        await restarted.start()
+        await restarted.stop()
+
+        messages = await storage.get_messages(dialogue_id)
+        assert [m.content for m in messages] == ["Hello", "Test response"]
+        events = await storage.get_trace_events(actor="dialogue_agent")
+        types = [e.event_type for e in events]
+        assert types.count("message_received") == 1
+        assert types.count("message_responded") == 1
+
+
+class TestDialogueAgentStream:
+    """Tests for DialogueAgent.handle_message_stream()."""
+
+    @staticmethod
+    def _stream(*chunks, error=None):
+        async def stream(messages, system=None, max_tokens=1024):
+            for chunk in chunks:
+                yield chunk
+            if error:
+                raise error
+
+        return stream
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_chunks_and_saves_response(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that chunks are yielded and the full response is saved at the end."""
+        mock_llm.stream = self._stream("Hel", "lo", "!")
+
+        chunks = await dialogue_agent.handle_message_stream("user1", "Hi")
+        received = [chunk async for chunk in chunks]
+
+        assert received == ["Hel", "lo", "!"]
+        messages = await storage.get_messages(dialogue_agent._dialogue_ids["user1"])
+        assert [(m.role, m.content) for m in messages] == [
+            ("user", "Hi"),
+            ("assistant", "Hello!"),
+        ]
+        events = await storage.get_trace_events(event_types=["message_responded"])
+        assert events[0].data["first_chunk_ms"] is not None
+
+    @pytest.mark.asyncio
+    async def test_stream_saves_user_message_before_first_chunk(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that the user message is persisted when the stream is returned."""
+        mock_llm.stream = self._stream("Hello")
+
+        chunks = await dialogue_agent.handle_message_stream("user1", "Hi")
+
+        messages = await storage.get_messages(dialogue_agent._dialogue_ids["user1"])
+        assert [m.role for m in messages] == ["user"]
+        await chunks.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stream_error_before_first_chunk(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that an LLM error yields and saves the apology text."""
+        from core.dialogue.agent import ERROR_RESPONSE
+
+        mock_llm.stream = self._stream(error=RuntimeError("LLM API error"))
+
+        chunks = await dialogue_agent.handle_message_stream("user1", "Hi")
+        received = [chunk async for chunk in chunks]
+
+        assert received == [ERROR_RESPONSE]
+        messages = await storage.get_messages(dialogue_agent._dialogue_ids["user1"])
+        assert messages[-1].content == ERROR_RESPONSE
+
+    @pytest.mark.asyncio
+    async def test_stream_closed_early_saves_partial(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that closing the stream early saves the text received so far."""
+        mock_llm.stream = self._stream("Part one. ", "Part two.")
+
+        chunks = await dialogue_agent.handle_message_stream("user1", "Hi")
+        assert await chunks.__anext__() == "Part one. "
+        await chunks.aclose()
+
+        messages = await storage.get_messages(dialogue_agent._dialogue_ids["user1"])
+        assert messages[-1].role == "assistant"
+        assert messages[-1].content == "Part one. "
+        assert dialogue_agent._contexts[messages[-1].dialogue_id][-1] == {
+            "role": "assistant",
+            "content": "Part one. ",
+        }
+
+
 class TestDialogueAgentDeliver:
     """Tests for DialogueAgent.deliver_output()."""
 
@@ -148,19 +719,34 @@ class TestDialogueAgentLifecycle:
         assert state is not None
 
     @pytest.mark.asyncio
-    async def test_stop_cancels_buffer_tasks(self, dialogue_agent):
-        """Test that stop cancels buffer timer tasks."""
-        # Create activity to start buffer task
-        await dialogue_agent.handle_message("user1", "Hello")
+    async def test_restart_after_clear_starts_fresh(
+        self, dialogue_agent, storage, mock_llm
+    ):
+        """Test that a reset (stop, clear, start) drops the cached dialogue."""
+        await dialogue_agent.handle_message("user1", "Before reset")
+        await dialogue_agent.stop()
+        await storage.clear()
+        await dialogue_agent.start()
+
+        await dialogue_agent.handle_message("user1", "After reset")
 
-        # Stop should cancel tasks
+        context = mock_llm.complete.call_args.kwargs["messages"]
+        assert [m["content"] for m in context] == ["After reset"]
+        assert dialogue_agent.get_metrics()["active_dialogues"] == 1
         await dialogue_agent.stop()
+        assert await storage.get_dialogue_state("user1") is not None
+        await dialogue_agent.start()
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_flush_timers(self, dialogue_agent):
+        """Test that stop drops pending buffer flush deadlines."""
+        # Create activity to arm the flush deadline
+        await dialogue_agent.handle_message("user1", "Hello")
+        assert dialogue_agent._scheduler.is_armed("user1")
 
-        # Tasks should be cancelled or removed
-        import asyncio
+        await dialogue_agent.stop()
 
-        for task in dialogue_agent._buffer_tasks.values():
-            assert task.cancelled() or task.done()
+        assert not dialogue_agent._scheduler.is_armed("user1")
 
     @pytest.mark.asyncio
     async def test_start_restores_dialogue_state(self, dialogue_agent, storage):
@@ -195,20 +781,430 @@ class TestDialogueAgentLifecycle:
         await dialogue_agent2.stop()
 
 
+    @pytest.mark.asyncio
+    async def test_start_rebuffers_unpublished_messages(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that messages not published before a restart are flushed after it."""
+        from core.dialogue.agent import DialogueAgent
+        from core.models import DialogueState
+
+        published = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        await storage.save_dialogue_state(
+            DialogueState(
+                user_id="user1", dialogue_id="dialogue1", last_published_timestamp=published
+            )
+        )
+        for minute, content in enumerate(["Published", "Hello", "Hi there"]):
+            await storage.save_message(
+                Message(
+                    id=f"msg{minute}",
+                    dialogue_id="dialogue1",
+                    role="user" if minute < 2 else "assistant",
+                    content=content,
+                    timestamp=published + timedelta(minutes=minute),
+                )
+            )
+
+        agent = DialogueAgent(
+            mock_llm,
+            event_bus,
+            storage,
+            tracker,
+            flush_policy=FlushPolicy(idle_delay=0.1, max_age=0.1),
+        )
+        await agent.start()
+        try:
+            buffer = agent._buffers["user1"]
+            assert [m.content for m in buffer.get_unpublished()] == ["Hello", "Hi there"]
+            assert agent.get_metrics()["restored_dialogues"] == 1
+
+            await asyncio.sleep(0.3)
+
+            bus_messages = await storage.get_bus_messages()
+            input_messages = [m for m in bus_messages if m.topic == Topic.INPUT]
+            assert len(input_messages) == 1
+            assert [m["id"] for m in input_messages[0].payload["messages"]] == [
+                "msg1",
+                "msg2",
+            ]
+        finally:
+            await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_start_restores_only_owned_users(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that a shard restores and publishes only its own users' dialogues."""
+        from core.dialogue.agent import DialogueAgent
+        from core.models import DialogueState
+
+        ts = datetime.now(timezone.utc)
+        for user_id in ("user1", "user2"):
+            await storage.save_dialogue_state(
+                DialogueState(user_id=user_id, dialogue_id=f"{user_id}-dialogue")
+            )
+            await storage.save_message(
+                Message(
+                    id=f"{user_id}-m",
+                    dialogue_id=f"{user_id}-dialogue",
+                    role="user",
+                    content="Hi",
+                    timestamp=ts,
+                )
+            )
+        agent = DialogueAgent(
+            mock_llm, event_bus, storage, tracker, owns_user=lambda u: u == "user1"
+        )
+        await agent.start()
+        try:
+            assert set(agent._buffers) == {"user1"}
+            await agent._flush_buffer("user1")
+            await agent._flush_buffer("user2")
+
+            inputs = [m for m in await storage.get_bus_messages() if m.topic == Topic.INPUT]
+            assert [m.payload["user_id"] for m in inputs] == ["user1"]
+        finally:
+            await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_start_restores_up_to_max_dialogues(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that restore is capped; the rest rehydrate on their next message."""
+        from core.dialogue.agent import DialogueAgent
+        from core.models import DialogueState
+
+        for i in range(3):
+            await storage.save_dialogue_state(
+                DialogueState(user_id=f"user{i}", dialogue_id=f"dialogue{i}")
+            )
+
+        agent = DialogueAgent(mock_llm, event_bus, storage, tracker, max_dialogues=2)
+        await agent.start()
+        try:
+            assert len(agent._buffers) == 2
+            assert agent.get_metrics()["restored_dialogues"] == 2
+        finally:
+            await agent.stop()
+
+
+class TestDialogueAgentSessions:
+    """Tests for session rollover."""
+
+    @pytest.fixture
+    async def agent(self, storage, event_bus, tracker, mock_llm):
+        """DialogueAgent rolling over every 4 messages or after an hour."""
+        from core.dialogue.agent import DialogueAgent
+
+        agent = DialogueAgent(
+            mock_llm,
+            event_bus,
+            storage,
+            tracker,
+            session_policy=SessionPolicy(idle_timeout=3600, max_messages=4),
+        )
+        await agent.start()
+        yield agent
+        await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_rollover_after_max_messages(self, agent, storage, mock_llm):
+        """Test that a full session continues in a new dialogue with a summary."""
+        await agent.handle_message("user1", "First")
+        await agent.handle_message("user1", "Second")
+        old_dialogue_id = agent._dialogue_ids["user1"]
+
+        mock_llm.complete.return_value = "Carryover"
+        await agent.handle_message("user1", "Third")
+
+        new_dialogue_id = agent._dialogue_ids["user1"]
+        assert new_dialogue_id != old_dialogue_id
+        call = mock_llm.complete.call_args.kwargs
+        assert call["messages"] == [{"role": "user", "content": "Third"}]
+        assert "Carryover" in call["system"]
+
+        sessions = await storage.get_dialogue_sessions("user1")
+        assert [s.dialogue_id for s in sessions] == [old_dialogue_id, new_dialogue_id]
+        assert sessions[0].ended_at is not None
+        assert sessions[1].previous_dialogue_id == old_dialogue_id
+        assert sessions[1].carryover == "Carryover"
+        assert (await storage.get_dialogue_state("user1")).dialogue_id == new_dialogue_id
+        assert len(await storage.get_messages(old_dialogue_id)) == 4
+        assert agent.get_metrics()["sessions"]["reasons"] == {"max_messages": 1}
+
+    @pytest.mark.asyncio
+    async def test_rollover_after_idle(self, agent):
+        """Test that a message after idle_timeout opens a new dialogue."""
+        await agent.handle_message("user1", "Hello")
+        old_dialogue_id = agent._dialogue_ids["user1"]
+        agent._session_stats[old_dialogue_id].last_message_at -= timedelta(hours=2)
+
+        await agent.handle_message("user1", "Back again")
+
+        assert agent._dialogue_ids["user1"] != old_dialogue_id
+        assert agent.get_metrics()["sessions"]["reasons"] == {"idle": 1}
+
+    @pytest.mark.asyncio
+    async def test_rollover_publishes_old_dialogue(self, agent, storage):
+        """Test that unpublished messages are published under the old dialogue_id."""
+        await agent.handle_message("user1", "First")
+        await agent.handle_message("user1", "Second")
+        old_dialogue_id = agent._dialogue_ids["user1"]
+
+        await agent.handle_message("user1", "Third")
+
+        bus_messages = await storage.get_bus_messages()
+        input_messages = [m for m in bus_messages if m.topic == Topic.INPUT]
+        assert len(input_messages) == 1
+        assert input_messages[0].payload["dialogue_id"] == old_dialogue_id
+        assert len(input_messages[0].payload["messages"]) == 4
+
+    @pytest.mark.asyncio
+    async def test_carryover_loaded_after_eviction(self, agent, mock_llm):
+        """Test that a rehydrated dialogue still gets its carryover."""
+        for text in ("First", "Second"):
+            await agent.handle_message("user1", text)
+        mock_llm.complete.return_value = "Carryover"
+        await agent.handle_message("user1", "Third")
+        await agent._flush_buffer("user1")
+        assert await agent._evict("user1")
+
+        await agent.handle_message("user1", "Fourth")
+
+        assert "Carryover" in mock_llm.complete.call_args.kwargs["system"]
+
+
+    @pytest.mark.asyncio
+    async def test_rollover_of_cold_dialogue_reads_token_window(
+        self, agent, storage, mock_llm
+    ):
+        """Test that summarizing an evicted dialogue does not load all its messages."""
+        for text in ("First", "Second"):
+            await agent.handle_message("user1", text)
+        old_dialogue_id = agent._dialogue_ids["user1"]
+        await agent._flush_buffer("user1")
+        assert await agent._evict("user1")
+
+        with patch.object(storage, "get_messages", wraps=storage.get_messages) as get:
+            await agent.handle_message("user1", "Third")
+
+        assert agent._dialogue_ids["user1"] != old_dialogue_id
+        # Rehydration reads only the unpublished messages (after=...)
+        full_loads = [c.args[0] for c in get.call_args_list if "after" not in c.kwargs]
+        assert old_dialogue_id not in full_loads
+        prompt = mock_llm.complete.call_args_list[-2].kwargs["messages"][0]["content"]
+        assert "user: First" in prompt
+        assert "user: Second" in prompt
+
+
+class TestDialogueAgentCheckpoint:
+    """Tests for periodic DialogueState checkpoints."""
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_saves_only_changed_states(self, dialogue_agent, storage):
+        """Test that a checkpoint writes dirty states once, in one batch."""
+        await dialogue_agent.handle_message("user1", "Hello")
+        await dialogue_agent.handle_message("user2", "Hello")
+
+        with patch.object(
+            storage, "save_dialogue_states", wraps=storage.save_dialogue_states
+        ) as save:
+            assert await dialogue_agent._checkpoint() == 2
+            assert await dialogue_agent._checkpoint() == 0
+
+            await dialogue_agent._flush_buffer("user1")
+            assert await dialogue_agent._checkpoint() == 1
+
+        assert save.await_count == 2
+        state = await storage.get_dialogue_state("user1")
+        assert state.last_published_timestamp is not None
+        assert dialogue_agent.get_metrics()["checkpoint"]["saved_states"] == 3
+
+    @pytest.mark.asyncio
+    async def test_periodic_checkpoint(self, storage, event_bus, tracker, mock_llm):
+        """Test that published progress is saved without stop()."""
+        from core.dialogue.agent import DialogueAgent
+
+        agent = DialogueAgent(
+            mock_llm,
+            event_bus,
+            storage,
+            tracker,
+            checkpoint_interval=0.1,
+            flush_policy=FlushPolicy(idle_delay=0.1, max_age=0.1),
+        )
+        await agent.start()
+        try:
+            await agent.handle_message("user1", "Hello")
+            await asyncio.sleep(0.5)
+
+            state = await storage.get_dialogue_state("user1")
+            assert state.last_published_timestamp is not None
+            assert agent.get_metrics()["checkpoint"]["dirty"] == 0
+        finally:
+            await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_checkpoint_keeps_states_dirty(self, dialogue_agent, storage):
+        """Test that states are retried after a failed checkpoint."""
+        await dialogue_agent.handle_message("user1", "Hello")
+
+        with patch.object(storage, "save_dialogue_states", side_effect=OSError("locked")):
+            with pytest.raises(OSError):
+                await dialogue_agent._checkpoint()
+
+        assert await dialogue_agent._checkpoint() == 1
+
+    @pytest.mark.asyncio
+    async def test_stop_during_checkpoint_saves_states(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that a checkpoint cancelled by stop() leaves its states to stop()."""
+        from core.dialogue.agent import DialogueAgent
+
+        agent = DialogueAgent(mock_llm, event_bus, storage, tracker, checkpoint_interval=0.05)
+        await agent.start()
+        await agent.handle_message("user1", "Hello")
+
+        saving = asyncio.Event()
+        save_dialogue_states = storage.save_dialogue_states
+        calls = 0
+
+        async def slow_save(states):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                saving.set()
+                await asyncio.sleep(10)
+            await save_dialogue_states(states)
+
+        with patch.object(storage, "save_dialogue_states", side_effect=slow_save):
+            await saving.wait()
+            await agent.stop()
+
+        state = await storage.get_dialogue_state("user1")
+        assert state is not None
+
+
 class TestDialogueAgentBuffering:
     """Tests for DialogueAgent buffering."""
 
     @pytest.mark.asyncio
-    async def test_buffer_timer_publishes_to_event_bus(
-        self, dialogue_agent, event_bus, storage
+    async def test_buffer_flush_armed_by_message(self, dialogue_agent):
+        """Test that a flush deadline is armed only once a message arrives."""
+        assert not dialogue_agent._scheduler.is_armed("user1")
+
+        await dialogue_agent.handle_message("user1", "Hello")
+
+        assert dialogue_agent._scheduler.is_armed("user1")
+
+    @pytest.mark.asyncio
+    async def test_buffer_flush_publishes_to_event_bus(
+        self, dialogue_agent, storage
     ):
-        """Test that buffer timer publishes to EventBus."""
-        # This test is tricky because timer is 5 seconds
-        # We'll verify the mechanism exists
+        """Test that the flush deadline publishes the buffer to EventBus."""
+        dialogue_agent._flush_policy = FlushPolicy(idle_delay=0.2, max_age=0.2)
+
         await dialogue_agent.handle_message("user1", "Hello")
+        await asyncio.sleep(0.5)
+
+        bus_messages = await storage.get_bus_messages()
+        input_messages = [m for m in bus_messages if m.topic == Topic.INPUT]
+        assert len(input_messages) == 1
+        assert len(input_messages[0].payload["messages"]) == 2
+        assert not dialogue_agent._scheduler.is_armed("user1")
+
+    @pytest.mark.asyncio
+    async def test_buffer_flush_debounced_until_idle(self, dialogue_agent, storage):
+        """Test that each message pushes the flush back until the buffer goes idle."""
+        dialogue_agent._flush_policy = FlushPolicy(idle_delay=0.3, max_age=5.0)
+
+        for text in ("One", "Two", "Three"):
+            await dialogue_agent.handle_message("user1", text)
+            await asyncio.sleep(0.15)
+        bus_messages = await storage.get_bus_messages()
+        assert not [m for m in bus_messages if m.topic == Topic.INPUT]
+
+        await asyncio.sleep(0.4)
+
+        bus_messages = await storage.get_bus_messages()
+        input_messages = [m for m in bus_messages if m.topic == Topic.INPUT]
+        assert len(input_messages) == 1
+        assert len(input_messages[0].payload["messages"]) == 6
+        flush = dialogue_agent.get_metrics()["flush"]
+        assert flush["flushes"] == 1
+        assert flush["reasons"] == {"idle": 1}
+        assert flush["batch_size"]["max"] == 6
+
+    @pytest.mark.asyncio
+    async def test_buffer_flush_at_max_messages(self, dialogue_agent, storage):
+        """Test that reaching max_messages flushes without waiting."""
+        dialogue_agent._flush_policy = FlushPolicy(idle_delay=5.0, max_messages=2)
+
+        await dialogue_agent.handle_message("user1", "Hello")
+        await asyncio.sleep(0.3)
+
+        bus_messages = await storage.get_bus_messages()
+        assert len([m for m in bus_messages if m.topic == Topic.INPUT]) == 1
+        assert dialogue_agent.get_metrics()["flush"]["reasons"] == {"max_messages": 1}
+
+    @pytest.mark.asyncio
+    async def test_team_flush_policy(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that users of a team with its own policy use it."""
+        from core.dialogue.agent import DialogueAgent
+        from core.models import User
+
+        await storage.save_user(User(id="user1", team_id="fast", name="User 1"))
+        await storage.save_user(User(id="user2", team_id="other", name="User 2"))
+        fast = FlushPolicy(idle_delay=0.1, max_age=0.1)
+        agent = DialogueAgent(
+            mock_llm,
+            event_bus,
+            storage,
+            tracker,
+            team_flush_policies={"fast": fast},
+        )
+        await agent.start()
+        try:
+            await agent.handle_message("user1", "Hello")
+            await agent.handle_message("user2", "Hello")
+            await asyncio.sleep(0.4)
+
+            assert agent._buffers["user1"].unpublished_count == 0
+            assert agent._buffers["user2"].unpublished_count == 2
+        finally:
+            await agent.stop()
+
+    @pytest.mark.asyncio
+    async def test_team_flush_policy_restored_without_user_lookups(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that restored dialogues get their team's policy in one pass."""
+        from core.dialogue.agent import DialogueAgent
+        from core.models import DialogueState, User
+
+        fast = FlushPolicy(idle_delay=0.1, max_age=0.1)
+        for i in range(3):
+            await storage.save_user(User(id=f"user{i}", team_id="fast", name="User"))
+            await storage.save_dialogue_state(
+                DialogueState(user_id=f"user{i}", dialogue_id=f"dialogue{i}")
+            )
+        agent = DialogueAgent(
+            mock_llm, event_bus, storage, tracker, team_flush_policies={"fast": fast}
+        )
 
-        # Check that buffer task was created
-        assert "user1" in dialogue_agent._buffer_tasks
+        with patch.object(storage, "get_user", wraps=storage.get_user) as get_user:
+            await agent.start()
+        try:
+            get_user.assert_not_awaited()
+            assert all(
+                agent._user_flush_policies[f"user{i}"] is fast for i in range(3)
+            )
+        finally:
+            await agent.stop()
 
     @pytest.mark.asyncio
     async def test_buffer_updates_timestamp_after_publishing(
@@ -201,3 +201,76 @@ class TestDialogueBuffer:
 
         unpublished = buffer.get_unpublished()
         assert len(unpublished) == 0
+
+    def test_mark_published_advances_cursor(self):
+        """Test that mark_published leaves later messages unpublished."""
+        state = DialogueState(user_id="user1", dialogue_id="dialogue1")
+        buffer = DialogueBuffer(state)
+
+        ts1 = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        ts2 = datetime(2024, 1, 1, 12, 5, 0, tzinfo=timezone.utc)
+        buffer.add(
+            Message(id="msg1", dialogue_id="dialogue1", role="user", content="A", timestamp=ts1)
+        )
+        buffer.add(
+            Message(id="msg2", dialogue_id="dialogue1", role="user", content="B", timestamp=ts2)
+        )
+
+        buffer.mark_published(1)
+
+        assert [m.id for m in buffer.get_unpublished()] == ["msg2"]
+        assert buffer.unpublished_count == 1
+        assert state.last_published_timestamp == ts1
+
+    def test_published_messages_trimmed_to_tail(self):
+        """Test that published messages beyond the tail are dropped."""
+        state = DialogueState(user_id="user1", dialogue_id="dialogue1")
+        buffer = DialogueBuffer(state, published_tail=3)
+
+        for i in range(10):
+            buffer.add(
+                Message(
+                    id=f"msg{i}",
+                    dialogue_id="dialogue1",
+                    role="user",
+                    content=str(i),
+                    timestamp=datetime(2024, 1, 1, 12, i, 0, tzinfo=timezone.utc),
+                )
+            )
+        buffer.mark_published(8)
+
+        assert [m.id for m in buffer.get_all()] == ["msg5", "msg6", "msg7", "msg8", "msg9"]
+        assert [m.id for m in buffer.get_unpublished()] == ["msg8", "msg9"]
+
+        buffer.mark_published(2)
+        assert len(buffer) == 3
+        assert buffer.get_unpublished() == []
+
+    def test_unpublished_bytes_and_arrival_times(self):
+        """Test that size and arrival times cover only unpublished messages."""
+        state = DialogueState(user_id="user1", dialogue_id="dialogue1")
+        buffer = DialogueBuffer(state)
+        assert buffer.unpublished_bytes == 0
+        assert buffer.first_unpublished_at is None
+
+        for i, content in enumerate(["ab", "привет"]):
+            buffer.add(
+                Message(
+                    id=f"msg{i}",
+                    dialogue_id="dialogue1",
+                    role="user",
+                    content=content,
+                    timestamp=datetime(2024, 1, 1, 12, i, 0, tzinfo=timezone.utc),
+                )
+            )
+
+        assert buffer.unpublished_bytes == 2 + 12
+        assert buffer.first_unpublished_at <= buffer.last_added_at
+
+        buffer.mark_published(1)
+        assert buffer.unpublished_bytes == 12
+
+        buffer.mark_published(1)
+        assert buffer.unpublished_bytes == 0
+        assert buffer.first_unpublished_at is None
+        assert buffer.last_added_at is None
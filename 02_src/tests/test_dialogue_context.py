@@ -0,0 +1,174 @@
+"""Tests for ContextAssembler."""
+
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from core.dialogue.context import ContextAssembler, token_prefix, window_start
+
+
+def _history(count: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def summary_llm():
+    """LLM mock that answers summarization requests."""
+    llm = Mock()
+    llm.complete = AsyncMock(return_value="Summary text")
+    return llm
+
+
+class TestContextAssembler:
+    """Tests for ContextAssembler.assemble()."""
+
+    @pytest.mark.asyncio
+    async def test_short_history_sent_verbatim(self, summary_llm, storage):
+        """Test that history within the limits is sent without a summary."""
+        assembler = ContextAssembler(summary_llm, storage, recent_turns=10)
+        history = _history(4)
+
+        assembled = await assembler.assemble("d1", history)
+
+        assert assembled.messages == history
+        assert assembled.system is None
+        summary_llm.complete.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_overflow_folds_old_turns_into_summary(self, summary_llm, storage):
+        """Test that overflowing turns are summarized and persisted."""
+        assembler = ContextAssembler(summary_llm, storage, recent_turns=4)
+        history = _history(9)
+
+        assembled = await assembler.assemble("d1", history)
+
+        assert assembled.messages[0]["role"] == "user"
+        assert len(assembled.messages) <= 2
+        assert "Summary text" in assembled.system
+        summary_llm.complete.assert_awaited_once()
+
+        saved = await storage.get_dialogue_summary("d1")
+        assert saved.summary == "Summary text"
+        assert saved.summarized_count == len(history) - len(assembled.messages)
+
+    @pytest.mark.asyncio
+    async def test_summary_updated_incrementally(self, summary_llm, storage):
+        """Test that later compactions send only new messages plus the summary."""
+        assembler = ContextAssembler(summary_llm, storage, recent_turns=4)
+        history = _history(9)
+        await assembler.assemble("d1", history)
+        first_count = (await storage.get_dialogue_summary("d1")).summarized_count
+
+        # Still within the limits: no new summarization call
+        history += _history(2)
+        await assembler.assemble("d1", history)
+        assert summary_llm.complete.await_count == 1
+
+        history += _history(4)
+        await assembler.assemble("d1", history)
+        assert summary_llm.complete.await_count == 2
+
+        prompt = summary_llm.complete.call_args.kwargs["messages"][0]["content"]
+        assert prompt.startswith("Current summary:\nSummary text")
+        new_lines = prompt.split("New messages:\n")[1].splitlines()
+        assert len(new_lines) == (
+            (await storage.get_dialogue_summary("d1")).summarized_count - first_count
+        )
+
+    @pytest.mark.asyncio
+    async def test_token_budget_limits_window(self, summary_llm, storage):
+        """Test that long messages are trimmed by tokens, not only by count."""
+        assembler = ContextAssembler(
+            summary_llm, storage, token_budget=600, recent_turns=50, summary_max_tokens=50
+        )
+        history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "x" * 400}
+            for i in range(11)
+        ]
+
+        assembled = await assembler.assemble("d1", history)
+
+        assert sum(len(m["content"]) for m in assembled.messages) <= 4 * 250
+        assert assembled.messages[-1] is history[-1]
+
+    @pytest.mark.asyncio
+    async def test_precomputed_token_counts_used(self, summary_llm, storage):
+        """Test that given running token totals size the window instead of the text."""
+        assembler = ContextAssembler(
+            summary_llm, storage, token_budget=600, recent_turns=50, summary_max_tokens=50
+        )
+        history = _history(11)
+        # Every message counted as 100 tokens: only the last 2 fit 250
+        tokens = [100 * i for i in range(len(history) + 1)]
+
+        assembled = await assembler.assemble("d1", history, tokens)
+
+        assert assembled.messages == history[-1:]
+        assert summary_llm.complete.await_count == 1
+
+    def test_window_start_matches_linear_scan(self):
+        """Test the binary search against a message-by-message walk."""
+        history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "x" * (i * 37 % 300)}
+            for i in range(40)
+        ]
+        tokens = token_prefix(history)
+        for budget in (1, 50, 200, 1000, 10_000):
+            for turns in (1, 5, 40):
+                index = len(history) - 1
+                while (
+                    index > 3
+                    and len(history) - index < turns
+                    and tokens[-1] - tokens[index - 1] <= budget
+                ):
+                    index -= 1
+                while index < len(history) - 1 and history[index]["role"] != "user":
+                    index += 1
+                assert window_start(history, 3, budget, turns) == index
+
+    @pytest.mark.asyncio
+    async def test_summary_failure_still_trims(self, summary_llm, storage):
+        """Test that a failed summary call sends the trimmed window anyway."""
+        summary_llm.complete.side_effect = RuntimeError("LLM API error")
+        assembler = ContextAssembler(summary_llm, storage, recent_turns=4)
+
+        assembled = await assembler.assemble("d1", _history(9))
+
+        assert len(assembled.messages) <= 2
+        assert assembled.system is None
+        assert await storage.get_dialogue_summary("d1") is None
+
+    @pytest.mark.asyncio
+    async def test_summary_restored_from_storage(self, summary_llm, storage):
+        """Test that a new assembler resumes from the stored summary."""
+        history = _history(9)
+        await ContextAssembler(summary_llm, storage, recent_turns=4).assemble("d1", history)
+
+        assembler = ContextAssembler(summary_llm, storage, recent_turns=4)
+        assembled = await assembler.assemble("d1", history)
+
+        assert "Summary text" in assembled.system
+        assert summary_llm.complete.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_dialogue_agent_uses_assembler(
+        self, storage, event_bus, tracker, mock_llm
+    ):
+        """Test that DialogueAgent sends the assembled messages and system prompt."""
+        from core.dialogue.agent import DialogueAgent
+
+        assembler = ContextAssembler(mock_llm, storage, recent_turns=2)
+        agent = DialogueAgent(mock_llm, event_bus, storage, tracker, assembler)
+        await agent.start()
+        try:
+            for text in ("one", "two", "three"):
+                await agent.handle_message("user1", text)
+        finally:
+            await agent.stop()
+
+        call = mock_llm.complete.call_args
+        assert call.kwargs["messages"] == [{"role": "user", "content": "three"}]
+        assert call.kwargs["system"].endswith("Test response")
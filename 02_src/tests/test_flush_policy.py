@@ -0,0 +1,115 @@
+"""Tests for FlushPolicy and FlushMetrics."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core.dialogue.flush import FlushMetrics, FlushPolicy, parse_team_policies
+
+
+def make_buffer(count=1, size=10, first_at=100.0, last_at=100.0):
+    """Stand-in exposing the buffer attributes a policy reads."""
+    return SimpleNamespace(
+        unpublished_count=count,
+        unpublished_bytes=size,
+        first_unpublished_at=first_at,
+        last_added_at=last_at,
+    )
+
+
+class TestFlushPolicy:
+    """Tests for FlushPolicy.flush_delay()."""
+
+    def test_idle_delay_after_last_message(self):
+        """Test that a fresh buffer is flushed idle_delay after its last message."""
+        policy = FlushPolicy(idle_delay=2.0, max_age=5.0)
+
+        delay, reason = policy.flush_delay(make_buffer(last_at=101.0), now=101.5)
+
+        assert delay == pytest.approx(1.5)
+        assert reason == "idle"
+
+    def test_max_age_bounds_debounce(self):
+        """Test that continuous activity is flushed max_age after the first message."""
+        policy = FlushPolicy(idle_delay=2.0, max_age=5.0)
+
+        delay, reason = policy.flush_delay(
+            make_buffer(first_at=100.0, last_at=104.0), now=104.0
+        )
+
+        assert delay == pytest.approx(1.0)
+        assert reason == "max_age"
+
+    def test_overdue_flushes_now(self):
+        """Test that a deadline in the past gives zero delay."""
+        policy = FlushPolicy(idle_delay=2.0, max_age=5.0)
+
+        delay, _ = policy.flush_delay(make_buffer(), now=110.0)
+
+        assert delay == 0.0
+
+    def test_max_messages_flushes_now(self):
+        """Test that reaching max_messages flushes immediately."""
+        policy = FlushPolicy(max_messages=3)
+
+        assert policy.flush_delay(make_buffer(count=3), now=100.0) == (0.0, "max_messages")
+
+    def test_max_bytes_flushes_now(self):
+        """Test that reaching max_bytes flushes immediately."""
+        policy = FlushPolicy(max_bytes=100)
+
+        assert policy.flush_delay(make_buffer(size=100), now=100.0) == (0.0, "max_bytes")
+
+    def test_from_dict_rejects_unknown_fields(self):
+        """Test that from_dict rejects misspelled fields."""
+        with pytest.raises(ValueError, match="idle"):
+            FlushPolicy.from_dict({"idle": 1.0})
+
+    def test_parse_team_policies(self):
+        """Test that team overrides are applied on top of the base policy."""
+        base = FlushPolicy(idle_delay=2.0, max_age=5.0)
+
+        policies = parse_team_policies(
+            json.dumps({"team1": {"idle_delay": 0.5}}), base
+        )
+
+        assert policies == {"team1": FlushPolicy(idle_delay=0.5, max_age=5.0)}
+        assert parse_team_policies(None, base) == {}
+
+
+class TestFlushMetrics:
+    """Tests for FlushMetrics."""
+
+    def test_snapshot_empty(self):
+        """Test metrics before any flush."""
+        snapshot = FlushMetrics().snapshot()
+
+        assert snapshot["flushes"] == 0
+        assert snapshot["batch_size"]["p50"] is None
+
+    def test_snapshot_summarizes_flushes(self):
+        """Test batch size and latency summaries and reason counts."""
+        metrics = FlushMetrics()
+        for size in range(1, 11):
+            metrics.record(size, size / 10, "idle" if size < 10 else "max_messages")
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot["flushes"] == 10
+        assert snapshot["messages"] == 55
+        assert snapshot["reasons"] == {"idle": 9, "max_messages": 1}
+        assert snapshot["batch_size"]["avg"] == pytest.approx(5.5)
+        assert snapshot["batch_size"]["max"] == 10
+        assert snapshot["latency_seconds"]["p95"] == pytest.approx(0.955)
+
+    def test_window_limits_percentiles(self):
+        """Test that percentiles cover only the recent window."""
+        metrics = FlushMetrics(window=2)
+        for size in (100, 1, 1):
+            metrics.record(size, 0.1, "idle")
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot["messages"] == 102
+        assert snapshot["batch_size"]["max"] == 1
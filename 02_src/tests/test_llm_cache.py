@@ -0,0 +1,194 @@
+"""Tests for CachingLLMProvider."""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from core.llm import CachingLLMProvider
+from core.llm.cache import request_key
+
+HELLO = [{"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture
+def provider():
+    """Mock LLM provider counting upstream calls."""
+    llm = Mock()
+    llm.model = "test-model"
+
+    async def complete(messages, system, max_tokens):
+        return messages[-1]["content"].upper()
+
+    llm.complete = AsyncMock(side_effect=complete)
+    return llm
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for cache expiry."""
+    now = [1000.0]
+    monkeypatch.setattr("core.llm.cache.time.time", lambda: now[0])
+    return now
+
+
+class TestRequestKey:
+    """Tests for request hashing."""
+
+    def test_key_is_stable_and_distinguishes_requests(self):
+        """Test that dict key order does not matter but every field does."""
+        key = request_key("m", "sys", [{"role": "user", "content": "Hi"}], 100)
+        assert key == request_key("m", "sys", [{"content": "Hi", "role": "user"}], 100)
+        assert key != request_key("other", "sys", [{"role": "user", "content": "Hi"}], 100)
+        assert key != request_key("m", None, [{"role": "user", "content": "Hi"}], 100)
+        assert key != request_key("m", "sys", [{"role": "user", "content": "Hi!"}], 100)
+        assert key != request_key("m", "sys", [{"role": "user", "content": "Hi"}], 200)
+
+
+class TestCachingLLMProviderMemory:
+    """Tests for the in-memory LRU tier."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_request_is_cached(self, provider):
+        """Test that an identical request is answered without calling the LLM."""
+        cache = CachingLLMProvider(provider)
+
+        assert await cache.complete(HELLO, system="sys") == "HELLO"
+        assert await cache.complete(HELLO, system="sys") == "HELLO"
+        await cache.complete(HELLO, system="other")
+
+        assert provider.complete.await_count == 2
+        metrics = cache.get_metrics()
+        assert metrics["hits"] == 1
+        assert metrics["misses"] == 2
+        assert metrics["hit_rate"] == pytest.approx(1 / 3)
+        assert metrics["entries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_is_evicted(self, provider):
+        """Test that the entry used longest ago is dropped beyond max_entries."""
+        cache = CachingLLMProvider(provider, max_entries=2)
+        a = [{"role": "user", "content": "a"}]
+        b = [{"role": "user", "content": "b"}]
+        c = [{"role": "user", "content": "c"}]
+
+        await cache.complete(a)
+        await cache.complete(b)
+        await cache.complete(a)  # b is now least recently used
+        await cache.complete(c)
+        provider.complete.reset_mock()
+
+        await cache.complete(a)
+        await cache.complete(b)
+
+        assert provider.complete.await_count == 1
+        assert cache.get_metrics()["evictions"] == 2
+
+    @pytest.mark.asyncio
+    async def test_entries_expire_after_ttl(self, provider, clock):
+        """Test that a response older than ttl is requested again."""
+        cache = CachingLLMProvider(provider, ttl=60)
+
+        await cache.complete(HELLO)
+        clock[0] += 59
+        await cache.complete(HELLO)
+        clock[0] += 2
+        await cache.complete(HELLO)
+
+        assert provider.complete.await_count == 2
+        assert cache.get_metrics()["expired"] == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, provider):
+        """Test that a failed request is retried next time."""
+        provider.complete.side_effect = [RuntimeError("LLM API error"), "Recovered"]
+        cache = CachingLLMProvider(provider)
+
+        with pytest.raises(RuntimeError):
+            await cache.complete(HELLO)
+        assert await cache.complete(HELLO) == "Recovered"
+        assert cache.get_metrics()["entries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_share_one_call(self, provider):
+        """Test that requests made while the same one is in flight wait for it."""
+        release = asyncio.Event()
+
+        async def slow_complete(messages, system, max_tokens):
+            await release.wait()
+            return "Shared"
+
+        provider.complete.side_effect = slow_complete
+        cache = CachingLLMProvider(provider)
+
+        tasks = [asyncio.create_task(cache.complete(HELLO)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*tasks) == ["Shared"] * 3
+        assert provider.complete.await_count == 1
+        assert cache.get_metrics()["coalesced"] == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_is_cached_when_complete(self, provider):
+        """Test that a streamed response is replayed as one chunk."""
+
+        async def stream(messages, system, max_tokens):
+            for chunk in ("Hel", "lo"):
+                yield chunk
+
+        provider.stream = Mock(side_effect=stream)
+        cache = CachingLLMProvider(provider)
+
+        assert [c async for c in cache.stream(HELLO)] == ["Hel", "lo"]
+        assert [c async for c in cache.stream(HELLO)] == ["Hello"]
+        assert await cache.complete(HELLO) == "Hello"
+
+        assert provider.stream.call_count == 1
+        provider.complete.assert_not_called()
+
+
+class TestCachingLLMProviderPersistent:
+    """Tests for the SQLite-backed tier."""
+
+    @pytest.mark.asyncio
+    async def test_responses_survive_a_new_cache(self, provider, storage):
+        """Test that a response stored by one cache is found by another."""
+        await CachingLLMProvider(provider, storage=storage).complete(HELLO)
+
+        cache = CachingLLMProvider(provider, storage=storage)
+        assert await cache.complete(HELLO) == "HELLO"
+        assert await cache.complete(HELLO) == "HELLO"
+
+        assert provider.complete.await_count == 1
+        metrics = cache.get_metrics()
+        assert metrics["persistent_hits"] == 1
+        assert metrics["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_responses_are_purged(self, provider, storage, clock):
+        """Test that stored responses past their ttl are deleted and not used."""
+        await CachingLLMProvider(provider, ttl=60, storage=storage).complete(HELLO)
+        clock[0] += 61
+
+        cache = CachingLLMProvider(provider, ttl=60, storage=storage)
+        await cache.complete([{"role": "user", "content": "Other"}])
+        key = request_key("test-model", None, HELLO, 1024)
+        assert await storage.get_llm_response(key, now=0) is None
+
+        await cache.complete(HELLO)
+        assert provider.complete.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_storage_failure_falls_back_to_llm(self, provider):
+        """Test that an unavailable persistent tier does not fail requests."""
+        broken = Mock()
+        error = RuntimeError("Storage not initialized")
+        broken.purge_llm_responses = AsyncMock(side_effect=error)
+        broken.get_llm_response = AsyncMock(side_effect=error)
+        broken.save_llm_response = AsyncMock(side_effect=error)
+        cache = CachingLLMProvider(provider, storage=broken)
+
+        assert await cache.complete(HELLO) == "HELLO"
+        assert await cache.complete(HELLO) == "HELLO"
+        assert provider.complete.await_count == 1
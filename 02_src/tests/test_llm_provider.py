@@ -147,3 +147,63 @@ class TestLLMProviderComplete:
             response = await provider.complete(messages=[])
 
             assert response == ""
+
+
+class TestLLMProviderStream:
+    """Tests for LLMProvider.stream() method."""
+
+    @staticmethod
+    def _client(chunks):
+        async def text_stream():
+            for chunk in chunks:
+                yield chunk
+
+        stream = Mock()
+        stream.text_stream = text_stream()
+        manager = Mock()
+        manager.__aenter__ = AsyncMock(return_value=stream)
+        manager.__aexit__ = AsyncMock(return_value=False)
+
+        client = Mock()
+        client.messages.stream = Mock(return_value=manager)
+        return client
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_text_chunks(self, monkeypatch):
+        """Test that stream() yields text as the API produces it."""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test_key")
+        mock_client = self._client(["Hel", "lo"])
+
+        with patch(
+            "core.llm.llm_provider.anthropic.AsyncAnthropic",
+            return_value=mock_client,
+        ):
+            provider = LLMProvider()
+            chunks = [
+                chunk
+                async for chunk in provider.stream(
+                    messages=[{"role": "user", "content": "Hello"}],
+                    system="You are helpful",
+                )
+            ]
+
+        assert chunks == ["Hel", "lo"]
+        call_kwargs = mock_client.messages.stream.call_args.kwargs
+        assert call_kwargs["system"] == "You are helpful"
+        assert call_kwargs["messages"] == [{"role": "user", "content": "Hello"}]
+
+    @pytest.mark.asyncio
+    async def test_stream_wraps_api_errors(self, monkeypatch):
+        """Test that API errors surface as RuntimeError."""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test_key")
+        mock_client = Mock()
+        mock_client.messages.stream = Mock(side_effect=Exception("boom"))
+
+        with patch(
+            "core.llm.llm_provider.anthropic.AsyncAnthropic",
+            return_value=mock_client,
+        ):
+            provider = LLMProvider()
+            with pytest.raises(RuntimeError, match="LLM API error"):
+                async for _ in provider.stream(messages=[]):
+                    pass
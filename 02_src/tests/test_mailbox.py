@@ -0,0 +1,161 @@
+"""Tests for Mailboxes."""
+
+import asyncio
+
+import pytest
+
+from core.dialogue.mailbox import MailboxFullError, Mailboxes
+
+
+class TestMailboxes:
+    """Tests for per-key ordered execution."""
+
+    @pytest.mark.asyncio
+    async def test_jobs_for_one_key_run_in_order(self):
+        """Test that jobs for the same key never overlap and keep order."""
+        mailboxes = Mailboxes()
+        log = []
+
+        async def job(n):
+            log.append(("start", n))
+            await asyncio.sleep(0.01)
+            log.append(("end", n))
+            return n
+
+        results = await asyncio.gather(
+            *(mailboxes.submit("user1", lambda n=n: job(n)) for n in range(3))
+        )
+
+        assert results == [0, 1, 2]
+        assert log == [
+            ("start", 0), ("end", 0),
+            ("start", 1), ("end", 1),
+            ("start", 2), ("end", 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_concurrently(self):
+        """Test that jobs for different keys overlap."""
+        mailboxes = Mailboxes()
+        running = 0
+        peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+
+        await asyncio.gather(*(mailboxes.submit(f"user{i}", job) for i in range(5)))
+
+        assert peak == 5
+
+    @pytest.mark.asyncio
+    async def test_depth_limit_rejects(self):
+        """Test that submissions beyond max_depth pending jobs are rejected."""
+        mailboxes = Mailboxes(max_depth=2)
+        gate = asyncio.Event()
+
+        tasks = [asyncio.create_task(mailboxes.submit("user1", gate.wait))]
+        await asyncio.sleep(0.01)  # First job is running
+        tasks += [
+            asyncio.create_task(mailboxes.submit("user1", gate.wait)) for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        assert mailboxes.depth("user1") == 2
+
+        with pytest.raises(MailboxFullError):
+            await mailboxes.submit("user1", gate.wait)
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        metrics = mailboxes.get_metrics()
+        assert metrics["rejected"] == 1
+        assert metrics["processed"] == 3
+        assert metrics["peak_depth"] == 2
+        assert metrics["active_mailboxes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_job_error_reaches_caller_only(self):
+        """Test that a failing job raises to its caller and later jobs still run."""
+        mailboxes = Mailboxes()
+
+        async def failing():
+            raise ValueError("boom")
+
+        async def ok():
+            return "ok"
+
+        first = asyncio.create_task(mailboxes.submit("user1", failing))
+        second = asyncio.create_task(mailboxes.submit("user1", ok))
+
+        with pytest.raises(ValueError, match="boom"):
+            await first
+        assert await second == "ok"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_skips_pending_job(self):
+        """Test that a job whose caller is cancelled before it starts is skipped."""
+        mailboxes = Mailboxes()
+        gate = asyncio.Event()
+        ran = []
+
+        async def record():
+            ran.append(True)
+
+        blocker = asyncio.create_task(mailboxes.submit("user1", gate.wait))
+        waiting = asyncio.create_task(mailboxes.submit("user1", record))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        gate.set()
+        await blocker
+        await asyncio.sleep(0)
+
+        assert ran == []
+
+    @pytest.mark.asyncio
+    async def test_hold_blocks_key_until_released(self):
+        """Test that hold() keeps later jobs for the key waiting until release."""
+        mailboxes = Mailboxes()
+        ran = []
+
+        async def record():
+            ran.append(True)
+
+        release = await mailboxes.hold("user1")
+        job = asyncio.create_task(mailboxes.submit("user1", record))
+        await asyncio.sleep(0.01)
+        assert ran == []
+
+        release()
+        await job
+        assert ran == [True]
+
+    @pytest.mark.asyncio
+    async def test_busy_while_job_running(self):
+        """Test that a key is busy from submission until its jobs finish."""
+        mailboxes = Mailboxes()
+        assert not mailboxes.busy("user1")
+
+        release = await mailboxes.hold("user1")
+        assert mailboxes.busy("user1")
+        assert not mailboxes.busy("user2")
+
+        release()
+        await asyncio.sleep(0.01)
+        assert not mailboxes.busy("user1")
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_pending(self):
+        """Test that close() cancels queued and running jobs."""
+        mailboxes = Mailboxes()
+        gate = asyncio.Event()
+        running = asyncio.create_task(mailboxes.submit("user1", gate.wait))
+        pending = asyncio.create_task(mailboxes.submit("user1", gate.wait))
+        await asyncio.sleep(0)
+
+        await mailboxes.close()
+
+        results = await asyncio.gather(running, pending, return_exceptions=True)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
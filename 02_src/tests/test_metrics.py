@@ -0,0 +1,23 @@
+"""Tests for metrics summaries."""
+
+from core.metrics import summarize
+
+
+class TestSummarize:
+    """Tests for summarize()."""
+
+    def test_empty(self):
+        """Test that no values give no statistics."""
+        assert summarize([]) == {"avg": None, "p50": None, "p95": None, "max": None}
+
+    def test_single_value(self):
+        """Test that one value is every percentile."""
+        assert summarize([2.0]) == {"avg": 2.0, "p50": 2.0, "p95": 2.0, "max": 2.0}
+
+    def test_percentiles_scaled(self):
+        """Test percentiles over a window, converted by scale."""
+        summary = summarize([i / 1000 for i in range(1, 101)], scale=1000)
+
+        assert summary["p50"] == 50.5
+        assert summary["p95"] == 95.05
+        assert summary["max"] == 100.0
@@ -0,0 +1,201 @@
+"""Tests for NDJSON export and import."""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from core.models import (
+    Attachment,
+    BusMessage,
+    DialogueSession,
+    DialogueState,
+    Message,
+    Team,
+    Topic,
+    TraceEvent,
+    User,
+)
+from core.storage import Storage
+from core.storage.ndjson import export_ndjson, import_ndjson, iter_lines
+
+
+def _ts(minute: int) -> datetime:
+    return datetime(2024, 1, 1, 12, minute, 0, tzinfo=timezone.utc)
+
+
+async def _populate(storage):
+    """Two users in different teams, each with a short dialogue."""
+    await storage.save_team(Team(id="team1", name="Engineering"))
+    await storage.save_team(Team(id="team2", name="Sales"))
+    await storage.save_user(User(id="user1", team_id="team1", name="Alice"))
+    await storage.save_user(User(id="user2", team_id="team2", name="Bob"))
+
+    for user_id, dialogue_id, minute in (("user1", "d1", 0), ("user2", "d2", 10)):
+        await storage.save_dialogue_state(
+            DialogueState(user_id=user_id, dialogue_id=dialogue_id)
+        )
+        await storage.save_message(
+            Message(
+                id=f"{dialogue_id}-m1",
+                dialogue_id=dialogue_id,
+                role="user",
+                content="Привет",
+                timestamp=_ts(minute),
+                attachments=[
+                    Attachment(
+                        id=f"{dialogue_id}-a1",
+                        message_id=f"{dialogue_id}-m1",
+                        type="file",
+                        data=b"\x00\x01",
+                    )
+                ],
+            )
+        )
+        await storage.save_message(
+            Message(
+                id=f"{dialogue_id}-m2",
+                dialogue_id=dialogue_id,
+                role="assistant",
+                content="Здравствуйте",
+                timestamp=_ts(minute + 1),
+            )
+        )
+        await storage.save_bus_message(
+            BusMessage(
+                id=f"{dialogue_id}-bus",
+                topic=Topic.INPUT,
+                payload={"user_id": user_id, "dialogue_id": dialogue_id},
+                source="dialogue_agent",
+                timestamp=_ts(minute + 2),
+            )
+        )
+        await storage.save_trace_event(
+            TraceEvent(
+                id=f"{dialogue_id}-trace",
+                event_type="message_received",
+                actor="dialogue_agent",
+                data={"user_id": user_id},
+                timestamp=_ts(minute),
+            )
+        )
+
+
+async def _collect(storage, **filters) -> list[dict]:
+    return [json.loads(line) async for line in export_ndjson(storage, batch_size=1, **filters)]
+
+
+class TestNdjsonExport:
+    """Tests for export_ndjson()."""
+
+    async def test_export_all_record_types(self, storage):
+        """Test that every record type is exported, one per line."""
+        await _populate(storage)
+
+        records = await _collect(storage)
+        types = [r["type"] for r in records]
+        assert types.count("dialogue_state") == 2
+        assert types.count("message") == 4
+        assert types.count("bus_message") == 2
+        assert types.count("trace_event") == 2
+
+    async def test_export_filters_by_team(self, storage):
+        """Test that team_id keeps only the team's rows."""
+        await _populate(storage)
+
+        records = await _collect(storage, team_id="team1")
+        assert {r.get("dialogue_id") for r in records if r["type"] == "message"} == {"d1"}
+        assert [r["id"] for r in records if r["type"] == "bus_message"] == ["d1-bus"]
+        assert [r["id"] for r in records if r["type"] == "trace_event"] == ["d1-trace"]
+        assert [r["user_id"] for r in records if r["type"] == "dialogue_state"] == ["user1"]
+
+    async def test_export_by_team_includes_earlier_sessions(self, storage):
+        """Test that messages of a rolled-over user's earlier dialogues are kept."""
+        await _populate(storage)
+        await storage.save_dialogue_session(
+            DialogueSession(dialogue_id="d1", user_id="user1", started_at=_ts(0))
+        )
+        await storage.save_dialogue_session(
+            DialogueSession(
+                dialogue_id="d3",
+                user_id="user1",
+                started_at=_ts(20),
+                previous_dialogue_id="d1",
+            )
+        )
+        await storage.save_dialogue_state(DialogueState(user_id="user1", dialogue_id="d3"))
+        await storage.save_message(
+            Message(
+                id="d3-m1", dialogue_id="d3", role="user", content="Hi", timestamp=_ts(20)
+            )
+        )
+
+        records = await _collect(storage, team_id="team1")
+        messages = {r["id"] for r in records if r["type"] == "message"}
+        assert messages == {"d1-m1", "d1-m2", "d3-m1"}
+
+    async def test_export_filters_by_time_range(self, storage):
+        """Test that after/before bound timestamped rows."""
+        await _populate(storage)
+
+        records = await _collect(storage, after=_ts(5), before=_ts(11))
+        assert [r["id"] for r in records if r["type"] == "message"] == ["d2-m1"]
+
+
+class TestNdjsonImport:
+    """Tests for import_ndjson()."""
+
+    async def test_round_trip(self, storage):
+        """Test that an export imports into an empty storage unchanged."""
+        await _populate(storage)
+        lines = [line async for line in export_ndjson(storage)]
+
+        target = Storage(":memory:")
+        await target.init()
+        try:
+
+            async def source():
+                for line in lines:
+                    yield line
+
+            counts = await import_ndjson(target, iter_lines(source()), batch_size=3)
+            assert counts == {
+                "message": 4,
+                "dialogue_state": 2,
+                "bus_message": 2,
+                "trace_event": 2,
+            }
+
+            messages = await target.get_messages("d1")
+            assert [m.content for m in messages] == ["Привет", "Здравствуйте"]
+            assert messages[0].attachments[0].data == b"\x00\x01"
+            state = await target.get_dialogue_state("user2")
+            assert state.dialogue_id == "d2"
+            page = await target.query_bus_messages(dialogue_id="d2")
+            assert [m.id for m in page.messages] == ["d2-bus"]
+
+            # Re-importing skips existing rows instead of failing
+            await import_ndjson(target, iter_lines(source()))
+            assert len(await target.get_messages("d1")) == 2
+        finally:
+            await target.close()
+
+    async def test_malformed_line_raises(self, storage):
+        """Test that a malformed line reports its line number."""
+
+        async def source():
+            yield '{"type": "message", "id": "m1"}'
+
+        with pytest.raises(ValueError, match="Line 1"):
+            await import_ndjson(storage, source())
+
+    async def test_iter_lines_handles_split_chunks(self):
+        """Test that lines and UTF-8 characters split across chunks survive."""
+        data = '{"a": "Привет"}\n{"b": 2}\n'.encode("utf-8")
+
+        async def chunks():
+            for i in range(0, len(data), 3):
+                yield data[i : i + 3]
+
+        lines = [line async for line in iter_lines(chunks())]
+        assert lines == ['{"a": "Привет"}', '{"b": 2}']
@@ -0,0 +1,99 @@
+"""Tests for Pipeline and StepTimings."""
+
+import asyncio
+
+import pytest
+
+from core.dialogue.pipeline import Pipeline, StepTimings
+
+
+class TestPipeline:
+    """Tests for Pipeline.run()."""
+
+    @pytest.mark.asyncio
+    async def test_independent_steps_run_concurrently(self):
+        """Test that steps without dependencies overlap."""
+        pipeline = Pipeline()
+
+        async def slow() -> str:
+            await asyncio.sleep(0.1)
+            return "done"
+
+        pipeline.step("a", slow)
+        pipeline.step("b", slow)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await pipeline.run()
+
+        assert loop.time() - started < 0.18
+        assert results == {"a": "done", "b": "done"}
+        assert set(pipeline.timings) == {"a", "b"}
+
+    @pytest.mark.asyncio
+    async def test_dependent_step_waits(self):
+        """Test that a step starts only after its dependencies finish."""
+        pipeline = Pipeline()
+        order = []
+
+        async def first() -> None:
+            await asyncio.sleep(0.05)
+            order.append("first")
+
+        async def second() -> None:
+            order.append("second")
+
+        pipeline.step("first", first)
+        pipeline.step("second", second, after=("first",))
+        await pipeline.run()
+
+        assert order == ["first", "second"]
+        assert pipeline.timings["second"] < 0.05
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_other_steps(self):
+        """Test that a failing step cancels the rest and raises."""
+        pipeline = Pipeline()
+        cancelled = asyncio.Event()
+
+        async def fail() -> None:
+            raise ValueError("boom")
+
+        async def slow() -> None:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        pipeline.step("fail", fail)
+        pipeline.step("slow", slow)
+
+        with pytest.raises(ValueError, match="boom"):
+            await pipeline.run()
+        assert cancelled.is_set()
+
+    def test_unknown_dependency_rejected(self):
+        """Test that dependencies must be added before the step."""
+        pipeline = Pipeline()
+
+        async def step() -> None:
+            pass
+
+        with pytest.raises(ValueError):
+            pipeline.step("b", step, after=("a",))
+
+
+class TestStepTimings:
+    """Tests for StepTimings.snapshot()."""
+
+    def test_snapshot_in_milliseconds(self):
+        """Test that recorded seconds are summarized in milliseconds."""
+        timings = StepTimings()
+        timings.record({"save": 0.01, "track": 0.002})
+        timings.record({"save": 0.03})
+
+        snapshot = timings.snapshot()
+
+        assert snapshot["save"]["max"] == pytest.approx(30)
+        assert snapshot["track"]["avg"] == pytest.approx(2)
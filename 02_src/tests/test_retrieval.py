@@ -0,0 +1,197 @@
+"""Tests for the retrieval context assembler."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.dialogue.retrieval import (  # noqa: E402
+    HashingEmbedder,
+    RetrievalContextAssembler,
+    VectorIndex,
+)
+from core.models import DialogueSession, DialogueState, Team, User  # noqa: E402
+
+FILLER = [
+    "what is the weather like today",
+    "sunny with a light breeze",
+    "should I take an umbrella",
+    "no need, it will stay dry",
+    "any plans for lunch",
+    "pizza at the corner place",
+]
+
+
+def _history() -> list[dict]:
+    history = [
+        {"role": "user", "content": "the database migration script fails on postgres"},
+        {"role": "assistant", "content": "check the migration script column types"},
+    ]
+    for i, text in enumerate(FILLER * 2):
+        history.append({"role": "user" if i % 2 == 0 else "assistant", "content": text})
+    history.append({"role": "user", "content": "back to the migration script failure"})
+    return history
+
+
+class TestHashingEmbedder:
+    """Tests for HashingEmbedder."""
+
+    def test_vectors_are_normalized(self):
+        """Test that embeddings are unit length and empty text is zero."""
+        vectors = HashingEmbedder(dimensions=64).embed(["hello world", ""])
+
+        assert vectors.shape == (2, 64)
+        assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+        assert not vectors[1].any()
+
+    def test_similar_texts_score_higher(self):
+        """Test that texts sharing words are closer than unrelated ones."""
+        query, related, unrelated = HashingEmbedder().embed(
+            ["migration script error", "the migration script failed", "lunch at noon"]
+        )
+
+        assert query @ related > query @ unrelated
+
+
+class TestVectorIndex:
+    """Tests for VectorIndex."""
+
+    def test_search_returns_best_matches(self):
+        """Test top-k search, row limit and growth past the initial capacity."""
+        embedder = HashingEmbedder()
+        texts = [f"filler text {i}" for i in range(40)] + ["deploy the release"]
+        index = VectorIndex(embedder.dimensions)
+        index.add(list(range(len(texts))), embedder.embed(texts))
+        query = embedder.embed(["deploy release"])[0]
+
+        assert len(index) == 41
+        assert index.search(query, k=1)[0][0] == 40
+        assert all(key < 10 for key, _ in index.search(query, k=3, rows=10))
+
+    def test_max_size_drops_oldest(self):
+        """Test that the oldest entries are dropped beyond max_size."""
+        embedder = HashingEmbedder(dimensions=32)
+        index = VectorIndex(embedder.dimensions, max_size=3)
+        index.add(["a", "b"], embedder.embed(["a", "b"]))
+        index.add(["c", "d"], embedder.embed(["c", "d"]))
+
+        assert index.keys() == ["b", "c", "d"]
+        assert index.search(embedder.embed(["b"])[0], k=1)[0][0] == "b"
+
+    def test_groups_follow_entries(self):
+        """Test that entry groups stay aligned with keys past max_size."""
+        embedder = HashingEmbedder(dimensions=32)
+        index = VectorIndex(embedder.dimensions, max_size=3)
+        index.add(["a", "b"], embedder.embed(["a", "b"]), group=1)
+        index.add(["c", "d"], embedder.embed(["c", "d"]), group=2)
+
+        assert index.groups().tolist() == [1, 2, 2]
+        assert index.last_key(1) == "b"
+        assert index.last_key(3) is None
+
+
+class TestRetrievalContextAssembler:
+    """Tests for RetrievalContextAssembler.assemble()."""
+
+    @pytest.mark.asyncio
+    async def test_short_history_sent_verbatim(self, storage):
+        """Test that history within the limits is sent without retrieval."""
+        assembler = RetrievalContextAssembler(storage, recent_turns=10)
+        history = _history()[:4]
+
+        assembled = await assembler.assemble("d1", history)
+
+        assert assembled.messages == history
+        assert assembled.system is None
+
+    @pytest.mark.asyncio
+    async def test_relevant_old_turns_retrieved(self, storage):
+        """Test that earlier messages similar to the latest one are added."""
+        assembler = RetrievalContextAssembler(storage, recent_turns=4, retrieved_turns=2)
+        history = _history()
+
+        assembled = await assembler.assemble("d1", history)
+
+        assert assembled.messages == history[-3:]
+        assert "database migration script fails" in assembled.system
+        assert "lunch" not in assembled.system
+        assert assembled.system.index("fails on postgres") < assembled.system.index(
+            "column types"
+        )
+
+    @pytest.mark.asyncio
+    async def test_incremental_indexing(self, storage):
+        """Test that each message is embedded once across turns."""
+        assembler = RetrievalContextAssembler(storage, recent_turns=4)
+        history = _history()
+
+        await assembler.assemble("d1", history[:5])
+        await assembler.assemble("d1", history)
+        assert len(assembler._dialogues["d1"]) == len(history)
+
+        assembler.forget("d1")
+        assert "d1" not in assembler._dialogues
+
+    @pytest.mark.asyncio
+    async def test_team_messages_retrieved(self, storage):
+        """Test that related messages from teammates' dialogues are added."""
+        await storage.save_team(Team(id="team1", name="Engineering"))
+        for user_id in ("alice", "bob"):
+            await storage.save_user(User(id=user_id, team_id="team1", name=user_id))
+            await storage.save_dialogue_state(
+                DialogueState(user_id=user_id, dialogue_id=f"d-{user_id}")
+            )
+        assembler = RetrievalContextAssembler(storage, recent_turns=4, team_turns=1)
+        await assembler.assemble(
+            "d-bob",
+            [{"role": "user", "content": "the migration script needs a postgres fix"}],
+        )
+
+        assembled = await assembler.assemble("d-alice", _history())
+
+        assert "other conversations in the team" in assembled.system
+        assert "needs a postgres fix" in assembled.system
+
+    @pytest.mark.asyncio
+    async def test_new_dialogue_joins_team_index(self, storage):
+        """Test that a dialogue without a saved state joins its team index once known."""
+        await storage.save_dialogue_session(
+            DialogueSession(
+                dialogue_id="d-bob", user_id="bob", started_at=datetime.now(timezone.utc)
+            )
+        )
+        assembler = RetrievalContextAssembler(storage, recent_turns=4, team_turns=1)
+        history = [{"role": "user", "content": "the migration script needs a postgres fix"}]
+
+        await assembler.assemble("d-bob", history)
+        assert assembler._teams == {}
+
+        await storage.save_team(Team(id="team1", name="Engineering"))
+        await storage.save_user(User(id="bob", team_id="team1", name="bob"))
+        history.append({"role": "assistant", "content": "which column type fails"})
+        await assembler.assemble("d-bob", history)
+
+        assert assembler._dialogue_teams == {"d-bob": "team1"}
+        assert len(assembler._teams["team1"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_forgotten_dialogue_not_reindexed_in_team(self, storage):
+        """Test that assembling a forgotten dialogue again adds no team duplicates."""
+        await storage.save_team(Team(id="team1", name="Engineering"))
+        await storage.save_user(User(id="bob", team_id="team1", name="bob"))
+        await storage.save_dialogue_state(DialogueState(user_id="bob", dialogue_id="d-bob"))
+        assembler = RetrievalContextAssembler(storage, recent_turns=4, team_turns=1)
+        history = [
+            {"role": "user", "content": "the migration script needs a postgres fix"},
+            {"role": "assistant", "content": "which column type fails"},
+        ]
+        await assembler.assemble("d-bob", history)
+
+        assembler.forget("d-bob")
+        history.append({"role": "user", "content": "the json column"})
+        await assembler.assemble("d-bob", history)
+
+        team_index = assembler._teams["team1"]
+        assert [key[1] for key in team_index.keys()] == [0, 1, 2]
+        assert assembler._search_team("d-bob", team_index._vectors[0]) == []
@@ -0,0 +1,119 @@
+"""Tests for TimerWheel."""
+
+import asyncio
+
+import pytest
+
+from core.dialogue.scheduler import TimerWheel
+
+
+@pytest.fixture
+async def wheel():
+    """Small fast wheel: level spans of 4, 16 and 64 ticks of 10 ms."""
+    tw = TimerWheel(tick=0.01, slots=4, levels=3)
+    await tw.start()
+    yield tw
+    await tw.stop()
+
+
+class _Recorder:
+    def __init__(self):
+        self.fired: list[tuple[str, float]] = []
+
+    async def __call__(self, key):
+        self.fired.append((key, asyncio.get_running_loop().time()))
+
+
+class TestTimerWheel:
+    """Tests for TimerWheel arm/cancel/fire."""
+
+    @pytest.mark.asyncio
+    async def test_timer_fires_once_after_delay(self, wheel):
+        """Test that an armed timer fires once, not before its delay."""
+        recorder = _Recorder()
+        armed_at = asyncio.get_running_loop().time()
+        wheel.arm("user1", 0.05, recorder)
+        assert wheel.is_armed("user1")
+
+        await asyncio.sleep(0.2)
+
+        assert [key for key, _ in recorder.fired] == ["user1"]
+        assert recorder.fired[0][1] - armed_at >= 0.04
+        assert not wheel.is_armed("user1")
+
+    @pytest.mark.asyncio
+    async def test_timers_fire_in_deadline_order(self, wheel):
+        """Test that timers across wheel levels cascade down and fire in order."""
+        recorder = _Recorder()
+        # 3 ticks (level 0), 10 ticks (level 1), 40 ticks (level 2), 100 ticks (overflow)
+        wheel.arm("overflow", 1.0, recorder)
+        wheel.arm("level2", 0.4, recorder)
+        wheel.arm("level1", 0.1, recorder)
+        wheel.arm("level0", 0.03, recorder)
+
+        await asyncio.sleep(1.3)
+
+        assert [key for key, _ in recorder.fired] == [
+            "level0",
+            "level1",
+            "level2",
+            "overflow",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_cancel_prevents_firing(self, wheel):
+        """Test that a cancelled timer never fires."""
+        recorder = _Recorder()
+        wheel.arm("user1", 0.05, recorder)
+
+        assert wheel.cancel("user1") is True
+        assert wheel.cancel("user1") is False
+        await asyncio.sleep(0.15)
+
+        assert recorder.fired == []
+        assert len(wheel) == 0
+
+    @pytest.mark.asyncio
+    async def test_rearm_replaces_deadline(self, wheel):
+        """Test that arming an armed key moves its deadline."""
+        recorder = _Recorder()
+        wheel.arm("user1", 0.03, recorder)
+        wheel.arm("user1", 0.2, recorder)
+
+        await asyncio.sleep(0.1)
+        assert recorder.fired == []
+
+        await asyncio.sleep(0.2)
+        assert [key for key, _ in recorder.fired] == ["user1"]
+
+    @pytest.mark.asyncio
+    async def test_many_timers(self, wheel):
+        """Test that thousands of timers fire and leave the wheel empty."""
+        recorder = _Recorder()
+        for i in range(5000):
+            wheel.arm(f"user{i}", 0.01 * (i % 50 + 1), recorder)
+
+        await asyncio.sleep(0.8)
+
+        assert len(recorder.fired) == 5000
+        assert len(wheel) == 0
+
+    @pytest.mark.asyncio
+    async def test_callback_error_does_not_stop_wheel(self, wheel):
+        """Test that a failing callback is logged and other timers still fire."""
+        recorder = _Recorder()
+
+        async def failing(key):
+            raise RuntimeError("boom")
+
+        wheel.arm("bad", 0.02, failing)
+        wheel.arm("good", 0.05, recorder)
+        await asyncio.sleep(0.15)
+
+        assert [key for key, _ in recorder.fired] == ["good"]
+
+    @pytest.mark.asyncio
+    async def test_arm_before_start_raises(self):
+        """Test that arming a stopped wheel raises."""
+        with pytest.raises(RuntimeError, match="not started"):
+            TimerWheel().arm("user1", 1.0, _Recorder())
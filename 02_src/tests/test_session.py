@@ -0,0 +1,105 @@
+"""Tests for SessionPolicy and session summaries."""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from core.dialogue.session import SessionPolicy, SessionStats, summarize_session
+from core.models import DialogueSummary
+
+NOW = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+
+class TestSessionPolicy:
+    """Tests for SessionPolicy.rollover_reason()."""
+
+    def test_disabled_by_default(self):
+        """Test that a policy without limits never rolls over."""
+        policy = SessionPolicy()
+        stats = SessionStats(message_count=10_000, last_message_at=NOW - timedelta(days=30))
+
+        assert not policy.enabled
+        assert policy.rollover_reason(stats, NOW) is None
+
+    def test_max_messages(self):
+        """Test rolling over once the session reaches max_messages."""
+        policy = SessionPolicy(max_messages=10)
+
+        assert policy.rollover_reason(SessionStats(9, NOW), NOW) is None
+        assert policy.rollover_reason(SessionStats(10, NOW), NOW) == "max_messages"
+
+    def test_idle_timeout(self):
+        """Test rolling over after idle_timeout since the last message."""
+        policy = SessionPolicy(idle_timeout=3600)
+
+        recent = SessionStats(5, NOW - timedelta(minutes=30))
+        stale = SessionStats(5, NOW - timedelta(hours=2))
+        assert policy.rollover_reason(recent, NOW) is None
+        assert policy.rollover_reason(stale, NOW) == "idle"
+
+    def test_empty_session_kept(self):
+        """Test that a session without messages never rolls over."""
+        policy = SessionPolicy(idle_timeout=1, max_messages=1)
+
+        assert policy.rollover_reason(SessionStats(), NOW) is None
+
+
+class TestSummarizeSession:
+    """Tests for summarize_session()."""
+
+    @pytest.mark.asyncio
+    async def test_prompt_merges_carryover_and_summary(self):
+        """Test that the rolling summary replaces the messages it covers."""
+        llm = Mock()
+        llm.complete = AsyncMock(return_value="New carryover")
+        history = [
+            {"role": "user", "content": "old question"},
+            {"role": "assistant", "content": "old answer"},
+            {"role": "user", "content": "recent question"},
+        ]
+        summary = DialogueSummary(dialogue_id="d1", summary="Rolling", summarized_count=2)
+
+        result = await summarize_session(
+            llm, history, "Earlier", summary, SessionPolicy(max_messages=10)
+        )
+
+        assert result == "New carryover"
+        prompt = llm.complete.call_args.kwargs["messages"][0]["content"]
+        assert "Earlier" in prompt
+        assert "Rolling" in prompt
+        assert "recent question" in prompt
+        assert "old question" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_input_limited_to_recent_messages(self):
+        """Test that only the most recent messages within the input budget are sent."""
+        llm = Mock()
+        llm.complete = AsyncMock(return_value="Summary")
+        history = [{"role": "user", "content": f"message {i} " + "x" * 40} for i in range(10)]
+        policy = SessionPolicy(max_messages=10, summary_input_tokens=30)
+
+        await summarize_session(llm, history, None, None, policy)
+
+        prompt = llm.complete.call_args.kwargs["messages"][0]["content"]
+        assert "message 9" in prompt
+        assert "message 0" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_tail_of_history_offset_by_start(self):
+        """Test that the rolling summary is applied to a history tail by position."""
+        llm = Mock()
+        llm.complete = AsyncMock(return_value="Summary")
+        tail = [
+            {"role": "user", "content": "summarized question"},
+            {"role": "user", "content": "new question"},
+        ]
+        summary = DialogueSummary(dialogue_id="d1", summary="Rolling", summarized_count=4)
+
+        await summarize_session(
+            llm, tail, None, summary, SessionPolicy(max_messages=10), history_start=3
+        )
+
+        prompt = llm.complete.call_args.kwargs["messages"][0]["content"]
+        assert "new question" in prompt
+        assert "summarized question" not in prompt
@@ -0,0 +1,193 @@
+"""Tests for sharded deployment routing."""
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+
+from core.api.sharding import HashRing, create_front_app, shard_filter
+
+
+def make_worker(name: str, calls: list, fail_reset: bool = False) -> FastAPI:
+    """Minimal stand-in for a worker API recording the requests it serves."""
+    worker = FastAPI()
+
+    @worker.post("/api/messages")
+    async def send_message(request: Request) -> dict:
+        body = await request.json()
+        calls.append((name, "message", body["user_id"]))
+        return {"response": name}
+
+    @worker.post("/api/control/reset")
+    async def reset() -> dict:
+        calls.append((name, "reset", None))
+        if fail_reset:
+            raise HTTPException(status_code=500, detail=f"{name} reset failed")
+        return {"status": "ok"}
+
+    @worker.get("/api/trace-events")
+    async def trace_events(limit: int = 100) -> list:
+        calls.append((name, "trace-events", limit))
+        return []
+
+    @worker.get("/api/metrics")
+    async def metrics() -> dict:
+        return {"dialogue_agent": {"active_dialogues": len(calls)}}
+
+    return worker
+
+
+@pytest.fixture
+async def front():
+    """Front app over three in-process workers."""
+    calls: list = []
+    clients = {
+        name: httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=make_worker(name, calls)),
+            base_url="http://worker",
+        )
+        for name in ("w0", "w1", "w2")
+    }
+    app = create_front_app(clients)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://front"
+    ) as client:
+        yield client, calls
+    for worker_client in clients.values():
+        await worker_client.aclose()
+
+
+class TestHashRing:
+    """Tests for consistent hashing."""
+
+    def test_same_key_same_node(self):
+        """Test that routing is deterministic across ring instances."""
+        nodes = ["w0", "w1", "w2"]
+        assert all(
+            HashRing(nodes).node_for(f"user{i}") == HashRing(nodes).node_for(f"user{i}")
+            for i in range(100)
+        )
+
+    def test_keys_spread_over_nodes(self):
+        """Test that every node gets a fair share of keys."""
+        ring = HashRing(["w0", "w1", "w2", "w3"])
+        counts: dict[str, int] = {}
+        for i in range(4000):
+            node = ring.node_for(f"user{i}")
+            counts[node] = counts.get(node, 0) + 1
+
+        assert set(counts) == {"w0", "w1", "w2", "w3"}
+        assert min(counts.values()) > 600
+
+    def test_adding_node_moves_few_keys(self):
+        """Test that a new node takes keys only from the others' shares."""
+        before = HashRing(["w0", "w1", "w2"])
+        after = HashRing(["w0", "w1", "w2", "w3"])
+        keys = [f"user{i}" for i in range(3000)]
+
+        moved = [k for k in keys if before.node_for(k) != after.node_for(k)]
+
+        assert all(after.node_for(k) == "w3" for k in moved)
+        assert len(moved) < len(keys) / 2
+
+    def test_requires_nodes(self):
+        """Test that an empty ring is rejected."""
+        with pytest.raises(ValueError):
+            HashRing([])
+
+    def test_shard_filter_matches_routing(self):
+        """Test that each user is owned by exactly the worker it is routed to."""
+        nodes = ["w0", "w1", "w2"]
+        ring = HashRing(nodes)
+        filters = [shard_filter(nodes, i) for i in range(len(nodes))]
+
+        for i in range(300):
+            owners = [nodes[j] for j, owns in enumerate(filters) if owns(f"user{i}")]
+            assert owners == [ring.node_for(f"user{i}")]
+
+
+class TestFrontApp:
+    """Tests for request forwarding."""
+
+    @pytest.mark.asyncio
+    async def test_user_always_routed_to_same_worker(self, front):
+        """Test that all messages of a user reach one worker."""
+        client, calls = front
+        for _ in range(3):
+            for user_id in ("alice", "bob", "carol"):
+                response = await client.post(
+                    "/api/messages", json={"user_id": user_id, "text": "Hi"}
+                )
+                assert response.status_code == 200
+
+        workers_by_user: dict[str, set] = {}
+        for name, _, user_id in calls:
+            workers_by_user.setdefault(user_id, set()).add(name)
+        assert all(len(workers) == 1 for workers in workers_by_user.values())
+
+    @pytest.mark.asyncio
+    async def test_message_without_user_id_rejected(self, front):
+        """Test that an unroutable message is rejected by the front."""
+        client, calls = front
+
+        response = await client.post("/api/messages", json={"text": "Hi"})
+
+        assert response.status_code == 422
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_reset_broadcast_to_all_workers(self, front):
+        """Test that reset reaches every worker."""
+        client, calls = front
+
+        response = await client.post("/api/control/reset")
+
+        assert response.json() == {"status": "ok"}
+        assert sorted(name for name, kind, _ in calls if kind == "reset") == [
+            "w0",
+            "w1",
+            "w2",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_broadcast_relays_failure_of_any_worker(self):
+        """Test that a reset failing on a worker other than the first is relayed."""
+        calls: list = []
+        clients = {
+            name: httpx.AsyncClient(
+                transport=httpx.ASGITransport(
+                    app=make_worker(name, calls, fail_reset=name == "w1")
+                ),
+                base_url="http://worker",
+            )
+            for name in ("w0", "w1", "w2")
+        }
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=create_front_app(clients)),
+            base_url="http://front",
+        ) as client:
+            response = await client.post("/api/control/reset")
+        for worker_client in clients.values():
+            await worker_client.aclose()
+
+        assert response.status_code == 500
+        assert response.json() == {"detail": "w1 reset failed"}
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_reads_forwarded_with_query(self, front):
+        """Test that other requests go to one worker with their query string."""
+        client, calls = front
+
+        response = await client.get("/api/trace-events", params={"limit": 5})
+
+        assert response.status_code == 200
+        assert calls == [("w0", "trace-events", 5)]
+
+    @pytest.mark.asyncio
+    async def test_metrics_collected_from_all_workers(self, front):
+        """Test that /api/metrics reports every worker."""
+        client, _ = front
+
+        response = await client.get("/api/metrics")
+
+        assert set(response.json()["workers"]) == {"w0", "w1", "w2"}
@@ -1,5 +1,7 @@
 """Tests for Storage."""
 
+import asyncio
+import sqlite3
 from datetime import datetime, timezone
 
 import pytest
@@ -8,7 +10,9 @@ from core.models import (
     AgentState,
     Attachment,
     BusMessage,
+    DialogueSession,
     DialogueState,
+    DialogueSummary,
     Message,
     Team,
     Topic,
@@ -17,6 +21,17 @@ from core.models import (
 )
 
 
+@pytest.fixture(params=["aiosqlite", "thread"])
+async def storage(request):
+    """Create in-memory storage for testing, once per engine."""
+    from core.storage import Storage
+
+    st = Storage(":memory:", engine=request.param)
+    await st.init()
+    yield st
+    await st.close()
+
+
 class TestStorageInit:
     """Tests for Storage initialization."""
 
@@ -81,6 +96,29 @@ class TestStorageUsers:
         retrieved = await storage.get_user("nonexistent")
         assert retrieved is None
 
+    async def test_get_dialogue_team(self, storage):
+        """Test resolving the team of a dialogue through its user."""
+        await storage.save_user(User(id="user1", team_id="team1", name="Alice"))
+        await storage.save_dialogue_state(
+            DialogueState(user_id="user1", dialogue_id="dialogue1")
+        )
+
+        assert await storage.get_dialogue_team("dialogue1") == "team1"
+        assert await storage.get_dialogue_team("unknown") is None
+
+    async def test_get_dialogue_team_through_session(self, storage):
+        """Test resolving the team of a dialogue that has no current state."""
+        await storage.save_user(User(id="user1", team_id="team1", name="Alice"))
+        await storage.save_dialogue_session(
+            DialogueSession(
+                dialogue_id="dialogue1",
+                user_id="user1",
+                started_at=datetime.now(timezone.utc),
+            )
+        )
+
+        assert await storage.get_dialogue_team("dialogue1") == "team1"
+
 
 class TestStorageMessages:
     """Tests for Message storage."""
@@ -237,6 +275,218 @@ class TestStorageDialogueState:
         assert retrieved.dialogue_id == "dialogue2"
 
 
+    async def test_save_dialogue_states(self, storage):
+        """Test saving several states at once, replacing existing ones."""
+        ts = datetime.now(timezone.utc)
+        await storage.save_dialogue_state(
+            DialogueState(user_id="user1", dialogue_id="dialogue1")
+        )
+
+        await storage.save_dialogue_states(
+            [
+                DialogueState(
+                    user_id=f"user{i}", dialogue_id=f"dialogue{i}", last_published_timestamp=ts
+                )
+                for i in range(1, 4)
+            ]
+        )
+        await storage.save_dialogue_states([])
+
+        for i in range(1, 4):
+            retrieved = await storage.get_dialogue_state(f"user{i}")
+            assert retrieved.last_published_timestamp is not None
+
+    async def test_get_restorable_dialogues(self, storage):
+        """Test that states come with only their unpublished messages."""
+        published = datetime(2024, 1, 1, 12, 1, tzinfo=timezone.utc)
+        await storage.save_dialogue_state(
+            DialogueState(
+                user_id="user1", dialogue_id="dialogue1", last_published_timestamp=published
+            )
+        )
+        await storage.save_dialogue_state(
+            DialogueState(user_id="user2", dialogue_id="dialogue2")
+        )
+        for dialogue_id in ("dialogue1", "dialogue2"):
+            for minute in range(3):
+                await storage.save_message(
+                    Message(
+                        id=f"{dialogue_id}-{minute}",
+                        dialogue_id=dialogue_id,
+                        role="user",
+                        content=str(minute),
+                        timestamp=datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc),
+                    )
+                )
+
+        await storage.save_team(Team(id="team1", name="Engineering"))
+        await storage.save_user(User(id="user1", team_id="team1", name="Alice"))
+
+        restored = {
+            state.user_id: (team_id, [m.id for m in messages])
+            for state, team_id, messages in await storage.get_restorable_dialogues()
+        }
+
+        assert restored == {
+            "user1": ("team1", ["dialogue1-2"]),
+            "user2": (None, ["dialogue2-0", "dialogue2-1", "dialogue2-2"]),
+        }
+
+    async def test_get_restorable_dialogues_limit(self, storage):
+        """Test that limit caps the number of restored dialogues."""
+        for i in range(3):
+            await storage.save_dialogue_state(
+                DialogueState(user_id=f"user{i}", dialogue_id=f"dialogue{i}")
+            )
+
+        assert len(await storage.get_restorable_dialogues(limit=2)) == 2
+        assert await storage.get_restorable_dialogues(limit=0) == []
+
+    async def test_get_restorable_dialogues_user_filter(self, storage):
+        """Test that only accepted users are restored, with their messages."""
+        ts = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        for i in range(4):
+            await storage.save_dialogue_state(
+                DialogueState(user_id=f"user{i}", dialogue_id=f"dialogue{i}")
+            )
+            await storage.save_message(
+                Message(
+                    id=f"m{i}",
+                    dialogue_id=f"dialogue{i}",
+                    role="user",
+                    content="Hi",
+                    timestamp=ts,
+                )
+            )
+
+        def even(user_id: str) -> bool:
+            return int(user_id[-1]) % 2 == 0
+
+        restored = {
+            state.user_id: [m.id for m in messages]
+            for state, _, messages in await storage.get_restorable_dialogues(
+                user_filter=even
+            )
+        }
+        assert restored == {"user0": ["m0"], "user2": ["m2"]}
+        assert len(await storage.get_restorable_dialogues(limit=1, user_filter=even)) == 1
+
+
+class TestStorageDialogueSummary:
+    """Tests for DialogueSummary storage."""
+
+    async def test_save_and_get_dialogue_summary(self, storage):
+        """Test saving and replacing a dialogue summary."""
+        assert await storage.get_dialogue_summary("dialogue1") is None
+
+        await storage.save_dialogue_summary(
+            DialogueSummary(dialogue_id="dialogue1", summary="First", summarized_count=4)
+        )
+        await storage.save_dialogue_summary(
+            DialogueSummary(dialogue_id="dialogue1", summary="Second", summarized_count=8)
+        )
+
+        retrieved = await storage.get_dialogue_summary("dialogue1")
+        assert retrieved.summary == "Second"
+        assert retrieved.summarized_count == 8
+        assert retrieved.updated_at is not None
+
+
+class TestStorageDialogueSession:
+    """Tests for DialogueSession storage."""
+
+    async def test_save_and_get_sessions(self, storage):
+        """Test that a user's sessions are listed oldest first."""
+        first = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        second = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        await storage.save_dialogue_session(
+            DialogueSession(
+                dialogue_id="d2",
+                user_id="user1",
+                started_at=second,
+                previous_dialogue_id="d1",
+                carryover="Summary",
+            )
+        )
+        await storage.save_dialogue_session(
+            DialogueSession(dialogue_id="d1", user_id="user1", started_at=first)
+        )
+        await storage.end_dialogue_session("d1", second)
+
+        sessions = await storage.get_dialogue_sessions("user1")
+        assert [s.dialogue_id for s in sessions] == ["d1", "d2"]
+        assert sessions[0].ended_at == second
+        assert sessions[1].ended_at is None
+
+        session = await storage.get_dialogue_session("d2")
+        assert session.previous_dialogue_id == "d1"
+        assert session.carryover == "Summary"
+        assert await storage.get_dialogue_session("unknown") is None
+
+    async def test_get_message_stats(self, storage):
+        """Test counting a dialogue's messages and finding the latest."""
+        assert await storage.get_message_stats("d1") == (0, None)
+
+        ts = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        for i in range(3):
+            await storage.save_message(
+                Message(
+                    id=f"m{i}",
+                    dialogue_id="d1",
+                    role="user",
+                    content="Hi",
+                    timestamp=ts.replace(minute=i),
+                )
+            )
+
+        assert await storage.get_message_stats("d1") == (3, ts.replace(minute=2))
+
+    async def test_migrate_dialogue_sessions(self, storage):
+        """Test that dialogues stored without a session get one."""
+        ts = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        await storage.save_dialogue_state(DialogueState(user_id="user1", dialogue_id="d1"))
+        await storage.save_message(
+            Message(id="m1", dialogue_id="d1", role="user", content="Hi", timestamp=ts)
+        )
+
+        assert await storage.migrate_dialogue_sessions() == 1
+        assert await storage.migrate_dialogue_sessions() == 0
+
+        session = await storage.get_dialogue_session("d1")
+        assert session.user_id == "user1"
+        assert session.started_at == ts
+
+
+class TestStorageLLMCache:
+    """Tests for cached LLM responses."""
+
+    async def test_save_and_get_llm_response(self, storage):
+        """Test that a cached response is returned until it expires."""
+        assert await storage.get_llm_response("k1", now=100.0) is None
+
+        await storage.save_llm_response("k1", "First", expires_at=200.0)
+        await storage.save_llm_response("k1", "Second", expires_at=200.0)
+        await storage.save_llm_response("k2", "Forever", expires_at=None)
+
+        assert await storage.get_llm_response("k1", now=100.0) == "Second"
+        assert await storage.get_llm_response("k1", now=200.0) is None
+        assert await storage.get_llm_response("k2", now=1e12) == "Forever"
+
+    async def test_purge_llm_responses(self, storage):
+        """Test that only expired responses are deleted."""
+        await storage.save_llm_response("old", "A", expires_at=50.0)
+        await storage.save_llm_response("new", "B", expires_at=500.0)
+        await storage.save_llm_response("forever", "C", expires_at=None)
+
+        assert await storage.purge_llm_responses(now=100.0) == 1
+        assert await storage.purge_llm_responses(now=100.0) == 0
+
+        async with storage._conn.execute(
+            "SELECT key FROM llm_cache ORDER BY key"
+        ) as cursor:
+            assert [row[0] for row in await cursor.fetchall()] == ["forever", "new"]
+
+
 class TestStorageAgentState:
     """Tests for AgentState storage."""
 
@@ -386,6 +636,74 @@ class TestStorageBusMessages:
         )
         await storage.save_bus_message(msg)
 
+    async def _save_bus_messages(self, storage):
+        """Save a small mixed set of bus messages, one minute apart."""
+        specs = [
+            (Topic.INPUT, "dialogue_agent", {"dialogue_id": "d1"}),
+            (Topic.OUTPUT, "echo_agent", {"user_id": "user1"}),
+            (Topic.INPUT, "dialogue_agent", {"dialogue_id": "d2"}),
+            (Topic.INPUT, "dialogue_agent", {"dialogue_id": "d1"}),
+            (Topic.PROCESSED, "echo_agent", {"dialogue_id": "d1"}),
+        ]
+        for i, (topic, source, payload) in enumerate(specs):
+            await storage.save_bus_message(
+                BusMessage(
+                    id=f"bus{i}",
+                    topic=topic,
+                    payload=payload,
+                    source=source,
+                    timestamp=datetime(2024, 1, 1, 12, i, 0, tzinfo=timezone.utc),
+                )
+            )
+
+    async def test_get_bus_messages_newest_first(self, storage):
+        """Test that get_bus_messages returns newest first."""
+        await self._save_bus_messages(storage)
+
+        messages = await storage.get_bus_messages(limit=2)
+        assert [m.id for m in messages] == ["bus4", "bus3"]
+
+    async def test_query_bus_messages_filters(self, storage):
+        """Test filtering bus messages by topic, source and dialogue_id."""
+        await self._save_bus_messages(storage)
+
+        page = await storage.query_bus_messages(topic=Topic.INPUT, dialogue_id="d1")
+        assert [m.id for m in page.messages] == ["bus3", "bus0"]
+        assert page.next_cursor is None
+
+        page = await storage.query_bus_messages(source="echo_agent")
+        assert [m.id for m in page.messages] == ["bus4", "bus1"]
+
+    async def test_query_bus_messages_time_range(self, storage):
+        """Test filtering bus messages by time range."""
+        await self._save_bus_messages(storage)
+
+        page = await storage.query_bus_messages(
+            after=datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc),
+            before=datetime(2024, 1, 1, 12, 4, 0, tzinfo=timezone.utc),
+        )
+        assert [m.id for m in page.messages] == ["bus3", "bus2", "bus1"]
+
+    async def test_query_bus_messages_cursor_paging(self, storage):
+        """Test that cursors walk all pages without gaps or duplicates."""
+        await self._save_bus_messages(storage)
+
+        seen = []
+        cursor = None
+        while True:
+            page = await storage.query_bus_messages(cursor=cursor, limit=2)
+            seen.extend(m.id for m in page.messages)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == ["bus4", "bus3", "bus2", "bus1", "bus0"]
+
+    async def test_query_bus_messages_invalid_cursor(self, storage):
+        """Test that a malformed cursor raises ValueError."""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            await storage.query_bus_messages(cursor="not-a-cursor")
+
 
 class TestStorageClear:
     """Tests for clearing storage."""
@@ -416,3 +734,436 @@ class TestStorageClear:
         async with storage._conn.execute("SELECT COUNT(*) FROM messages") as cursor:
             count = await cursor.fetchone()
             assert count[0] == 0
+
+
+class TestStorageSnapshot:
+    """Tests for in-memory mode with disk snapshots."""
+
+    async def test_close_writes_snapshot(self, tmp_path):
+        """Test that close() snapshots the in-memory database to disk."""
+        from core.storage import Storage
+
+        snapshot_path = tmp_path / "snapshot.db"
+        st = Storage(":memory:", snapshot_path=snapshot_path)
+        await st.init()
+        await st.save_user(User(id="user1", team_id="team1", name="Alice"))
+        await st.close()
+
+        conn = sqlite3.connect(snapshot_path)
+        try:
+            rows = conn.execute("SELECT id, name FROM users").fetchall()
+        finally:
+            conn.close()
+        assert rows == [("user1", "Alice")]
+
+    async def test_init_restores_snapshot(self, tmp_path):
+        """Test that init() loads an existing snapshot into memory."""
+        from core.storage import Storage
+
+        snapshot_path = tmp_path / "snapshot.db"
+        st = Storage(":memory:", snapshot_path=snapshot_path)
+        await st.init()
+        await st.save_user(User(id="user1", team_id="team1", name="Alice"))
+        await st.close()
+
+        st2 = Storage(":memory:", snapshot_path=snapshot_path)
+        await st2.init()
+        try:
+            user = await st2.get_user("user1")
+            assert user is not None
+            assert user.name == "Alice"
+        finally:
+            await st2.close()
+
+    async def test_periodic_snapshot(self, tmp_path):
+        """Test that snapshots are written in the background."""
+        from core.storage import Storage
+
+        snapshot_path = tmp_path / "snapshot.db"
+        st = Storage(":memory:", snapshot_path=snapshot_path, snapshot_interval=0.05)
+        await st.init()
+        try:
+            await st.save_team(Team(id="team1", name="Engineering"))
+            await asyncio.sleep(0.2)
+            assert snapshot_path.exists()
+        finally:
+            await st.close()
+
+    @pytest.mark.parametrize("engine", ["aiosqlite", "thread"])
+    async def test_snapshot_during_concurrent_writes(self, tmp_path, engine):
+        """Test that snapshots taken while writes are in flight do not block them."""
+        from core.storage import Storage
+
+        snapshot_path = tmp_path / "snapshot.db"
+        st = Storage(
+            ":memory:", snapshot_path=snapshot_path, snapshot_interval=0.01, engine=engine
+        )
+        await st.init()
+        try:
+            ts = datetime.now(timezone.utc)
+            writes = [
+                st.save_message(
+                    Message(
+                        id=f"m{i}",
+                        dialogue_id=f"d{i % 10}",
+                        role="user",
+                        content="Hi",
+                        timestamp=ts,
+                    )
+                )
+                for i in range(500)
+            ]
+            snapshots = [st.snapshot() for _ in range(20)]
+            await asyncio.wait_for(asyncio.gather(*writes, *snapshots), timeout=20)
+        finally:
+            await st.close()
+
+        conn = sqlite3.connect(snapshot_path)
+        try:
+            (count,) = conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+        finally:
+            conn.close()
+        assert count == 500
+
+    def test_snapshot_requires_memory_database(self, tmp_path):
+        """Test that snapshots are rejected for file databases."""
+        from core.storage import Storage
+
+        with pytest.raises(ValueError, match="in-memory"):
+            Storage(tmp_path / "file.db", snapshot_path=tmp_path / "snapshot.db")
+
+
+class TestStorageTuning:
+    """Tests for SQLite tuning profiles."""
+
+    async def test_profile_pragmas_applied(self, tmp_path):
+        """Test that profile PRAGMAs are applied at connect time."""
+        from core.storage import Storage, TUNING_PROFILES
+
+        profile = TUNING_PROFILES["balanced"]
+        st = Storage(tmp_path / "tuned.db", tuning="balanced")
+        await st.init()
+        try:
+            async with st._conn.execute("PRAGMA cache_size") as cursor:
+                assert (await cursor.fetchone())[0] == profile.cache_size
+            async with st._conn.execute("PRAGMA temp_store") as cursor:
+                assert (await cursor.fetchone())[0] == 2  # MEMORY
+            async with st._conn.execute("PRAGMA journal_size_limit") as cursor:
+                assert (await cursor.fetchone())[0] == profile.journal_size_limit
+        finally:
+            await st.close()
+
+    def test_default_profile_has_no_pragmas(self):
+        """Test that the default profile keeps SQLite defaults."""
+        from core.storage import get_tuning_profile
+
+        assert get_tuning_profile(None).pragma_statements() == []
+
+    def test_unknown_profile_raises(self):
+        """Test that an unknown profile name is rejected."""
+        from core.storage import Storage
+
+        with pytest.raises(ValueError, match="Unknown tuning profile"):
+            Storage(":memory:", tuning="turbo")
+
+    async def test_shared_file_uses_wal_and_busy_timeout(self, tmp_path):
+        """Test that a database shared by several processes gets WAL and a busy_timeout."""
+        from core.storage import Storage
+        from core.storage.tuning import SHARED_BUSY_TIMEOUT
+
+        st = Storage(tmp_path / "shared.db", tuning="balanced", shared=True)
+        await st.init()
+        try:
+            async with st._conn.execute("PRAGMA journal_mode") as cursor:
+                assert (await cursor.fetchone())[0] == "wal"
+            async with st._conn.execute("PRAGMA busy_timeout") as cursor:
+                assert (await cursor.fetchone())[0] == SHARED_BUSY_TIMEOUT
+            async with st._conn.execute("PRAGMA temp_store") as cursor:
+                assert (await cursor.fetchone())[0] == 2  # profile PRAGMAs kept
+        finally:
+            await st.close()
+
+    def test_shared_requires_file(self):
+        """Test that shared mode rejects an in-memory database."""
+        from core.storage import Storage
+
+        with pytest.raises(ValueError, match="database file"):
+            Storage(":memory:", shared=True)
+
+    async def test_optimize(self, storage):
+        """Test that optimize() runs on an initialized storage."""
+        await storage.optimize()
+
+
+class TestStorageBatch:
+    """Tests for grouping writes with Storage.batch()."""
+
+    async def test_batch_commits_on_exit(self, storage):
+        """Test that writes inside batch() are visible after the block."""
+        async with storage.batch():
+            await storage.save_team(Team(id="team1", name="Engineering"))
+            await storage.save_user(User(id="user1", team_id="team1", name="Alice"))
+            # Queued, not yet committed
+            assert await storage.get_user("user1") is None
+
+        user = await storage.get_user("user1")
+        assert user is not None
+        assert user.name == "Alice"
+
+    async def test_batch_discarded_on_error(self, storage):
+        """Test that an exception inside batch() drops queued writes."""
+        with pytest.raises(RuntimeError, match="boom"):
+            async with storage.batch():
+                await storage.save_user(User(id="user1", team_id="team1", name="Alice"))
+                raise RuntimeError("boom")
+
+        assert await storage.get_user("user1") is None
+
+    async def test_failed_write_rolls_back(self, storage):
+        """Test that a failing statement does not leave partial writes."""
+        ts = datetime.now(timezone.utc)
+        msg = Message(id="msg1", dialogue_id="d1", role="user", content="Hi", timestamp=ts)
+        await storage.save_message(msg)
+
+        dup = Message(
+            id="msg2",
+            dialogue_id="d1",
+            role="user",
+            content="Hi again",
+            timestamp=ts,
+            attachments=[
+                Attachment(id="att1", message_id="msg2", type="file"),
+                Attachment(id="att1", message_id="msg2", type="file"),
+            ],
+        )
+        with pytest.raises(Exception):
+            await storage.save_message(dup)
+
+        messages = await storage.get_messages("d1")
+        assert [m.id for m in messages] == ["msg1"]
+
+    async def test_concurrent_failed_write_keeps_other_writes(self, storage):
+        """Test that a rollback does not undo a concurrent successful write."""
+        ts = datetime.now(timezone.utc)
+        await storage.save_message(
+            Message(id="msg1", dialogue_id="d1", role="user", content="Hi", timestamp=ts)
+        )
+
+        results = await asyncio.gather(
+            storage.save_message(
+                Message(id="msg2", dialogue_id="d2", role="user", content="A", timestamp=ts)
+            ),
+            storage.save_message(
+                Message(id="msg1", dialogue_id="d1", role="user", content="B", timestamp=ts)
+            ),
+            return_exceptions=True,
+        )
+
+        assert results[0] is None
+        assert isinstance(results[1], Exception)
+        assert [m.id for m in await storage.get_messages("d2")] == ["msg2"]
+
+
+class TestSQLiteWriter:
+    """Tests for the dedicated writer thread."""
+
+    async def test_submit_runs_unit_of_work(self):
+        """Test that submit() runs a function on the writer thread."""
+        import threading
+
+        from core.storage import SQLiteWriter
+
+        writer = await SQLiteWriter(":memory:").start()
+        try:
+            name = await writer.submit(lambda conn: threading.current_thread().name)
+            assert name == "storage-writer"
+
+            results = await writer.submit_batch(
+                [
+                    lambda conn: conn.execute("CREATE TABLE t (x)").close(),
+                    lambda conn: conn.execute("INSERT INTO t VALUES (1)").rowcount,
+                    lambda conn: conn.execute("SELECT x FROM t").fetchall(),
+                ]
+            )
+            assert results[1:] == [1, [(1,)]]
+        finally:
+            await writer.close()
+
+    async def test_submit_propagates_errors(self):
+        """Test that exceptions raised on the thread reach the caller."""
+        from core.storage import SQLiteWriter
+
+        writer = await SQLiteWriter(":memory:").start()
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                await writer.submit(lambda conn: conn.execute("SELECT * FROM missing"))
+        finally:
+            await writer.close()
+
+    async def test_submit_after_close_raises(self):
+        """Test that a closed writer rejects new work."""
+        from core.storage import SQLiteWriter
+
+        writer = await SQLiteWriter(":memory:").start()
+        await writer.close()
+        with pytest.raises(RuntimeError, match="not started"):
+            await writer.submit(lambda conn: None)
+
+
+class TestStorageTokens:
+    """Tests for stored token counts and running totals."""
+
+    async def _save(self, storage, dialogue_id: str, contents: list[str]) -> None:
+        ts = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        for i, content in enumerate(contents):
+            await storage.save_message(
+                Message(
+                    id=f"{dialogue_id}-{i}",
+                    dialogue_id=dialogue_id,
+                    role="user",
+                    content=content,
+                    timestamp=ts.replace(minute=i),
+                )
+            )
+
+    async def test_token_counts_saved(self, storage):
+        """Test that save_message stores the estimated token count."""
+        message = Message(
+            id="m1",
+            dialogue_id="d1",
+            role="user",
+            content="x" * 40,
+            timestamp=datetime.now(timezone.utc),
+        )
+        await storage.save_message(message)
+
+        assert message.token_count == 11
+        assert (await storage.get_messages("d1"))[0].token_count == 11
+        assert await storage.get_dialogue_tokens("d1") == (1, 11)
+        assert await storage.get_dialogue_tokens("unknown") == (0, 0)
+
+    async def test_token_window(self, storage):
+        """Test selecting the most recent messages within a token budget."""
+        # 11, 21 and 6 tokens
+        await self._save(storage, "d1", ["a" * 40, "b" * 80, "c" * 20])
+        await self._save(storage, "d2", ["other"])
+
+        window = await storage.get_token_window("d1", 30)
+        assert [m.content[0] for m in window] == ["b", "c"]
+        assert [m.content[0] for m in await storage.get_token_window("d1", 5)] == []
+        assert len(await storage.get_token_window("d1", 1000)) == 3
+
+    async def test_import_rows_computes_totals(self, storage):
+        """Test that bulk-imported messages get counts and running totals."""
+        ts = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        await storage.import_rows(
+            messages=[
+                Message(
+                    id=f"m{i}",
+                    dialogue_id="d1",
+                    role="user",
+                    content="x" * 40,
+                    timestamp=ts.replace(minute=i),
+                )
+                for i in range(3)
+            ]
+        )
+
+        assert await storage.get_dialogue_tokens("d1") == (3, 33)
+        assert len(await storage.get_token_window("d1", 22)) == 2
+
+    async def test_migrates_older_database(self, tmp_path):
+        """Test that a messages table without token columns is upgraded."""
+        from core.storage import Storage
+
+        db_path = tmp_path / "old.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            """
+            CREATE TABLE messages (
+                id TEXT PRIMARY KEY,
+                dialogue_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TIMESTAMP NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO messages (id, dialogue_id, role, content, timestamp) "
+            "VALUES (?, 'd1', 'user', ?, ?)",
+            [("m1", "x" * 40, "2024-01-01 12:00:00"), ("m2", "y" * 8, "2024-01-01 12:01:00")],
+        )
+        conn.commit()
+        conn.close()
+
+        st = Storage(db_path)
+        await st.init()
+        try:
+            assert await st.get_dialogue_tokens("d1") == (2, 14)
+            assert [m.id for m in await st.get_token_window("d1", 3)] == ["m2"]
+            await self._save(st, "d1", ["z" * 4])
+            assert await st.get_dialogue_tokens("d1") == (3, 16)
+        finally:
+            await st.close()
+
+    def test_unknown_estimator_raises(self):
+        """Test that an unknown token estimator name is rejected."""
+        from core.storage import get_token_estimator
+
+        assert get_token_estimator("words").count("Hello, world") == 4
+        with pytest.raises(ValueError, match="Unknown token estimator"):
+            get_token_estimator("bpe")
+
+
+class TestStorageSerializer:
+    """Tests for pluggable JSON column serializers."""
+
+    @pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+    def test_round_trip(self, name):
+        """Test that each installed serializer round-trips payload shapes."""
+        from core.storage import available_serializers, get_serializer
+
+        if name not in available_serializers():
+            pytest.skip(f"{name} not installed")
+
+        serializer = get_serializer(name)
+        value = {"user_id": "u1", "messages": [{"content": "Привет", "n": 1.5}], "ok": None}
+        encoded = serializer.dumps(value)
+        assert isinstance(encoded, str)
+        assert serializer.loads(encoded) == value
+
+    def test_auto_prefers_fast_serializer(self):
+        """Test that auto picks the first installed serializer."""
+        from core.storage import available_serializers, get_serializer
+
+        assert get_serializer("auto").name == available_serializers()[0]
+
+    def test_unknown_serializer_raises(self):
+        """Test that an unknown serializer name is rejected."""
+        from core.storage import get_serializer
+
+        with pytest.raises(ValueError, match="Unknown serializer"):
+            get_serializer("pickle")
+
+    async def test_rows_readable_across_serializers(self, tmp_path):
+        """Test that rows written with stdlib json load with auto."""
+        from core.storage import Storage
+
+        db_path = tmp_path / "serializer.db"
+        st = Storage(db_path, serializer="json")
+        await st.init()
+        await st.save_agent_state(
+            "agent1", AgentState(agent_id="agent1", data={"k": "в"}, sgr_traces=[{"s": 1}])
+        )
+        await st.close()
+
+        st2 = Storage(db_path, serializer="auto")
+        await st2.init()
+        try:
+            state = await st2.get_agent_state("agent1")
+            assert state.data == {"k": "в"}
+            assert state.sgr_traces == [{"s": 1}]
+        finally:
+            await st2.close()
@@ -0,0 +1,187 @@
+"""Tests for WriteBehind."""
+
+import asyncio
+
+import pytest
+
+from core.storage.write_behind import WriteBehind, WriteJournal
+
+
+@pytest.fixture
+async def writes():
+    """Started WriteBehind with fast retries."""
+    wb = WriteBehind(retries=2, retry_delay=0.01)
+    await wb.start()
+    yield wb
+    await wb.stop()
+
+
+class TestWriteBehind:
+    """Tests for ordered background writes."""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_returns_before_write(self, writes):
+        """Test that enqueue() does not wait for the write."""
+        applied = asyncio.Event()
+
+        async def slow_write():
+            await asyncio.sleep(0.05)
+            applied.set()
+
+        await writes.enqueue(slow_write)
+
+        assert not applied.is_set()
+        assert writes.pending == 1
+        await writes.drain()
+        assert applied.is_set()
+
+    @pytest.mark.asyncio
+    async def test_writes_applied_in_order(self, writes):
+        """Test that a waited-for write lands after everything queued before it."""
+        log = []
+
+        async def write(n, delay):
+            await asyncio.sleep(delay)
+            log.append(n)
+            return n
+
+        await writes.enqueue(lambda: write(1, 0.03))
+        await writes.enqueue(lambda: write(2, 0.01))
+        result = await writes.submit(lambda: write(3, 0))
+
+        assert result == 3
+        assert log == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_failed_write_retried(self, writes):
+        """Test that a failing write is retried before giving up."""
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise OSError("database is locked")
+            return "ok"
+
+        assert await writes.submit(flaky) == "ok"
+        assert writes.get_metrics()["retried"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_write_does_not_block_queue(self, writes):
+        """Test that a write failing every retry is reported and skipped."""
+
+        async def broken():
+            raise OSError("disk full")
+
+        async def ok():
+            return "ok"
+
+        await writes.enqueue(broken)
+        assert await writes.submit(ok) == "ok"
+
+        with pytest.raises(OSError):
+            await writes.submit(broken)
+        metrics = writes.get_metrics()
+        assert metrics["failed"] == 2
+        assert metrics["written"] == 1
+
+    @pytest.mark.asyncio
+    async def test_enqueue_waits_when_full(self):
+        """Test backpressure once max_pending writes are queued."""
+        writes = WriteBehind(max_pending=1)
+        await writes.start()
+        release = asyncio.Event()
+
+        await writes.enqueue(release.wait)
+        blocked = asyncio.create_task(writes.enqueue(release.wait))
+        await asyncio.sleep(0.02)
+        assert not blocked.done()
+
+        release.set()
+        await asyncio.wait_for(blocked, 1)
+        await writes.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_applies_pending_writes(self):
+        """Test that stop() drains the queue."""
+        writes = WriteBehind()
+        await writes.start()
+        log = []
+
+        async def write(n):
+            await asyncio.sleep(0.01)
+            log.append(n)
+
+        for n in range(5):
+            await writes.enqueue(lambda n=n: write(n))
+        await writes.stop()
+
+        assert log == [0, 1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_enqueue_requires_start(self):
+        """Test that writes are rejected before start()."""
+
+        async def write():
+            pass
+
+        with pytest.raises(RuntimeError, match="not started"):
+            await WriteBehind().enqueue(write)
+
+
+class TestWriteJournal:
+    """Tests for replaying journaled writes after a crash."""
+
+    @staticmethod
+    async def _crash(writes):
+        """Kill the worker without draining, as a dying process would."""
+        writes._task.cancel()
+        await asyncio.gather(writes._task, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_unapplied_writes_replayed_in_order(self, tmp_path):
+        """Test that writes queued at a crash are handed to recover() in order."""
+        path = str(tmp_path / "writes")
+        writes = WriteBehind(journal=WriteJournal(path))
+        await writes.start()
+        await writes.enqueue(asyncio.Event().wait, {"n": 0})
+        await writes.enqueue(asyncio.Event().wait, {"n": 1})
+        await self._crash(writes)
+
+        replayed = []
+
+        async def replay(records):
+            replayed.extend(records)
+
+        restarted = WriteBehind(journal=WriteJournal(path))
+        await restarted.start()
+        assert await restarted.recover(replay) == 2
+        await restarted.stop()
+
+        assert replayed == [{"n": 0}, {"n": 1}]
+        assert WriteJournal(path).read() == []
+
+    @pytest.mark.asyncio
+    async def test_journal_emptied_once_applied(self, tmp_path):
+        """Test that applied writes are not replayed."""
+        path = str(tmp_path / "writes")
+        writes = WriteBehind(journal=WriteJournal(path))
+        await writes.start()
+
+        async def write():
+            pass
+
+        await writes.enqueue(write, {"n": 0})
+        await writes.drain()
+
+        assert WriteJournal(path).read() == []
+        await writes.stop()
+
+    @pytest.mark.asyncio
+    async def test_torn_record_skipped(self, tmp_path):
+        """Test that a record cut off mid-append is ignored."""
+        path = tmp_path / "writes"
+        path.write_text('{"n": 0}\n{"n": 1', encoding="utf-8")
+
+        assert WriteJournal(str(path)).read() == [{"n": 0}]